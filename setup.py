@@ -15,6 +15,7 @@ setup(
         'pydantic',
         'uvicorn',
         'PyYAML',
+        'scipy',
     ],
     author='Prophet System Team',
     author_email='vivekv@pst.com',
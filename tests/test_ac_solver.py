@@ -0,0 +1,260 @@
+import unittest
+import os
+import glob
+import tempfile
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.ac_solver import (
+    ac_frequencies,
+    execute_native_ac,
+    refine_frequency_grid,
+    run_native_ac,
+    run_native_ac_adaptive,
+)
+from virtual_hardware_lab.simulation_core.netlist import (
+    UnsupportedNetlistError,
+    canonical_netlist_hash,
+    canonicalize_netlist,
+    parse_spice_number,
+)
+from virtual_hardware_lab.simulation_core.rawfile import read_rawfile, write_rawfile
+
+RUNS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runs")
+
+
+def _reference_run_dirs():
+    return sorted(d for d in glob.glob(os.path.join(RUNS_DIR, "*")) if os.path.exists(os.path.join(d, "eis_data.txt")))
+
+
+class TestNativeACSolver(unittest.TestCase):
+    def test_parse_spice_number(self):
+        self.assertEqual(parse_spice_number("10k"), 10e3)
+        self.assertEqual(parse_spice_number("1.5meg"), 1.5e6)
+        self.assertAlmostEqual(parse_spice_number("2u"), 2e-6)
+        self.assertEqual(parse_spice_number("1V"), 1.0)
+        self.assertEqual(parse_spice_number("1e-3"), 1e-3)
+
+    def test_ac_frequencies_decade(self):
+        freqs = ac_frequencies("dec", 10, 1e-3, 1e4)
+        self.assertEqual(len(freqs), 71)
+        self.assertAlmostEqual(freqs[0], 1e-3)
+        self.assertAlmostEqual(freqs[-1] / 1e4, 1.0)
+
+    def test_cross_check_against_ngspice_runs(self):
+        """The Randles/Warburg runs checked into runs/ were produced by ngspice; the native engine must agree."""
+        run_dirs = _reference_run_dirs()
+        self.assertTrue(run_dirs, "No reference ngspice runs found")
+        for run_dir in run_dirs:
+            with self.subTest(run=os.path.basename(run_dir)):
+                with open(os.path.join(run_dir, "merged.cir")) as f:
+                    result = run_native_ac(f.read())
+                reference = np.loadtxt(os.path.join(run_dir, "eis_data.txt"))
+                _, names, _ = result["outputs"][0]
+                freqs = np.real(result["vectors"]["frequency"])
+                native = np.column_stack([col for name in names for col in (freqs, result["vectors"][name])])
+                self.assertEqual(native.shape, reference.shape)
+                np.testing.assert_allclose(native, reference, rtol=1e-6, atol=1e-12)
+
+    def test_wrdata_layout_matches_ngspice(self):
+        run_dir = _reference_run_dirs()[-1]
+        with open(os.path.join(run_dir, "merged.cir")) as f:
+            netlist = f.read()
+        with open(os.path.join(run_dir, "eis_data.txt")) as f:
+            reference_first_line = f.readline()
+        with tempfile.TemporaryDirectory() as tmp:
+            netlist = netlist.replace(os.path.relpath(run_dir, os.path.dirname(RUNS_DIR)) + "/eis_data.txt", "eis_data.txt")
+            execute_native_ac(netlist, os.path.join(tmp, "ngspice.log"), workdir=tmp)
+            with open(os.path.join(tmp, "eis_data.txt")) as f:
+                self.assertEqual(f.readline(), reference_first_line)
+            self.assertTrue(os.path.exists(os.path.join(tmp, "ngspice.log")))
+
+    def test_rlc_against_analytic_impedance(self):
+        netlist = """rlc test
+.param rval = 2k
+V1 in 0 AC 1
+R1 in mid {rval}
+L1 mid out 1m
+C1 out 0 1u
+.ac lin 5 100 10k
+.control
+run
+let z = v(in) / -i(V1)
+let zl = v(mid, out) / i(V1)
+.endc
+.end
+"""
+        result = run_native_ac(netlist)
+        f = np.real(result["vectors"]["frequency"])
+        w = 2 * np.pi * f
+        expected = 2e3 + 1j * w * 1e-3 + 1 / (1j * w * 1e-6)
+        np.testing.assert_allclose(result["vectors"]["z"], expected, rtol=1e-10)
+        np.testing.assert_allclose(result["vectors"]["zl"], -1j * w * 1e-3, rtol=1e-10)
+
+    def test_subckt_parameter_overrides(self):
+        netlist = """subckt params
+.subckt load a b rl=1
+R1 a b {rl * 2}
+.ends load
+I1 0 n1 AC 1
+X1 n1 0 load rl=5
+.ac dec 1 1 10
+.control
+run
+let z = v(n1)
+.endc
+"""
+        result = run_native_ac(netlist)
+        np.testing.assert_allclose(result["vectors"]["z"], 10.0)
+
+    def test_unsupported_netlist_raises(self):
+        netlist = """diode
+V1 in 0 AC 1
+D1 in 0 dmod
+.model dmod D
+.ac dec 10 1 1k
+.end
+"""
+        with self.assertRaises(UnsupportedNetlistError):
+            run_native_ac(netlist)
+
+    def test_transient_analysis_is_unsupported(self):
+        netlist = """tran
+V1 in 0 PULSE(0 1 0 1n 1n 1u 2u)
+R1 in 0 1k
+.tran 1n 10u
+.end
+"""
+        with self.assertRaises(UnsupportedNetlistError):
+            run_native_ac(netlist)
+
+    def test_canonical_netlist_ignores_formatting(self):
+        original = """* ---
+* name: Metadata copied from the template
+* ---
+.param rval = 0.5k
+R1 in  mid {rval}   ; series resistor
+C1 mid 0 1e-6
+V1 in 0 AC 1
+.subckt cell 1 2 r=5e-1
+R1 1 2 { r }
+.ends cell
+.ac dec 10 1m 10k
+.control
+run
+wrdata Out.txt v(in)
+.endc
+.end
+"""
+        reformatted = """Another title
+V1 IN 0 ac 1.0
+c1 mid 0 1u
+R1 in mid
++ {rval}
+.PARAM rval=500
+.subckt CELL 1 2 r=0.5
+r1 1 2 {r}
+.ends
+.ac dec 10 0.001 10000
+.control
+run
+wrdata   Out.txt v(in)
+.endc
+"""
+        self.assertEqual(canonicalize_netlist(original), canonicalize_netlist(reformatted))
+        self.assertEqual(canonical_netlist_hash(original), canonical_netlist_hash(reformatted))
+
+    def test_canonical_netlist_keeps_semantic_differences(self):
+        base = "t\nR1 100 0 1k\nV1 100 0 AC 1\n.ac dec 10 1 1k\n"
+        # Node names are names, not numbers; values and control file names matter.
+        self.assertNotEqual(canonical_netlist_hash(base), canonical_netlist_hash(base.replace("R1 100", "R1 1e2")))
+        self.assertNotEqual(canonical_netlist_hash(base), canonical_netlist_hash(base.replace("1k", "2k")))
+        with_control = base + ".control\nrun\nwrdata a.txt v(100)\n.endc\n"
+        self.assertNotEqual(canonical_netlist_hash(with_control), canonical_netlist_hash(with_control.replace("a.txt", "A.txt")))
+
+    def test_write_rawfile_binary_and_ascii(self):
+        netlist = """raw output
+V1 in 0 AC 1
+R1 in out 1k
+C1 out 0 1u
+.ac dec 5 10 100k
+.control
+run
+let z = v(in) / -i(V1)
+write out_bin.raw z v(out)
+set filetype=ascii
+write out_ascii.raw z
+.endc
+"""
+        with tempfile.TemporaryDirectory() as tmp:
+            result = execute_native_ac(netlist, os.path.join(tmp, "ngspice.log"), workdir=tmp)
+            binary = read_rawfile(os.path.join(tmp, "out_bin.raw"))
+            ascii_plot = read_rawfile(os.path.join(tmp, "out_ascii.raw"))[0]
+            self.assertEqual(len(binary), 1)
+            plot = binary[0]
+            self.assertEqual(plot["names"], ["frequency", "z", "v(out)"])
+            self.assertEqual(plot["flags"], "complex")
+            # Binary vectors are zero-copy views of the mapped file.
+            self.assertIsInstance(plot["vectors"]["z"], np.memmap)
+            np.testing.assert_array_equal(plot["vectors"]["z"], result["vectors"]["z"])
+            np.testing.assert_array_equal(plot["vectors"]["v(out)"], result["vectors"]["v(out)"])
+            np.testing.assert_allclose(ascii_plot["vectors"]["z"], result["vectors"]["z"], rtol=1e-14)
+            del plot, binary
+
+    def test_read_rawfile_multiple_plots_and_truncation(self):
+        t = np.linspace(0, 1, 11)
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = os.path.join(tmp, "a.raw"), os.path.join(tmp, "b.raw")
+            write_rawfile(first, "time", {"time": t, "v(out)": t ** 2}, plotname="Transient Analysis")
+            write_rawfile(second, "time", {"time": t, "v(out)": -t}, plotname="Transient Analysis")
+            combined = os.path.join(tmp, "combined.raw")
+            with open(combined, "wb") as f:
+                for path in (first, second):
+                    with open(path, "rb") as part:
+                        f.write(part.read())
+            plots = read_rawfile(combined)
+            self.assertEqual(len(plots), 2)
+            np.testing.assert_array_equal(plots[1]["vectors"]["v(out)"], -t)
+            self.assertEqual(plots[0]["vectors"]["time"].dtype, np.float64)
+
+            # An interrupted run leaves fewer points than the header announces.
+            with open(first, "rb") as f:
+                content = f.read()
+            with open(first, "wb") as f:
+                f.write(content[:-3 * 16])
+            np.testing.assert_array_equal(read_rawfile(first)[0]["vectors"]["v(out)"], (t ** 2)[:8])
+            del plots
+
+    def _nyquist_error(self, z, z_dense):
+        """Largest distance (relative to |Z|) from a dense spectrum to the polyline through `z`."""
+        a = z[:-1][None, :]
+        ab = z[1:][None, :] - a
+        p = z_dense[:, None]
+        t = np.clip(np.real((p - a) * np.conj(ab)) / np.maximum(np.abs(ab) ** 2, 1e-300), 0, 1)
+        return np.max(np.min(np.abs(p - (a + t * ab)), axis=1) / np.abs(z_dense))
+
+    def test_adaptive_sampling_uses_fewer_points_than_uniform_grid(self):
+        with open(os.path.join(_reference_run_dirs()[-1], "merged.cir")) as f:
+            netlist = f.read()
+        coarse = netlist.replace(".ac dec 10 ", ".ac dec 2 ")
+        adaptive = run_native_ac_adaptive(coarse, {"mode": "adaptive"})
+        dense = run_native_ac(netlist.replace(".ac dec 10 ", ".ac dec 200 "))["vectors"]["z"]
+        uniform = run_native_ac(netlist.replace(".ac dec 10 ", ".ac dec 20 "))["vectors"]["z"]
+
+        freqs = np.real(adaptive["vectors"]["frequency"])
+        self.assertTrue(np.all(np.diff(freqs) > 0))
+        self.assertEqual(adaptive["sampling"]["points"], len(freqs))
+        self.assertLess(len(freqs), len(uniform) / 2)
+        self.assertLessEqual(self._nyquist_error(adaptive["vectors"]["z"], dense), 1.5 * self._nyquist_error(uniform, dense))
+        # Data written by the control is the merged grid.
+        self.assertEqual(len(adaptive["vectors"]["z_real"]), len(freqs))
+
+    def test_refine_frequency_grid_respects_max_points(self):
+        evaluate = lambda f: (1 / (1 + 1j * f))[None, :]
+        refined = refine_frequency_grid(evaluate, [1e-3, 1e3], phase_tol_deg=0.1, max_points=20)
+        self.assertEqual(len(refined["frequencies"]), 20)
+        np.testing.assert_allclose(refined["values"][0], 1 / (1 + 1j * refined["frequencies"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
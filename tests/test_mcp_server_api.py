@@ -1,3 +1,9 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
 
 import pytest
 from fastapi.testclient import TestClient
@@ -106,3 +112,79 @@ async def test_root_post_with_jsonrpc_payload_no_content_204(mock_dispatch_jsonr
     assert response.status_code == 204
     assert not response.content # Ensure no content for 204
 
+
+# Heavy libraries that must only be imported when a request needs them.
+LAZY_MODULES = ("matplotlib", "scipy", "yaml", "jinja2")
+# Generous ceiling for importing the server (measured ~0.7 s); override with VHL_IMPORT_BUDGET_S on slow machines.
+IMPORT_BUDGET_S = float(os.getenv("VHL_IMPORT_BUDGET_S", 3.0))
+
+def test_list_models_tool_returns_paged_json(monkeypatch):
+    from virtual_hardware_lab.mcp_server_api import rpc_methods
+
+    page = {"items": [{"name": "a.j2", "metadata": {}}], "json": '[{"name":"a.j2","metadata":{}}]',
+            "next_cursor": "YS5qMg", "total": 2, "etag": "e1", "inventory_version": "v1"}
+    monkeypatch.setattr(rpc_methods.manager, "list_templates", MagicMock(return_value=dict(page)))
+    response = client.post("/jsonrpc", json={"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                                            "params": {"name": "list_models", "arguments": {"limit": 1}}})
+    assert response.status_code == 200
+    text = response.json()["result"]["content"][0]["text"]
+    assert json.loads(text) == {"models": page["items"], "next_cursor": "YS5qMg", "total": 2, "etag": "e1", "inventory_version": "v1"}
+    rpc_methods.manager.list_templates.assert_called_once()
+    assert rpc_methods.manager.list_templates.call_args.kwargs["limit"] == 1
+
+
+def test_event_stream_formats_server_sent_events():
+    from virtual_hardware_lab.mcp_server_api import mcp_server
+
+    async def read(count):
+        stream = mcp_server.event_stream("sse_run", after=0, keepalive=0.05)
+        chunks = []
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if len(chunks) == count:
+                    return chunks
+        finally:
+            await stream.aclose()
+
+    first = mcp_server.manager.events.publish("sse_run", "queued")
+    mcp_server.manager.events.publish("other_run", "queued")
+    mcp_server.manager.events.publish("sse_run", "progress", percent=50)
+    chunks = asyncio.run(read(3))
+    assert chunks[0] == f"id: {first['id']}\nevent: queued\ndata: {json.dumps(first)}\n\n"
+    assert chunks[1].startswith(f"id: {first['id'] + 2}\nevent: progress\n")
+    assert json.loads(chunks[1].split("data: ", 1)[1])["percent"] == 50
+    assert chunks[2] == ": keepalive\n\n"
+    assert mcp_server.manager.events.subscriber_count == 0
+
+
+def test_ready_endpoint_reports_startup(monkeypatch):
+    from virtual_hardware_lab.mcp_server_api import mcp_server
+    monkeypatch.setattr(mcp_server.manager, "ready", False)
+    monkeypatch.setattr(mcp_server.manager, "_loading", None)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting"}
+    with TestClient(app) as started:  # Runs the lifespan, which loads the inventory in the background
+        for _ in range(200):
+            response = started.get("/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.01)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+def test_server_import_is_lazy_and_fast(tmp_path):
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import virtual_hardware_lab.mcp_server_api.mcp_server\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # Run in a fresh interpreter (and a scratch directory, as the server creates runs/ on import).
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=tmp_path, env=env, check=True)
+    elapsed, loaded = result.stdout.splitlines()[-2:]
+    assert loaded == ""
+    assert float(elapsed) < IMPORT_BUDGET_S
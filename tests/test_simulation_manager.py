@@ -4,10 +4,24 @@ import os
 import shutil
 import hashlib
 import json
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import ANY, patch, MagicMock, AsyncMock
 import asyncio
+import subprocess
+import sys
+import time
+
+import numpy as np
 
 from virtual_hardware_lab.simulation_core.simulation_manager import SimulationManager
+from virtual_hardware_lab.simulation_core.run_data import load_run_data
+from virtual_hardware_lab.simulation_core.extraction import build_extraction_plan
+from virtual_hardware_lab.simulation_core.ngspice_pool import NgspiceWorkerPool
+from virtual_hardware_lab.simulation_core.process_limits import RunCancelledError, run_limited
+from virtual_hardware_lab.simulation_core.job_queue import SQLiteJobQueue
+from virtual_hardware_lab.simulation_core.eis_analysis import distribution_of_relaxation_times, kramers_kronig
+from virtual_hardware_lab.simulation_core.monte_carlo import LogQuantileSketch, SpectrumAggregator
+from virtual_hardware_lab.simulation_core.run_events import NgspiceProgress, RunEventBus
+from virtual_hardware_lab.simulation_core.validation import ParameterValidationError, compile_parameter_validator, validate_parameter_grid, validate_parameters
 
 class TestSimulationManager(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
@@ -45,8 +59,8 @@ class TestSimulationManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.manager._model_inventory, {"template1.j2": {"raw_string": "content", "metadata": {}}})
         self.assertEqual(self.manager._control_inventory, {"template1.j2": {"raw_string": "content", "metadata": {}}})
         self.assertEqual(mock_load_templates.call_count, 2)
-        mock_load_templates.assert_any_call(self.test_models_dir, "model")
-        mock_load_templates.assert_any_call(self.test_controls_dir, "control")
+        mock_load_templates.assert_any_call(self.test_models_dir, "model", ANY)
+        mock_load_templates.assert_any_call(self.test_controls_dir, "control", ANY)
 
     async def test_save_and_validate_template_file_success(self):
         content = """
@@ -188,7 +202,39 @@ params:
         non_existent_metadata = self.manager.get_control_metadata("non_existent_control.j2")
         self.assertIsNone(non_existent_metadata)
     
-    @patch('virtual_hardware_lab.simulation_core.simulation_manager.subprocess.run')
+    def test_list_templates_filters_pages_and_revalidates(self):
+        for i, (tags, params) in enumerate([("[eis, battery]", "r0"), ("[eis]", "r0"), ("[tran]", "c1")]):
+            with open(os.path.join(self.test_models_dir, f"cell_{i}.j2"), "w") as f:
+                f.write(f"*---\ndescription: cell {i}\ntags: {tags}\ninput_parameters:\n  {params}: {{type: float, default: 1}}\n*---\nR1 a b 1")
+        self.manager._load_all_templates()
+
+        page = self.manager.list_templates("model", tags="EIS", limit=1, fields=["description"])
+        self.assertEqual(page["total"], 2)
+        self.assertEqual(page["items"], [{"name": "cell_0.j2", "metadata": {"description": "cell 0"}}])
+        page = self.manager.list_templates("model", tags="EIS", limit=1, fields=["description"], cursor=page["next_cursor"])
+        self.assertEqual([item["name"] for item in page["items"]], ["cell_1.j2"])
+        self.assertIsNone(page["next_cursor"])
+
+        self.assertEqual([item["name"] for item in self.manager.list_templates("model", parameters=["c1"])["items"]], ["cell_2.j2"])
+        self.assertEqual(self.manager.list_templates("model", name="CELL_?.j2")["total"], 3)
+        full = self.manager.list_templates("model")
+        self.assertEqual(json.loads(full["json"]), full["items"])
+
+        # Unchanged inventory: the etag revalidates and the index is reused.
+        index = self.manager._listing_index["model"]
+        self.manager._load_all_templates()
+        self.assertEqual(self.manager.list_templates("model", if_none_match=full["etag"])["not_modified"], True)
+        self.assertIs(self.manager._listing_index["model"], index)
+
+        with open(os.path.join(self.test_models_dir, "cell_3.j2"), "w") as f:
+            f.write("*---\ndescription: cell 3\n*---\nR1 a b 1")
+        self.manager._load_all_templates()
+        page = self.manager.list_templates("model", if_none_match=full["etag"])
+        self.assertNotIn("not_modified", page)
+        self.assertEqual(page["total"], 4)
+        self.assertNotEqual(page["inventory_version"], full["inventory_version"])
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.run_limited', new_callable=AsyncMock)
     @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
     @patch('virtual_hardware_lab.simulation_core.simulation_manager._compute_sha256', side_effect=lambda x: hashlib.sha256(x.encode()).hexdigest())
     async def test_start_sim_success(self, mock_sha, mock_generate_nyquist_plot, mock_subprocess_run):
@@ -228,7 +274,7 @@ x1 1 0 dummymodel res=1k
         
         self.manager._load_all_templates()
 
-        # Mock subprocess.run for ngspice
+        # Mock the ngspice process
         mock_subprocess_run.return_value = MagicMock(
             stdout="ngspice output",
             stderr="",
@@ -273,6 +319,1161 @@ x1 1 0 dummymodel res=1k
             sim_id
         )
 
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.run_limited', new_callable=AsyncMock)
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_sim_native_engine(self, mock_generate_nyquist_plot, mock_subprocess_run):
+        model_content = """*---
+* name: RCModel
+*---
+.subckt rcload P N
+R1 P 1 {{ r_val }}
+C1 1 N 1u
+.ends rcload
+"""
+        control_content = """*---
+* name: ACControl
+*---
+V_source 100 0 AC 1
+X_cell 100 0 rcload
+.ac dec 5 10 10k
+.control
+run
+let Z = V(100) / -I(V_source)
+let Z_real = real(Z)
+let Z_imag = imag(Z)
+wrdata {{ output_data_file }} Z_real Z_imag
+.endc
+.end
+"""
+        with open(os.path.join(self.test_models_dir, "rc_model.j2"), "w") as f:
+            f.write(model_content)
+        with open(os.path.join(self.test_controls_dir, "ac_control.j2"), "w") as f:
+            f.write(control_content)
+        self.manager._load_all_templates()
+
+        sim_id = await self.manager.start_sim(
+            model_name="rc_model.j2",
+            model_params={"r_val": 100},
+            control_name="ac_control.j2",
+            control_params={},
+            engine="native",
+        )
+
+        mock_subprocess_run.assert_not_called()
+        manifest = self.manager.read_results(sim_id)
+        self.assertEqual(manifest["engine"], "native")
+        self.assertIn("native_ac", manifest["tool_versions"])
+        eis_data_filepath = os.path.join(self.test_runs_dir, sim_id, "eis_data.txt")
+        with open(eis_data_filepath) as f:
+            first_row = [float(x) for x in f.readline().split()]
+        self.assertAlmostEqual(first_row[0], 10.0)
+        self.assertAlmostEqual(first_row[1], 100.0)
+        mock_generate_nyquist_plot.assert_called_once()
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.run_limited', new_callable=AsyncMock)
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_sim_native_engine_falls_back_to_ngspice(self, mock_generate_nyquist_plot, mock_subprocess_run):
+        with open(os.path.join(self.test_models_dir, "diode_model.j2"), "w") as f:
+            f.write("*---\n* name: Diode\n*---\n.model dmod D\n")
+        with open(os.path.join(self.test_controls_dir, "op_control.j2"), "w") as f:
+            f.write("*---\n* name: OP\n*---\nV1 1 0 1\nD1 1 0 dmod\n.op\n.end\n")
+        self.manager._load_all_templates()
+        mock_subprocess_run.return_value = MagicMock(stdout="ngspice output", stderr="", returncode=0)
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+
+        sim_id = await self.manager.start_sim(
+            model_name="diode_model.j2",
+            model_params={},
+            control_name="op_control.j2",
+            control_params={},
+            engine="native",
+        )
+
+        mock_subprocess_run.assert_called_once()
+        self.assertEqual(self.manager.read_results(sim_id)["engine"], "ngspice")
+
+    def _write_rc_templates(self, value_expression="{{ r_val }}"):
+        with open(os.path.join(self.test_models_dir, "rc_batch.j2"), "w") as f:
+            f.write(f"""*---
+* name: RCBatch
+*---
+* RC model
+.param r_val = {value_expression}
+.subckt rcload P N
+R1 P 1 {{r_val}}
+C1 1 N {{{{ c_val }}}}
+.ends rcload
+""")
+        with open(os.path.join(self.test_controls_dir, "ac_batch_control.j2"), "w") as f:
+            f.write("""*---
+* name: ACBatchControl
+*---
+* AC sweep
+V_source 100 0 AC 1
+X_cell 100 0 rcload
+.ac dec {{ ppd }} 10 10k
+.control
+run
+let Z = V(100) / -I(V_source)
+wrdata {{ output_data_file }} Z
+.endc
+.end
+""")
+        self.manager._load_all_templates()
+
+    def _fake_batch_ngspice(self, invocations):
+        """Stands in for ngspice on batch netlists of the RC model (c_val 1e-5): applies `alterparam`s and writes each point's `wrdata` output."""
+
+        async def run(netlist_path, log_path, sim_id, timeout=None, on_output=None):
+            with open(netlist_path) as f:
+                netlist = f.read()
+            invocations.append(netlist)
+            frequencies = np.logspace(1, 4, 16)
+            params, log, streamed = {}, ["ngspice banner\n"], 0
+            for line in netlist.split(".control", 1)[1].splitlines():
+                tokens = line.split()
+                if not tokens:
+                    continue
+                if tokens[0] == "echo":
+                    log.append(" ".join(tokens[1:]) + "\n")
+                elif tokens[0] == "alterparam":
+                    params[tokens[1]] = float(tokens[3])
+                elif tokens[0] == "run" and on_output is not None:
+                    on_output("".join(log[streamed:]))
+                    streamed = len(log)
+                    for frequency in frequencies:
+                        on_output(f"Reference value :  {frequency:e}\r")
+                        await asyncio.sleep(0)  # Lets parallel invocations interleave
+                    on_output("\n")
+                elif tokens[0] == "wrdata":
+                    z = self._expected_rc_impedance(frequencies, params["vhl_sweep_r_val"], 1e-5)
+                    np.savetxt(tokens[1], np.column_stack([frequencies, z.real, z.imag]))
+                    log.append(f"wrote r_val={params['vhl_sweep_r_val']}\n")
+            if on_output is not None:
+                on_output("".join(log[streamed:]))
+            with open(log_path, "w") as f:
+                f.writelines(log)
+
+        return run
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_batch_runs_points_in_one_ngspice_invocation(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+        invocations = []
+        self.manager._run_ngspice = self._fake_batch_ngspice(invocations)
+        r_values = [10.0, 20.0, 40.0]
+
+        result = await self.manager.start_batch(
+            "rc_batch.j2", "ac_batch_control.j2", {"r_val": r_values}, model_params={"c_val": 1e-5}, control_params={"ppd": 5}, batch_id="rc_sweep",
+        )
+        self.assertEqual(result["mode"], "alterparam")
+        self.assertEqual(result["sim_ids"], ["rc_sweep_0000", "rc_sweep_0001", "rc_sweep_0002"])
+        self.assertEqual(result["invocations"], 1)
+        self.assertEqual(len(invocations), 1)
+        self.assertIn(".param vhl_sweep_r_val = 10.0", invocations[0])
+        self.assertEqual(invocations[0].count("\nreset\n"), 3)
+        self.assertEqual(mock_generate_nyquist_plot.call_count, 3)
+
+        from virtual_hardware_lab.simulation_core.extraction import complex_vector
+        for sim_id, r_val in zip(result["sim_ids"], r_values):
+            manifest = self.manager.read_results(sim_id)
+            self.assertEqual(manifest["model"]["params"], {"c_val": 1e-5, "r_val": r_val})
+            self.assertEqual(manifest["engine"], "ngspice")
+            self.assertEqual(manifest["batch"]["batch_id"], "rc_sweep")
+            # The point's log is its part of the batch output only.
+            self.assertEqual(manifest["ngspice_log_content"], f"wrote r_val={r_val}\n")
+            run = self.manager._load_run_data(sim_id)
+            expected = self._expected_rc_impedance(run["scale"], r_val, 1e-5)
+            np.testing.assert_allclose(complex_vector(run, "z"), expected, rtol=1e-9)
+
+        batch = self.manager.read_results("rc_sweep")
+        self.assertEqual(batch["kind"], "batch")
+        self.assertEqual([point["params"] for point in batch["points"]], [{"r_val": r} for r in r_values])
+        self.assertTrue(os.path.exists(batch["artifacts"]["batch_netlist_0"]))
+
+        # Content-derived ids: points already simulated are reused, the rest split into invocations of two.
+        invocations.clear()
+        content = await self.manager.start_batch(
+            "rc_batch.j2", "ac_batch_control.j2", [{"r_val": 10.0}, {"r_val": 15.0}, {"r_val": 25.0}],
+            model_params={"c_val": 1e-5}, control_params={"ppd": 5}, id_scheme="content", chunk_size=2,
+        )
+        self.assertEqual(content["invocations"], 2)
+        again = await self.manager.start_batch(
+            "rc_batch.j2", "ac_batch_control.j2", [{"r_val": 15.0}, {"r_val": 30.0}],
+            model_params={"c_val": 1e-5}, control_params={"ppd": 5}, id_scheme="content",
+        )
+        self.assertEqual(again["reused"], [content["sim_ids"][1]])
+        self.assertEqual(len(invocations), 3)
+        self.assertEqual(invocations[-1].count("\nreset\n"), 1)
+
+        with self.assertRaises(ParameterValidationError):
+            await self.manager.start_batch("rc_batch.j2", "ac_batch_control.j2", {"r_val": [10.0, 5000.0]}, model_params={"c_val": 1e-5}, control_params={"ppd": 5})
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_batch_points_share_runs_like_single_runs(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+        invocations = []
+        self.manager._run_ngspice = self._fake_batch_ngspice(invocations)
+        batch_args = ("rc_batch.j2", "ac_batch_control.j2")
+        batch_kwargs = {"model_params": {"c_val": 1e-5}, "control_params": {"ppd": 5}}
+
+        # Content ids: a minimal point is simulated again for a batch that keeps all files.
+        lean = await self.manager.start_batch(*batch_args, {"r_val": [10.0, 20.0]}, id_scheme="content", persistence="minimal", **batch_kwargs)
+        full = await self.manager.start_batch(*batch_args, {"r_val": [10.0]}, id_scheme="content", persistence="all", **batch_kwargs)
+        self.assertEqual(full["reused"], [])
+        self.assertEqual(full["sim_ids"], lean["sim_ids"][:1])
+        self.assertEqual(self.manager.read_results(full["sim_ids"][0])["persistence"], "all")
+        again = await self.manager.start_batch(*batch_args, {"r_val": [10.0, 20.0]}, id_scheme="content", persistence="data", **batch_kwargs)
+        self.assertEqual(again["reused"], lean["sim_ids"][:1])
+        self.assertEqual(len(invocations), 3)
+
+        # A single run of a point in flight waits for the batch, and repeated points run once.
+        invocations.clear()
+
+        async def single_run():
+            while not self.manager._in_flight:
+                await asyncio.sleep(0)
+            return await self.manager.start_sim(*batch_args[:1], {"c_val": 1e-5, "r_val": 30.0}, batch_args[1], {"ppd": 5}, sim_id="single", engine="ngspice")
+
+        result, single = await asyncio.gather(
+            self.manager.start_batch(*batch_args, {"r_val": [30.0, 40.0, 30.0]}, batch_id="shared", **batch_kwargs), single_run(),
+        )
+        self.assertEqual(single, "single")
+        self.assertEqual(self.manager.read_results("single")["alias_of"], "shared_0000")
+        self.assertEqual(self.manager.read_results("shared_0002")["alias_of"], "shared_0000")
+        self.assertEqual(len(invocations), 1)
+        self.assertEqual(invocations[0].count("\nreset\n"), 2)
+        self.assertEqual(self.manager._in_flight, {})
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_batch_progress_and_point_events(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+        self.manager._run_ngspice = self._fake_batch_ngspice([])
+        # Two invocations of three points each, running interleaved.
+        result = await self.manager.start_batch(
+            "rc_batch.j2", "ac_batch_control.j2", {"r_val": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]},
+            model_params={"c_val": 1e-5}, control_params={"ppd": 5}, batch_id="tracked", chunk_size=3,
+        )
+        percents = [record["percent"] for record in self.manager.events.replay("tracked") if record["event"] == "progress"]
+        self.assertGreater(len(percents), 6)
+        self.assertEqual(percents, sorted(set(percents)))
+        self.assertEqual(percents[-1], 100)
+        self.assertEqual([record["event"] for record in self.manager.events.replay("tracked")][-1], "finished")
+        for sim_id in result["sim_ids"]:
+            events = [record["event"] for record in self.manager.events.replay(sim_id)]
+            self.assertEqual(events, ["queued", "started", "finished"])
+
+        from virtual_hardware_lab.simulation_core.run_events import BatchProgress
+        progress = BatchProgress(".ac dec 5 10 10k\n", 4)
+        reported = []
+        for point in range(4):
+            percent, started = progress.feed("only", f"VHL_BATCH_POINT {point}\nReference value : 1e3\nReference value : 1e4\n")
+            self.assertEqual(started, [point])
+            reported.append(percent)
+        self.assertEqual(reported, [25.0, 50.0, 75.0, 100.0])
+        self.assertIsNone(progress.finish("only"))
+
+    async def test_start_batch_falls_back_to_single_runs(self):
+        # Arithmetic on a swept parameter cannot be rendered symbolically.
+        self._write_rc_templates(value_expression="{{ r_val * 2 }}")
+        self.manager.start_sim = AsyncMock(side_effect=lambda *args, sim_id=None, **kwargs: sim_id)
+        result = await self.manager.start_batch(
+            "rc_batch.j2", "ac_batch_control.j2", {"r_val": [1.0, 2.0]}, model_params={"c_val": 1e-5}, control_params={"ppd": 5}, batch_id="fallback",
+        )
+        self.assertEqual(result["mode"], "per_run")
+        self.assertEqual(result["sim_ids"], ["fallback_0000", "fallback_0001"])
+        self.assertEqual(self.manager.start_sim.call_args_list[1].args[1], {"c_val": 1e-5, "r_val": 2.0})
+        self.assertEqual(self.manager.read_results("fallback")["mode"], "per_run")
+
+    def test_inventory_cache_reparses_only_changed_templates(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        cache_path = os.path.join(self.test_runs_dir, ".inventory_cache.json")
+        self.assertTrue(os.path.exists(cache_path))
+        from virtual_hardware_lab.simulation_core import simulation_manager as sm
+        with patch.object(sm, "_parse_template", wraps=sm._parse_template) as mock_parse:
+            manager = SimulationManager(self.test_models_dir, self.test_controls_dir, self.test_runs_dir)
+            self.assertEqual(mock_parse.call_count, 0)
+            self.assertEqual(manager.get_model_metadata("rc_batch.j2"), self.manager.get_model_metadata("rc_batch.j2"))
+            self.assertEqual(manager._model_inventory["rc_batch.j2"]["models"], ["rcload"])
+            self.assertEqual(manager._model_inventory["rc_batch.j2"]["validator"]["parameters"]["r_val"]["range"], (1.0, 1000.0))
+
+            with open(os.path.join(self.test_controls_dir, "ac_batch_control.j2"), "a") as f:
+                f.write("* edited\n")
+            os.remove(os.path.join(self.test_models_dir, "rc_batch.j2"))
+            manager._load_all_templates()
+            mock_parse.assert_called_once()
+            self.assertTrue(manager._control_inventory["ac_batch_control.j2"]["raw_string"].endswith("* edited\n"))
+        with open(cache_path) as f:
+            entries = json.load(f)["entries"]
+        self.assertEqual([os.path.basename(path) for path in entries], ["ac_batch_control.j2"])
+
+    def _expected_rc_impedance(self, frequencies, r_val, c_val):
+        return r_val + 1 / (2j * np.pi * frequencies * c_val)
+
+    def test_evaluate_ac_batch(self):
+        self._write_rc_templates()
+        r_values = np.array([1.0, 10.0, 100.0, 1000.0, 5.0])
+        c_values = np.array([1e-6, 2e-6, 1e-5, 1e-7, 4e-6])
+        result = self.manager.evaluate_ac_batch(
+            "rc_batch.j2", "ac_batch_control.j2",
+            {"r_val": r_values, "c_val": c_values},
+            control_params={"ppd": 5},
+            chunk_size=2,
+        )
+        self.assertEqual(result["parameters"], ["r_val", "c_val"])
+        self.assertEqual(result["impedance"].shape, (5, len(result["frequencies"])))
+        expected = self._expected_rc_impedance(result["frequencies"][None, :], r_values[:, None], c_values[:, None])
+        np.testing.assert_allclose(result["impedance"], expected, rtol=1e-9)
+
+    def test_evaluate_ac_batch_falls_back_to_per_set_rendering(self):
+        # Jinja arithmetic on a swept parameter cannot be rendered symbolically.
+        self._write_rc_templates(value_expression="{{ r_val * 2 }}")
+        param_sets = [{"r_val": 1.0, "c_val": 1e-6}, {"r_val": 3.0, "c_val": 1e-6}]
+        result = self.manager.evaluate_ac_batch("rc_batch.j2", "ac_batch_control.j2", param_sets, control_params={"ppd": 2})
+        expected = self._expected_rc_impedance(result["frequencies"][None, :], np.array([[2.0], [6.0]]), 1e-6)
+        np.testing.assert_allclose(result["impedance"], expected, rtol=1e-9)
+
+    def _add_rc_parameter_metadata(self):
+        with open(os.path.join(self.test_models_dir, "rc_batch.j2")) as f:
+            content = f.read()
+        with open(os.path.join(self.test_models_dir, "rc_batch.j2"), "w") as f:
+            f.write(content.replace("* name: RCBatch\n", """* name: RCBatch
+* input_parameters:
+*   r_val: {type: float, default: 50.0, range: [1.0, 1000.0]}
+*   c_val: {type: float, default: 1e-5, range: [1e-8, 1e-3]}
+"""))
+        self.manager._load_all_templates()
+
+    def test_fit_model_recovers_parameters(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+
+        frequencies = np.logspace(0, 5, 30)
+        z_true = self._expected_rc_impedance(frequencies, 120.0, 3.3e-6)
+        result = self.manager.fit_model(
+            "rc_batch.j2", "ac_batch_control.j2", frequencies, z_true.real, z_true.imag,
+            control_params={"ppd": 1},
+        )
+        self.assertTrue(result["success"])
+        self.assertAlmostEqual(result["parameters"]["r_val"], 120.0, places=4)
+        self.assertAlmostEqual(result["parameters"]["c_val"] / 3.3e-6, 1.0, places=5)
+        self.assertEqual(result["bounds"]["r_val"], [1.0, 1000.0])
+        self.assertEqual(len(result["covariance"]), 2)
+        self.assertEqual(len(result["residuals"]["real"]), len(frequencies))
+
+    def test_sensitivity_matches_analytic_rc(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        result = self.manager.sensitivity("rc_batch.j2", "ac_batch_control.j2", control_params={"ppd": 2}, sim_id="sens_rc")
+
+        self.assertEqual(result["parameters"], ["r_val", "c_val"])
+        self.assertFalse(result["base_response_cached"])
+        self.assertEqual(result["model_evaluations"], 5)
+        matrices = np.load(result["artifacts"]["sensitivity"])
+        f = matrices["frequencies"]
+        r, x = 50.0, 1 / (2 * np.pi * f * 1e-5)
+        mod_sq = r ** 2 + x ** 2
+        np.testing.assert_allclose(matrices["magnitude"][0], r ** 2 / mod_sq, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(matrices["magnitude"][1], -x ** 2 / mod_sq, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(matrices["phase_deg"][0], np.degrees(r * x / mod_sq), rtol=1e-4, atol=1e-4)
+        self.assertEqual(self.manager.read_results("sens_rc")["kind"], "sensitivity")
+
+        # The capacitor dominates a 10 Hz - 10 kHz sweep of a 50 Ohm / 10 uF cell.
+        self.assertEqual(result["ranking"][0]["name"], "c_val")
+
+        again = self.manager.sensitivity("rc_batch.j2", "ac_batch_control.j2", control_params={"ppd": 2}, sim_id="sens_rc_2")
+        self.assertTrue(again["base_response_cached"])
+        self.assertEqual(again["model_evaluations"], 4)
+
+    def test_sensitivity_rejects_parameters_without_value(self):
+        self._write_rc_templates()
+        with self.assertRaises(ValueError):
+            self.manager.sensitivity("rc_batch.j2", "ac_batch_control.j2", control_params={"ppd": 2}, parameters=["r_val"])
+        self._add_rc_parameter_metadata()
+        with self.assertRaises(ParameterValidationError) as raised:
+            self.manager.sensitivity("rc_batch.j2", "ac_batch_control.j2", model_params={"r_val": 5000.0}, control_params={"ppd": 2})
+        self.assertEqual([error["parameter"] for error in raised.exception.errors], ["r_val"])
+
+    def test_monte_carlo_aggregates_reproducibly(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        options = dict(
+            samples=1000, seed=7, control_params={"ppd": 2}, chunk_size=64,
+            distributions={"r_val": {"distribution": "uniform", "low": 40, "high": 60}, "c_val": {"distribution": "lognormal", "median": 1e-5, "sigma": 0.1}},
+        )
+        result = self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", workers=3, sim_id="mc_rc", **options)
+
+        self.assertEqual(result["samples"], 1000)
+        self.assertEqual(result["distributions"]["c_val"]["truncate"], [1e-8, 1e-3])
+        self.assertEqual(self.manager.read_results("mc_rc")["kind"], "monte_carlo")
+        self.assertEqual(sorted(os.listdir(self.manager.get_run_dir("mc_rc"))), sorted(["manifest.json", "monte_carlo.npz"] + (["outliers.npz"] if result["outliers"] else [])))
+        aggregate = np.load(result["artifacts"]["monte_carlo"])
+        f = aggregate["frequencies"]
+        # The series resistance is uniform on [40, 60]: Re Z has mean 50 and std 20 / sqrt(12).
+        np.testing.assert_allclose(aggregate["z_real_mean"], 50.0, atol=0.6)
+        np.testing.assert_allclose(aggregate["z_real_std"], 20 / np.sqrt(12), rtol=0.05)
+        median_magnitude = np.abs(self._expected_rc_impedance(f, 50.0, 1e-5))
+        np.testing.assert_allclose(aggregate["magnitude_percentiles"][1], median_magnitude, rtol=0.02)
+        self.assertTrue(np.all(np.diff(aggregate["magnitude_percentiles"], axis=0) > 0))
+        for outlier in result["outliers"]:
+            self.assertGreaterEqual(outlier["score"], 3.0)
+
+        # The same seed gives the same statistics, however the chunks are scheduled.
+        again = self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", workers=1, sim_id="mc_rc_2", **options)
+        repeated = np.load(again["artifacts"]["monte_carlo"])
+        for key in aggregate.files:
+            np.testing.assert_array_equal(aggregate[key], repeated[key])
+        self.assertEqual(again["outliers"], result["outliers"])
+
+    def test_monte_carlo_corners_and_errors(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        result = self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", method="corners", control_params={"ppd": 1}, sim_id="mc_corners")
+        self.assertEqual(result["samples"], 4)
+        self.assertEqual(result["distributions"]["r_val"], {"distribution": "corners", "low": 1.0, "high": 1000.0})
+        aggregate = np.load(result["artifacts"]["monte_carlo"])
+        # The 1 Ohm / 1 mF corner bounds |Z| from below at 10 kHz.
+        self.assertAlmostEqual(aggregate["magnitude_percentiles"][0][-1], abs(self._expected_rc_impedance(1e4, 1.0, 1e-3)), delta=0.01)
+
+        with self.assertRaises(ValueError):
+            self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", method="gamma", control_params={"ppd": 1})
+        with self.assertRaises(ValueError):
+            self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", distributions={"r_val": {"scale": 2}}, control_params={"ppd": 1})
+        with self.assertRaises(ParameterValidationError):
+            self.manager.monte_carlo("rc_batch.j2", "ac_batch_control.j2", samples=10, control_params={"ppd": 1},
+                                     distributions={"r_val": {"distribution": "uniform", "low": 2000, "high": 3000}})
+
+    def test_streaming_statistics_match_batch_statistics(self):
+        rng = np.random.default_rng(0)
+        z = rng.lognormal(3.0, 0.5, (5000, 3)) * np.exp(1j * rng.uniform(-1.5, 0.0, (5000, 3)))
+        aggregator = SpectrumAggregator(np.array([1.0, 10.0, 100.0]))
+        for chunk in np.array_split(z, 7):
+            aggregator.add(chunk)
+        result = aggregator.result([1, 50, 99])
+        np.testing.assert_allclose(result["z_real_mean"], z.real.mean(axis=0), rtol=1e-10)
+        np.testing.assert_allclose(result["z_imag_std"], z.imag.std(axis=0, ddof=1), rtol=1e-10)
+        exact = np.percentile(np.abs(z), [1, 50, 99], axis=0, method="lower")
+        np.testing.assert_allclose(result["magnitude_percentiles"], exact, rtol=0.006)
+        exact_phase = np.percentile(np.degrees(np.angle(z)), [1, 50, 99], axis=0, method="lower")
+        np.testing.assert_allclose(result["phase_percentiles_deg"], exact_phase, atol=0.1)
+
+        # Past max_buckets the lowest buckets merge and memory stays bounded.
+        sketch = LogQuantileSketch(1, max_buckets=100)
+        sketch.add(np.logspace(-10, 10, 1000)[:, None])
+        self.assertEqual(sketch.counts.shape, (1, 100))
+        self.assertEqual(sketch.counts.sum(), 1000)
+        self.assertAlmostEqual(sketch.quantiles([1.0])[0][0] / 1e10, 1.0, delta=0.006)
+
+    def test_drt_and_kramers_kronig_on_voigt_spectrum(self):
+        f = np.logspace(-2, 5, 71)
+        omega = 2 * np.pi * f
+        z = 10 + 100 / (1 + 1j * omega * 1e-2) + 50 / (1 + 1j * omega * 5e-6)
+
+        drt = distribution_of_relaxation_times(f, z)["summary"]
+        self.assertAlmostEqual(drt["polarization_resistance"], 150.0, delta=2.0)
+        self.assertAlmostEqual(drt["r_inf"], 10.0, delta=1.0)
+        peaks = drt["peaks"]
+        self.assertEqual(len(peaks), 2)
+        self.assertAlmostEqual(np.log10(peaks[0]["tau"]), -2.0, delta=0.05)
+        self.assertAlmostEqual(peaks[0]["resistance"], 100.0, delta=2.0)
+        self.assertAlmostEqual(np.log10(peaks[1]["tau"]), np.log10(5e-6), delta=0.05)
+
+        self.assertTrue(kramers_kronig(f, z)["summary"]["valid"])
+        # Scaling only the imaginary part breaks the Kramers-Kronig relations.
+        broken = kramers_kronig(f, z.real + 1.3j * z.imag)["summary"]
+        self.assertFalse(broken["valid"])
+        self.assertGreater(broken["max_abs_residual"], 0.05)
+
+    async def test_analyze_run_caches_results(self):
+        with open(os.path.join(self.test_models_dir, "voigt.j2"), "w") as f:
+            f.write("""*---
+* name: Voigt
+*---
+* Voigt element
+.subckt rcload P N
+R0 P 1 10
+R1 1 N 100
+C1 1 N 1e-4
+.ends rcload
+""")
+        with open(os.path.join(self.test_controls_dir, "eis_wide.j2"), "w") as f:
+            f.write("""*---
+* name: EISWide
+* outputs:
+*   vectors: [z]
+*   post_processors: [kramers_kronig]
+*---
+* AC sweep
+V_source 100 0 AC 1
+X_cell 100 0 rcload
+.ac dec 10 0.1 100k
+.control
+run
+let Z = V(100) / -I(V_source)
+wrdata {{ output_data_file }} Z
+.endc
+.end
+""")
+        self.manager._load_all_templates()
+        await self.manager.start_sim("voigt.j2", {}, "eis_wide.j2", {}, sim_id="voigt_run", engine="native")
+        manifest = self.manager.read_results("voigt_run")
+        self.assertTrue(manifest["outputs"]["summary"]["kramers_kronig"]["valid"])
+        self.assertTrue(os.path.exists(manifest["artifacts"]["kramers_kronig"]))
+
+        from virtual_hardware_lab.simulation_core import extraction
+        with patch.object(extraction, "run_analysis", wraps=extraction.run_analysis) as mock_run:
+            first = await self.manager.analyze_run("voigt_run")
+            self.assertEqual(mock_run.call_count, 2)
+            again = await self.manager.analyze_run("voigt_run")
+            self.assertEqual(mock_run.call_count, 2)
+            await self.manager.analyze_run("voigt_run", analyses=["drt"], options={"drt": {"regularization": 1e-4}})
+            self.assertEqual(mock_run.call_count, 3)
+
+        self.assertFalse(first["analyses"]["drt"]["cached"])
+        self.assertTrue(again["analyses"]["drt"]["cached"])
+        self.assertEqual(again["analyses"]["drt"]["summary"], first["analyses"]["drt"]["summary"])
+        self.assertTrue(first["analyses"]["kramers_kronig"]["summary"]["valid"])
+        peak = first["analyses"]["drt"]["summary"]["peaks"][0]
+        self.assertAlmostEqual(peak["resistance"], 100.0, delta=3.0)
+        arrays = np.load(first["analyses"]["drt"]["artifacts"]["arrays"])
+        self.assertEqual(arrays["gamma"].shape, arrays["tau"].shape)
+
+        # A process pool gives the same results.
+        self.manager.post_process_workers = 2
+        pooled = await self.manager.analyze_run("voigt_run", options={"kramers_kronig": {"tolerance": 0.02}})
+        await self.manager.close()
+        self.assertFalse(pooled["analyses"]["kramers_kronig"]["cached"])
+        self.assertTrue(pooled["analyses"]["drt"]["cached"])
+
+        with self.assertRaises(KeyError):
+            await self.manager.analyze_run("missing_run")
+        with self.assertRaises(ValueError):
+            await self.manager.analyze_run("voigt_run", analyses=["fft"])
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_compare_runs(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        sim_ids = []
+        for sim_id, r_val, ppd in (("cmp_a", 10.0, 10), ("cmp_b", 12.0, 10)):
+            await self.manager.start_sim("rc_batch.j2", {"r_val": r_val, "c_val": 1e-6}, "ac_batch_control.j2", {"ppd": ppd}, sim_id=sim_id, engine="native")
+            sim_ids.append(sim_id)
+
+        summary = self.manager.compare_runs(sim_ids)
+        self.assertEqual(summary["reference"], "cmp_a")
+        self.assertEqual(summary["axis"], "frequency")
+        self.assertEqual(summary["vectors"], ["z"])
+        self.assertEqual(summary["points"], 31)
+        metrics = summary["comparisons"][0]["vectors"]["z"]
+        # Only the series resistance differs, so the deviation is a flat 2 Ohm.
+        self.assertAlmostEqual(metrics["max_abs"], 2.0, places=6)
+        self.assertAlmostEqual(metrics["rms"], 2.0, places=6)
+        self.assertEqual([band["range"] for band in metrics["bands"]], [[10.0, 100.0], [100.0, 1000.0], [1000.0, 10000.0]])
+        self.assertEqual(sum(band["points"] for band in metrics["bands"]), 31)
+        # Explicit edges narrower than the axis leave the points outside them out of every band.
+        narrow = self.manager.compare_runs(sim_ids, bands=[100, 1000])["comparisons"][0]["vectors"]["z"]["bands"]
+        self.assertEqual([band["range"] for band in narrow], [[100.0, 1000.0]])
+        self.assertEqual(narrow[0]["points"], 11)
+
+        with self.assertRaises(ValueError):
+            self.manager.compare_runs(sim_ids, vectors=["z_mag"])
+        with self.assertRaises(KeyError):
+            self.manager.compare_runs(["cmp_a", "missing_run"])
+        with self.assertRaises(ValueError):
+            self.manager.compare_runs(["cmp_a", "../cmp_b"])
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_run_with_binary_rawfile_is_memory_mapped(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        with open(os.path.join(self.test_controls_dir, "ac_raw_control.j2"), "w") as f:
+            f.write("""*---
+* name: ACRawControl
+* outputs:
+*   format: raw
+*   vectors: [z, z_mag]
+*   post_processors:
+*     - bode_plot: {vector: z}
+*     - summary
+*---
+* AC sweep
+V_source 100 0 AC 1
+X_cell 100 0 rcload
+.ac dec 10 10 10k
+.control
+run
+let Z = V(100) / -I(V_source)
+set filetype=binary
+write {{ output_raw_file }} Z
+.endc
+.end
+""")
+        self.manager._load_all_templates()
+        sim_id = await self.manager.start_sim("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_raw_control.j2", {}, sim_id="raw_run", engine="native")
+
+        manifest = self.manager.read_results(sim_id)
+        run_dir = os.path.join(self.test_runs_dir, sim_id)
+        self.assertEqual(manifest["artifacts"]["data"], os.path.join(run_dir, "results.raw"))
+        self.assertEqual(manifest["artifacts"]["bode_plot"], os.path.join(run_dir, "bode_plot.png"))
+        self.assertTrue(os.path.exists(os.path.join(run_dir, "bode_plot.png")))
+        self.assertNotIn("eis_data", manifest["artifacts"])
+        self.assertEqual(manifest["outputs"]["missing_vectors"], ["z_mag"])
+        self.assertAlmostEqual(manifest["outputs"]["summary"]["z"]["min"], abs(self._expected_rc_impedance(1e4, 10.0, 1e-6)), places=6)
+        # Only declared post-processors run; the EIS Nyquist parse/plot is skipped.
+        mock_generate_nyquist_plot.assert_not_called()
+        run = load_run_data(os.path.join(self.test_runs_dir, sim_id))
+        self.assertIsInstance(run["vectors"]["z"], np.memmap)
+        data = self.manager.get_data(sim_id, max_points=10)
+        self.assertEqual(data["returned_points"], 10)
+        z = np.array(data["vectors"]["z"]["real"]) + 1j * np.array(data["vectors"]["z"]["imag"])
+        np.testing.assert_allclose(z, self._expected_rc_impedance(np.array(data["scale"]), 10.0, 1e-6), rtol=1e-9)
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_identical_concurrent_runs_are_coalesced(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        from virtual_hardware_lab.simulation_core import simulation_manager as sm
+        args = ("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2")
+        with patch.object(sm, "execute_native_ac", wraps=sm.execute_native_ac) as mock_native:
+            results = await asyncio.gather(
+                self.manager.start_sim(*args, {"ppd": 5}, sim_id="leader", engine="native"),
+                self.manager.start_sim(*args, {"ppd": 5}, engine="native"),
+                self.manager.start_sim(*args, {"ppd": 5}, sim_id="retry", engine="native"),
+                self.manager.start_sim(*args, {"ppd": 7}, sim_id="different", engine="native"),
+            )
+        self.assertEqual(results, ["leader", "leader", "retry", "different"])
+        self.assertEqual(mock_native.call_count, 2)
+        alias = self.manager.read_results("retry")
+        self.assertEqual(alias["alias_of"], "leader")
+        self.assertEqual(alias["artifacts"], self.manager.read_results("leader")["artifacts"])
+        self.assertEqual(self.manager._in_flight, {})
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_runs_are_shared_only_when_they_keep_the_requested_files(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        from virtual_hardware_lab.simulation_core import simulation_manager as sm
+        args = ("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2")
+        with patch.object(sm, "execute_native_ac", wraps=sm.execute_native_ac) as mock_native:
+            results = await asyncio.gather(
+                self.manager.start_sim(*args, {"ppd": 5}, sim_id="lean", engine="native", persistence="minimal"),
+                self.manager.start_sim(*args, {"ppd": 5}, sim_id="full", engine="native", persistence="all"),
+                self.manager.start_sim(*args, {"ppd": 5}, sim_id="leaner", engine="native", persistence="minimal"),
+            )
+            self.assertEqual(results, ["lean", "full", "leaner"])
+            # "full" cannot be served by the minimal run, so it ran again; "leaner" shares the minimal run.
+            self.assertEqual(mock_native.call_count, 2)
+            self.assertNotIn("alias_of", self.manager.read_results("full"))
+            self.assertTrue(os.path.exists(os.path.join(self.test_runs_dir, "full", "merged.cir")))
+            self.assertEqual(self.manager.read_results("leaner")["alias_of"], "lean")
+
+            # Content ids: a minimal run is re-recorded for a richer request, then reused by leaner ones.
+            lean = await self.manager.start_sim(*args, {"ppd": 7}, engine="native", id_scheme="content", persistence="minimal")
+            self.assertEqual(self.manager.read_results(lean)["persistence"], "minimal")
+            full = await self.manager.start_sim(*args, {"ppd": 7}, engine="native", id_scheme="content", persistence="all")
+            self.assertEqual(full, lean)
+            self.assertEqual(mock_native.call_count, 4)
+            self.assertEqual(self.manager.read_results(full)["persistence"], "all")
+            self.assertTrue(os.path.exists(os.path.join(self.manager.get_run_dir(full), "merged.cir")))
+            await self.manager.start_sim(*args, {"ppd": 7}, engine="native", id_scheme="content", persistence="data")
+            self.assertEqual(mock_native.call_count, 4)
+        self.assertEqual(self.manager._in_flight, {})
+
+    async def test_coalesced_runs_share_failures(self):
+        self._write_rc_templates()
+        args = ("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2", {"ppd": 5})
+
+        async def failing_run(*_args, **_kwargs):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("ngspice crashed")
+
+        with patch.object(self.manager, "_run_sim", side_effect=failing_run) as mock_run:
+            results = await asyncio.gather(self.manager.start_sim(*args), self.manager.start_sim(*args), return_exceptions=True)
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(self.manager._in_flight, {})
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_content_sim_ids_are_deterministic_and_sharded(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        from virtual_hardware_lab.simulation_core import simulation_manager as sm
+        args = ("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2")
+        with patch.object(sm, "execute_native_ac", wraps=sm.execute_native_ac) as mock_native:
+            first = await self.manager.start_sim(*args, {"ppd": 5}, engine="native", id_scheme="content")
+            again = await self.manager.start_sim(*args, {"ppd": 5}, engine="native", id_scheme="content")
+            other = await self.manager.start_sim(*args, {"ppd": 6}, engine="native", id_scheme="content")
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(mock_native.call_count, 2)
+        self.assertRegex(first, r"^[0-9a-f]{64}$")
+        run_dir = os.path.join(self.test_runs_dir, first[:2], first[2:4], first)
+        self.assertEqual(self.manager.get_run_dir(first), run_dir)
+        self.assertTrue(os.path.exists(os.path.join(run_dir, "manifest.json")))
+        self.assertEqual(self.manager.read_results(first)["sim_id"], first)
+        self.assertEqual(self.manager.get_data(first, max_points=3)["returned_points"], 3)
+
+        # Numerically identical parameters that render differently map to the same canonical run.
+        reformatted = await self.manager.start_sim("rc_batch.j2", {"r_val": "1e1", "c_val": "1u"}, "ac_batch_control.j2", {"ppd": 5}, engine="native", id_scheme="content")
+        self.assertEqual(reformatted, first)
+        self.assertRegex(self.manager.read_results(first)["canonical_netlist_sha256"], r"^[0-9a-f]{64}$")
+
+    def test_run_dir_rejects_traversal(self):
+        with self.assertRaises(ValueError):
+            self.manager.get_run_dir("../outside")
+        self.assertIsNone(self.manager.read_results("../outside"))
+
+    def test_parameter_validator_checks_types_ranges_and_constraints(self):
+        validator = compile_parameter_validator({
+            "input_parameters": {
+                "fmin": {"type": "float", "range": ["1e-3", "1e6"], "required": True},
+                "fmax": {"type": "float", "range": ["1e-3", "1e6"], "required": True},
+                "ppd": {"type": "int", "default": 10, "range": [1, 100]},
+            },
+            "constraints": ["fmax > fmin", "Must reference nodes exported by model."],
+        })
+        self.assertEqual(validator["notes"], ["Must reference nodes exported by model."])
+        self.assertEqual(validate_parameters(validator, {"fmin": "1", "fmax": "10k"}), [])
+        codes = {e["parameter"]: e["code"] for e in validate_parameters(validator, {"fmin": 10, "ppd": 2.5})}
+        self.assertEqual(codes, {"fmax": "missing", "ppd": "type"})
+        self.assertEqual(validate_parameters(validator, {"fmin": 1, "fmax": 1e7})[0]["code"], "range")
+        errors = validate_parameters(validator, {"fmin": 100, "fmax": 10})
+        self.assertEqual([(e["code"], e["constraint"]) for e in errors], [("constraint", "fmax > fmin")])
+
+        grid = {"fmin": np.array([1.0, 50.0, 1.0, 2e6]), "fmax": np.array([10.0, 20.0, 5.0, 3e6])}
+        errors = validate_parameter_grid(validator, grid, {"ppd": 5})
+        self.assertEqual([(e["parameter"], e["code"], e["indices"]) for e in errors], [("fmin", "range", [3]), ("fmax", "range", [3])])
+        errors = validate_parameter_grid(validator, {name: values[:3] for name, values in grid.items()}, {"ppd": 500})
+        self.assertEqual([(e["code"], e.get("indices")) for e in errors], [("range", None), ("constraint", [1])])
+        self.assertEqual(errors[1]["count"], 1)
+
+    async def test_start_sim_rejects_invalid_parameters_before_rendering(self):
+        self._write_rc_templates()
+        self._add_rc_parameter_metadata()
+        from virtual_hardware_lab.simulation_core import simulation_manager as sm
+        with patch.object(sm, "_render_template", wraps=sm._render_template) as mock_render:
+            with self.assertRaises(ParameterValidationError) as ctx:
+                await self.manager.start_sim("rc_batch.j2", {"r_val": 5000.0, "c_val": "abc"}, "ac_batch_control.j2", {"ppd": 5}, engine="native")
+        mock_render.assert_not_called()
+        self.assertEqual([(e["template"], e["parameter"], e["code"]) for e in ctx.exception.errors],
+                         [("rc_batch.j2", "r_val", "range"), ("rc_batch.j2", "c_val", "type")])
+        self.assertEqual([name for name in os.listdir(self.test_runs_dir) if not name.startswith(".")], [])
+
+        report = self.manager.validate_experiment_parameters("rc_batch.j2", "ac_batch_control.j2", param_sets={"r_val": [10.0, 2000.0, 0.5], "c_val": [1e-6] * 3})
+        self.assertFalse(report["valid"])
+        self.assertEqual(report["errors"][0]["indices"], [1, 2])
+        with self.assertRaises(ParameterValidationError):
+            self.manager.evaluate_ac_batch("rc_batch.j2", "ac_batch_control.j2", {"r_val": [10.0, 2000.0]}, control_params={"ppd": 1})
+        self.assertTrue(self.manager.validate_experiment_parameters("rc_batch.j2", model_params={"r_val": "100", "c_val": "1u"})["valid"])
+
+    def _write_fake_ngspice(self):
+        """A stand-in for `ngspice -p`: echoes, sources netlists and hangs on request."""
+        script = os.path.join(self.test_runs_dir, "fake_ngspice.py")
+        with open(script, "w") as f:
+            f.write("""import sys, time
+for line in sys.stdin:
+    command, _, argument = line.strip().partition(" ")
+    if command == "echo":
+        print(argument)
+    elif command == "source":
+        text = open(argument).read()
+        print("sourced " + text.splitlines()[0])
+        if "HANG" in text:
+            sys.stdout.flush()
+            time.sleep(60)
+    elif command == "run":
+        print("run issued")
+    elif command == "quit":
+        break
+    sys.stdout.flush()
+""")
+        return [sys.executable, script]
+
+    async def test_ngspice_worker_pool_reuses_and_recycles_workers(self):
+        pool = NgspiceWorkerPool(1, command=self._write_fake_ngspice(), max_runs=2, run_timeout=5)
+        netlists = {}
+        for name, text in {"control": "with control\n.control\nrun\n.endc\n", "plain": "plain\n.ac dec 1 1 10\n", "hang": "hang\nHANG\n"}.items():
+            netlists[name] = os.path.join(self.test_runs_dir, f"{name}.cir")
+            with open(netlists[name], "w") as f:
+                f.write(text)
+        try:
+            self.assertEqual(await pool.run(netlists["control"]), "sourced with control\n")
+            first_pid = pool._idle[0].pid
+            self.assertEqual(await pool.run(netlists["plain"]), "sourced plain\nrun issued\n")
+            # Recycled after max_runs; the next run starts a fresh worker.
+            self.assertEqual((pool.stats["recycled"], pool._idle), (1, []))
+            await pool.run(netlists["control"])
+            self.assertNotEqual(pool._idle[0].pid, first_pid)
+
+            # A dead idle worker fails its health check and is replaced.
+            pool._idle[0].kill()
+            await pool._idle[0].process.wait()
+            await pool.run(netlists["control"])
+            self.assertEqual((pool.stats["replaced"], pool.stats["started"]), (1, 3))
+
+            with self.assertRaises(subprocess.TimeoutExpired):
+                await pool.run(netlists["hang"], timeout=0.5)
+            self.assertEqual(pool.stats["killed"], 1)
+
+            self.manager.ngspice_workers = 1
+            self.manager._ngspice_pool = pool
+            log_path = os.path.join(self.test_runs_dir, "ngspice.log")
+            await self.manager._run_ngspice(netlists["plain"], log_path, "pooled")
+            with open(log_path) as f:
+                self.assertEqual(f.read(), "sourced plain\nrun issued\n")
+            # A timed-out run keeps the output streamed before the worker was killed.
+            with self.assertRaises(subprocess.TimeoutExpired):
+                await self.manager._run_ngspice(netlists["hang"], log_path, "pooled_hang", timeout=0.5)
+            with open(log_path) as f:
+                self.assertEqual(f.read(), "TimeoutExpired:\nStdout:\nsourced hang\n\n")
+        finally:
+            await self.manager.close()
+        self.assertEqual(pool._idle, [])
+        with self.assertLogs("virtual_hardware_lab", "WARNING") as logs:
+            NgspiceWorkerPool(1, resource_limits={"cpu_seconds": 5, "address_space_mb": 512})
+        self.assertIn("cpu_seconds", logs.output[0])
+
+    async def test_run_limited_kills_process_group_and_applies_limits(self):
+        marker = os.path.join(self.test_runs_dir, "child.pid")
+        # The shell starts a grandchild that must die with it.
+        command = ["sh", "-c", f"sleep 30 & echo $! > {marker}; wait"]
+        started = asyncio.get_running_loop().time()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            await run_limited(command, 0.5)
+        self.assertLess(asyncio.get_running_loop().time() - started, 5)
+        with open(marker) as f:
+            child = int(f.read())
+        await asyncio.sleep(0.1)
+        if os.path.exists(f"/proc/{child}"):  # Gone, or a zombie awaiting its reaper
+            with open(f"/proc/{child}/stat") as f:
+                self.assertEqual(f.read().rsplit(")", 1)[1].split()[0], "Z")
+
+        result = await run_limited([sys.executable, "-c", "while True: pass"], 30, limits={"cpu_seconds": 1})
+        self.assertLess(result.returncode, 0)  # Killed by SIGXCPU
+        big_file = os.path.join(self.test_runs_dir, "big.bin")
+        result = await run_limited([sys.executable, "-c", f"open({big_file!r}, 'wb').write(bytes(4 << 20))"], 30, limits={"file_size_mb": 1})
+        self.assertNotEqual(result.returncode, 0)
+        self.assertLessEqual(os.path.getsize(big_file), 1 << 20)
+
+    async def test_cancel_run_and_control_timeout(self):
+        with open(os.path.join(self.test_models_dir, "slow_model.j2"), "w") as f:
+            f.write("*---\n* name: Slow\n*---\nR1 1 0 1k\n")
+        with open(os.path.join(self.test_controls_dir, "slow_control.j2"), "w") as f:
+            f.write("*---\ntimeout: 0.5\n*---\n.op\n.end\n")
+        self.manager._load_all_templates()
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+        self.assertEqual(self.manager._run_timeout("slow_control.j2"), 0.5)
+        self.assertEqual(self.manager._run_timeout("slow_control.j2", 1e6), self.manager.max_run_timeout)
+
+        async def sleeping_ngspice(command, timeout, **kwargs):
+            return await run_limited([sys.executable, "-c", "import time; time.sleep(30)"], timeout, **kwargs)
+
+        with patch("virtual_hardware_lab.simulation_core.simulation_manager.run_limited", side_effect=sleeping_ngspice):
+            with self.assertRaises(subprocess.TimeoutExpired):
+                await self.manager.start_sim("slow_model.j2", {}, "slow_control.j2", {}, sim_id="timed_out")
+
+            run = asyncio.ensure_future(self.manager.start_sim("slow_model.j2", {}, "slow_control.j2", {}, sim_id="cancelled", timeout=30))
+            while "cancelled" not in self.manager._active_runs:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)
+            self.assertEqual(self.manager.cancel_run("cancelled"), {"sim_id": "cancelled", "cancelled": True})
+            with self.assertRaises(RunCancelledError):
+                await asyncio.wait_for(run, 5)
+        self.assertEqual(self.manager._active_runs, {})
+        self.assertIsNone(self.manager.read_results("cancelled"))
+        with self.assertRaises(KeyError):
+            self.manager.cancel_run("cancelled")
+
+    def test_sqlite_job_queue_leases(self):
+        queue = SQLiteJobQueue(os.path.join(self.test_runs_dir, "queue.sqlite3"), max_attempts=2)
+        self.assertEqual(queue.get_blob(queue.put_blob("R1 1 0 1k")), "R1 1 0 1k")
+        first = queue.submit("run", {"n": 1}, job_id="first")
+        queue.submit("run", {"n": 2}, job_id="second")
+        self.assertEqual(queue.claim("a", 30)["id"], first)
+        self.assertEqual(queue.claim("b", 30)["id"], "second")
+        self.assertIsNone(queue.claim("c", 30))
+        queue.complete("second", "b", {"sim_id": "second"})
+        self.assertEqual(queue.get("second")["result"], {"sim_id": "second"})
+
+        # Worker "a" dies: once its lease expires the job is retried, then failed after max_attempts.
+        with patch("virtual_hardware_lab.simulation_core.job_queue.time.time", return_value=time.time() + 60):
+            job = queue.claim("c", 30)
+        self.assertEqual((job["id"], job["attempts"]), (first, 2))
+        self.assertFalse(queue.renew(first, "a", 30))
+        with patch("virtual_hardware_lab.simulation_core.job_queue.time.time", return_value=time.time() + 120):
+            self.assertIsNone(queue.claim("d", 30))
+        self.assertEqual(queue.get(first)["status"], "failed")
+
+        queue.submit("run", {"n": 3}, job_id="third")
+        queue.claim("a", 30)
+        self.assertTrue(queue.cancel("third"))
+        self.assertFalse(queue.renew("third", "a", 30))
+        self.assertEqual(queue.counts(), {"done": 1, "failed": 1, "cancelled": 1})
+
+    async def test_worker_processes_run_queued_experiments(self):
+        self._write_rc_templates()
+        queue = SQLiteJobQueue(os.path.join(self.test_runs_dir, "queue.sqlite3"))
+        manager = SimulationManager(self.test_models_dir, self.test_controls_dir, self.test_runs_dir, engine="native", job_queue=queue)
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        workers = [
+            subprocess.Popen([sys.executable, "-m", "virtual_hardware_lab.simulation_core.simulation_worker", "--queue", queue.path,
+                              "--runs-dir", self.test_runs_dir, "--cache-dir", os.path.join(self.test_runs_dir, f"worker_{i}"),
+                              "--worker-id", f"worker_{i}", "--engine", "native", "--poll-interval", "0.05"], env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for i in range(2)
+        ]
+        try:
+            r_values = [10.0, 20.0, 50.0, 100.0]
+            sim_ids = await asyncio.wait_for(asyncio.gather(*(
+                manager.start_sim("rc_batch.j2", {"r_val": r, "c_val": 1e-6}, "ac_batch_control.j2", {"ppd": 2}, sim_id=f"remote_{i}")
+                for i, r in enumerate(r_values)
+            )), 60)
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.wait(10)
+        for sim_id, r in zip(sim_ids, r_values):
+            manifest = manager.read_results(sim_id)
+            self.assertEqual((manifest["engine"], manifest["model"]["params"]["r_val"]), ("native", r))
+            self.assertEqual(queue.get(sim_id)["status"], "done")
+        self.assertEqual(queue.counts(), {"done": 4})
+        # Templates reached the workers through the queue, by content hash.
+        synced = [os.path.exists(os.path.join(self.test_runs_dir, f"worker_{i}", "models", "rc_batch.j2")) for i in range(2)]
+        self.assertTrue(any(synced))
+
+    async def test_run_event_bus_replays_and_filters(self):
+        bus = RunEventBus(replay_size=3, queue_size=2)
+        for i in range(4):
+            bus.publish("a" if i % 2 else "b", "progress", percent=i)
+        # Only the last three events are buffered.
+        self.assertEqual([record["id"] for record in bus.replay()], [2, 3, 4])
+        self.assertEqual([record["percent"] for record in bus.replay("a", after=2)], [3])
+
+        received = []
+
+        async def consume(subscription):
+            async for record in subscription:
+                received.append((record["id"], record["event"]))
+
+        consumer = asyncio.ensure_future(consume(bus.subscribe("a", after=0)))
+        await asyncio.sleep(0)
+        bus.publish("b", "finished")
+        bus.publish("a", "finished")
+        await asyncio.sleep(0)
+        self.assertEqual(received, [(2, "progress"), (4, "progress"), (6, "finished")])
+        # A subscriber that falls behind is disconnected instead of buffering without bound.
+        for _ in range(3):
+            bus.publish("a", "progress")
+        await asyncio.wait_for(consumer, 1)
+        self.assertEqual(bus.subscriber_count, 0)
+
+    def test_ngspice_progress_from_reference_values(self):
+        progress = NgspiceProgress(".ac dec 5 10 10k\n")
+        self.assertIsNone(progress.feed("Reference value :  1.00000e+0"))  # Incomplete line
+        self.assertAlmostEqual(progress.feed("2\rReference value :  1.00000e+03\r"), 200 / 3)
+        self.assertIsNone(progress.feed("Reference value :  1.00000e+02\n"))  # Never goes back
+        self.assertEqual(NgspiceProgress(".tran 1u 2m\n").feed("Reference value : 5.00000e-04\n"), 25.0)
+        self.assertEqual(NgspiceProgress(".op\n").feed("tran 42.5%\nNote: 10% of something\n"), 42.5)
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_start_sim_publishes_lifecycle_events(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        self.manager._get_ngspice_version = MagicMock(return_value="ngspice 35")
+
+        async def fake_ngspice(command, timeout, on_output=None, **kwargs):
+            for value in ("1e1", "1e2", "1e3", "1e4"):
+                on_output(f"Reference value :  {value}\r")
+            on_output("\n")
+            return subprocess.CompletedProcess(command, 0, "done", "")
+
+        events = []
+
+        async def collect():
+            async for record in self.manager.events.subscribe("observed"):
+                events.append(record)
+                if record["event"] in ("finished", "failed"):
+                    return
+
+        collector = asyncio.ensure_future(collect())
+        await asyncio.sleep(0)
+        with patch("virtual_hardware_lab.simulation_core.simulation_manager.run_limited", side_effect=fake_ngspice):
+            await self.manager.start_sim("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2", {"ppd": 2}, sim_id="observed")
+        await asyncio.wait_for(collector, 1)
+        self.assertEqual([record["event"] for record in events], ["queued", "started", "progress", "progress", "progress", "finished"])
+        self.assertEqual([record["percent"] for record in events if record["event"] == "progress"], [33, 66, 100])
+
+        with self.assertRaises(KeyError):
+            await self.manager.start_sim("missing.j2", {}, "ac_batch_control.j2", {})
+        with patch("virtual_hardware_lab.simulation_core.simulation_manager.run_limited", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                await self.manager.start_sim("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2", {"ppd": 2}, sim_id="broken")
+        self.assertEqual(self.manager.events.replay("broken")[-1]["event"], "failed")
+        self.assertIn("boom", self.manager.events.replay("broken")[-1]["error"])
+
+    @patch('virtual_hardware_lab.simulation_core.simulation_manager.SimulationManager._generate_nyquist_plot')
+    async def test_scratch_runs_persist_selected_artifacts(self, mock_generate_nyquist_plot):
+        self._write_rc_templates()
+        scratch_dir = os.path.join(self.test_runs_dir, "scratch")
+        manager = SimulationManager(self.test_models_dir, self.test_controls_dir, self.test_runs_dir, scratch_dir=scratch_dir, persistence="minimal")
+        args = ("rc_batch.j2", {"r_val": 10.0, "c_val": 1e-6}, "ac_batch_control.j2")
+        first = await manager.start_sim(*args, {"ppd": 5}, sim_id="minimal_1", engine="native")
+        second = await manager.start_sim(*args, {"ppd": 5}, sim_id="minimal_2", engine="native")
+        self.assertEqual(sorted(os.listdir(manager.get_run_dir(first))), ["eis_data.txt", "manifest.json"])
+        self.assertEqual(os.listdir(scratch_dir), [])
+        mock_generate_nyquist_plot.assert_not_called()
+
+        manifest = manager.read_results(first)
+        self.assertEqual(manifest["artifacts"], {"eis_data": os.path.join(manager.get_run_dir(first), "eis_data.txt")})
+        self.assertIn("ngspice_log_content", manifest)
+        # Fragments are stored once by hash and shared between runs; the executed netlist has relative output paths.
+        self.assertEqual(manifest["netlists"], manager.read_results(second)["netlists"])
+        with open(manifest["netlists"]["merged"]["path"]) as f:
+            self.assertIn("wrdata eis_data.txt", f.read())
+        self.assertEqual(manager.get_data(first, max_points=5)["returned_points"], 5)
+
+        full = await manager.start_sim(*args, {"ppd": 5}, sim_id="full", engine="native", persistence="all")
+        run_dir = manager.get_run_dir(full)
+        self.assertEqual(sorted(os.listdir(run_dir)), ["control.cir", "eis_data.txt", "manifest.json", "merged.cir", "model.cir", "ngspice.log"])
+        self.assertEqual(manager.read_results(full)["artifacts"]["ngspice_log"], os.path.join(run_dir, "ngspice.log"))
+        self.assertNotIn("netlists", manager.read_results(full))
+        self.assertEqual(os.listdir(scratch_dir), [])
+
+    def test_build_extraction_plan(self):
+        legacy = build_extraction_plan({"name": "OldControl"})
+        self.assertTrue(legacy["legacy"])
+        self.assertEqual(legacy["file"], "eis_data.txt")
+
+        plan = build_extraction_plan({"outputs": {
+            "format": "wrdata",
+            "file": "../tran.txt",
+            "vectors": ["V(out)"],
+            "post_processors": ["waveform_plot", {"summary": {"vectors": ["v(out)"]}}, "fft_magic"],
+        }})
+        self.assertFalse(plan["legacy"])
+        self.assertEqual(plan["file"], "tran.txt")
+        self.assertEqual(plan["vectors"], ["v(out)"])
+        self.assertEqual([step["name"] for step in plan["post_processors"]], ["waveform_plot", "summary"])
+        self.assertEqual(plan["post_processors"][1]["options"], {"vectors": ["v(out)"]})
+
+        lazy = build_extraction_plan({"outputs": {"post_processors": ["summary", {"drt": {"lazy": True, "regularization": 1e-4}}]}})
+        self.assertEqual([step["lazy"] for step in lazy["post_processors"]], [False, True])
+        self.assertEqual(lazy["post_processors"][1]["options"], {"regularization": 1e-4})
+
+    def test_extract_outputs_for_transient_run(self):
+        self._write_transient_run("tran_extract", 50001)
+        plan = build_extraction_plan({"outputs": {"vectors": ["v(in)"], "post_processors": ["waveform_plot", "summary", "nyquist_plot"]}})
+        outputs = self.manager._extract_outputs(plan, os.path.join(self.test_runs_dir, "tran_extract"), "tran_extract")
+        self.assertTrue(os.path.exists(outputs["artifacts"]["waveform_plot"]))
+        self.assertAlmostEqual(outputs["summary"]["v(in)"]["max"], 5.0)
+        self.assertEqual(outputs["points"], 50001)
+        # A transient run has no impedance: the failing step is reported, the others still run.
+        self.assertIn("nyquist_plot", outputs["errors"])
+
+    async def test_post_process_runs_lazy_stages_with_dependencies(self):
+        with open(os.path.join(self.test_models_dir, "voigt.j2"), "w") as f:
+            f.write("""*---
+* name: Voigt
+*---
+* Voigt element
+.subckt rcload P N
+R0 P 1 10
+R1 1 N 100
+C1 1 N 1e-4
+.ends rcload
+""")
+        with open(os.path.join(self.test_controls_dir, "eis_lazy.j2"), "w") as f:
+            f.write("""*---
+* name: EISLazy
+* outputs:
+*   vectors: [z]
+*   post_processors: [summary, {drt_plot: {lazy: true}}]
+*---
+* AC sweep
+V_source 100 0 AC 1
+X_cell 100 0 rcload
+.ac dec 10 0.1 100k
+.control
+run
+let Z = V(100) / -I(V_source)
+wrdata {{ output_data_file }} Z
+.endc
+.end
+""")
+        self.manager._load_all_templates()
+        await self.manager.start_sim("voigt.j2", {}, "eis_lazy.j2", {}, sim_id="lazy_run", engine="native")
+        manifest = self.manager.read_results("lazy_run")
+        self.assertIn("z", manifest["outputs"]["summary"])
+        self.assertEqual(manifest["outputs"]["lazy"], [{"name": "drt_plot", "options": {}}])
+        self.assertNotIn("drt_plot", manifest["artifacts"])
+
+        # drt_plot reads the drt stage, which runs first.
+        first = await self.manager.post_process("lazy_run")
+        self.assertEqual(first["errors"], {})
+        self.assertEqual(list(first["stages"]), ["drt", "drt_plot"])
+        self.assertTrue(os.path.exists(first["artifacts"]["drt_plot"]))
+        self.assertAlmostEqual(first["summary"]["drt"]["polarization_resistance"], 100.0, delta=3.0)
+        self.assertEqual(first["cached"], [])
+
+        again = await self.manager.post_process("lazy_run")
+        self.assertEqual(again["cached"], ["drt", "drt_plot"])
+        # New options for drt invalidate the stages downstream of it too.
+        tuned = await self.manager.post_process("lazy_run", options={"drt": {"regularization": 1e-4}})
+        self.assertEqual(tuned["cached"], [])
+
+        with self.assertRaises(ValueError):
+            await self.manager.post_process("lazy_run", ["fft"])
+        with self.assertRaises(KeyError):
+            await self.manager.post_process("missing_run", ["summary"])
+
+        from virtual_hardware_lab.simulation_core import post_processing
+        cyclic = {"a": {"inputs": ("b",)}, "b": {"inputs": ("a",)}}
+        with patch.dict(post_processing.POST_PROCESSORS, cyclic):
+            with self.assertRaisesRegex(ValueError, "cycle"):
+                post_processing.resolve_stages([{"name": "a"}])
+
+    def _write_transient_run(self, sim_id, n_points):
+        run_dir = os.path.join(self.test_runs_dir, sim_id)
+        os.makedirs(run_dir)
+        with open(os.path.join(run_dir, "merged.cir"), "w") as f:
+            f.write("tran run\nV1 in 0 SIN(0 1 1k)\nR1 in 0 1k\n.tran 1u 10m\n.control\nrun\nwrdata tran_data.txt v(in) i(v1)\n.endc\n.end\n")
+        t = np.linspace(0, 1e-2, n_points)
+        v = np.sin(2 * np.pi * 1e3 * t)
+        v[n_points // 3] = 5.0  # a single-sample glitch
+        np.savetxt(os.path.join(run_dir, "tran_data.txt"), np.column_stack([t, v, t, -v / 1e3]), fmt="% .8e")
+        return t, v
+
+    def test_get_data_decimates_and_windows(self):
+        t, v = self._write_transient_run("tran_run", 20001)
+
+        lttb = self.manager.get_data("tran_run", vectors=["v(in)"], max_points=200)
+        self.assertEqual(lttb["axis"], "time")
+        self.assertEqual(lttb["total_points"], 20001)
+        self.assertEqual(lttb["returned_points"], 200)
+        self.assertEqual(lttb["scale"][0], 0.0)
+        self.assertAlmostEqual(lttb["scale"][-1], 1e-2)
+        self.assertAlmostEqual(max(lttb["vectors"]["v(in)"]), 5.0)
+
+        envelope = self.manager.get_data("tran_run", max_points=100, method="minmax")
+        self.assertLessEqual(envelope["returned_points"], 100)
+        self.assertAlmostEqual(max(envelope["vectors"]["v(in)"]), 5.0)
+        self.assertAlmostEqual(min(envelope["vectors"]["v(in)"]), -1.0, places=4)
+        self.assertEqual(len(envelope["vectors"]["i(v1)"]), envelope["returned_points"])
+        for method in ("lttb", "minmax"):
+            for max_points in (2, 3, 4, 5):
+                small = self.manager.get_data("tran_run", vectors=["v(in)"], max_points=max_points, method=method)
+                self.assertLessEqual(small["returned_points"], max_points, (method, max_points))
+        # With room for one sample besides the ends, minmax keeps the glitch.
+        self.assertAlmostEqual(max(self.manager.get_data("tran_run", vectors=["v(in)"], max_points=3, method="minmax")["vectors"]["v(in)"]), 5.0)
+
+        window = self.manager.get_data("tran_run", vectors=["v(in)"], max_points=5000, start=2e-3, stop=3e-3)
+        self.assertEqual(window["window_points"], window["returned_points"])
+        self.assertTrue(all(2e-3 <= x <= 3e-3 for x in window["scale"]))
+
+        with self.assertRaises(ValueError):
+            self.manager.get_data("tran_run", vectors=["v(out)"])
+        with self.assertRaises(KeyError):
+            self.manager.get_data("missing_run")
+
     def test_read_results_success(self):
         sim_id = "test_sim_123"
         run_dir = os.path.join(self.test_runs_dir, sim_id)
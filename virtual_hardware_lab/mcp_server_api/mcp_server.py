@@ -1,10 +1,14 @@
 # app.py
 import os
+import json
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from virtual_hardware_lab.simulation_core.simulation_manager import SimulationManager
+from virtual_hardware_lab.simulation_core.job_queue import SQLiteJobQueue
 from virtual_hardware_lab.mcp_server_api import rpc_methods
 
 from fastapi import (
@@ -13,11 +17,10 @@ from fastapi import (
     Request,
     HTTPException,
 )
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 from virtual_hardware_lab.mcp_server_api.schemas import RunExperimentRequest, JSONRPCRequest
 from pydantic import ValidationError
 import inspect
-import uvicorn
 
 
 # -------------------------
@@ -30,13 +33,48 @@ logger.setLevel(logging.DEBUG)
 HOST = "0.0.0.0"
 PORT = int(os.getenv("MCP_SERVER_PORT", 53328))
 BASE_URL = os.getenv("BASE_URL", f"http://localhost:{PORT}")
+SIM_ENGINE = os.getenv("VHL_SIM_ENGINE", "ngspice")
+SIM_ID_SCHEME = os.getenv("VHL_SIM_ID_SCHEME", "timestamp")
+NGSPICE_WORKERS = int(os.getenv("VHL_NGSPICE_WORKERS", 0))
+SCRATCH_DIR = os.getenv("VHL_SCRATCH_DIR") # e.g. /dev/shm/vhl
+PERSISTENCE = os.getenv("VHL_PERSISTENCE", "all")
+INVENTORY_CACHE = os.getenv("VHL_INVENTORY_CACHE") or True # Path of the parsed-template cache; default runs/.inventory_cache.json
+RUN_TIMEOUT = float(os.getenv("VHL_RUN_TIMEOUT", 60))
+MAX_RUN_TIMEOUT = float(os.getenv("VHL_MAX_RUN_TIMEOUT", 600))
+EVENT_REPLAY = int(os.getenv("VHL_EVENT_REPLAY", 1000)) # Run events kept for clients that reconnect
+EVENT_KEEPALIVE_S = 15
+POST_PROCESS_WORKERS = int(os.getenv("VHL_POST_PROCESS_WORKERS", 0)) # Processes for post-processing stages (plots, DRT, ...); 0 runs them inline
+JOB_QUEUE = os.getenv("VHL_JOB_QUEUE") # SQLite queue path; when set, runs are executed by simulation workers
+# OS limits for every ngspice process (unset: unlimited)
+RESOURCE_LIMITS = {
+    key: float(os.environ[variable])
+    for key, variable in (("cpu_seconds", "VHL_NGSPICE_CPU_SECONDS"), ("address_space_mb", "VHL_NGSPICE_MEMORY_MB"), ("file_size_mb", "VHL_NGSPICE_FILE_SIZE_MB"))
+    if os.getenv(variable)
+}
 
 # -------------------------
 # Application and manager
 # -------------------------
+async def load_inventory():
+    try:
+        await manager.load_templates()
+        logger.info("Template inventory loaded; server is ready.")
+    except Exception:
+        logger.exception("Loading the template inventory failed.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately: templates load in the background and /ready reports when they are available.
+    # JSON-RPC requests arriving earlier wait for the load (see dispatch_jsonrpc).
+    startup = asyncio.create_task(load_inventory())
+    yield
+    startup.cancel()
+    await manager.close() # Stop warm ngspice workers
+
 app = FastAPI(
     title="Virtual Hardware Lab MCP Server",
     description="API and JSON-RPC dispatcher for SPICE simulations (MCP-compatible).",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -46,7 +84,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-manager = SimulationManager()
+manager = SimulationManager(engine=SIM_ENGINE, id_scheme=SIM_ID_SCHEME, ngspice_workers=NGSPICE_WORKERS,
+                            scratch_dir=SCRATCH_DIR, persistence=PERSISTENCE, load_templates=False,
+                            inventory_cache=INVENTORY_CACHE, run_timeout=RUN_TIMEOUT, max_run_timeout=MAX_RUN_TIMEOUT,
+                            resource_limits=RESOURCE_LIMITS, job_queue=SQLiteJobQueue(JOB_QUEUE) if JOB_QUEUE else None,
+                            event_replay=EVENT_REPLAY, post_process_workers=POST_PROCESS_WORKERS)
 rpc_methods.set_rpc_globals(manager, BASE_URL)
 
 
@@ -82,3 +124,45 @@ async def root_post(request: Request, payload: Dict = Body(None)):
 async def root_get():
     return {"message": "Virtual Hardware Lab MCP Server is running!"}
 
+@app.get("/ready", summary="Readiness probe")
+async def ready():
+    if not manager.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "models": len(manager.list_models()), "controls": len(manager.list_controls())}
+
+async def event_stream(sim_id: Optional[str] = None, after: Optional[int] = None, keepalive: float = EVENT_KEEPALIVE_S):
+    """Formats run events as Server-Sent Events, with a comment line as keepalive while nothing happens."""
+    events = manager.events.subscribe(sim_id, after)
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=keepalive)
+            if not done:
+                yield ": keepalive\n\n"
+                continue
+            try:
+                record = pending.result()
+            except StopAsyncIteration:
+                return # Fell behind; the client reconnects with Last-Event-ID
+            pending = None
+            yield f"id: {record['id']}\nevent: {record['event']}\ndata: {json.dumps(record)}\n\n"
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        await events.aclose()
+
+@app.get("/events", summary="Run lifecycle events (Server-Sent Events)")
+async def events(request: Request, sim_id: Optional[str] = None, last_event_id: Optional[int] = None):
+    """
+    Streams queued/started/progress/finished/failed/cancelled events, for one run
+    (`sim_id`) or all. Events after `last_event_id` (or the `Last-Event-ID`
+    header sent by reconnecting EventSource clients) are replayed first.
+    """
+    header = request.headers.get("last-event-id")
+    if last_event_id is None and header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(event_stream(sim_id, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -8,7 +8,10 @@ from fastapi import HTTPException, Response
 from pydantic import ValidationError
 
 from virtual_hardware_lab.simulation_core.simulation_manager import SimulationManager
-from virtual_hardware_lab.mcp_server_api.schemas import RunExperimentRequest
+from virtual_hardware_lab.mcp_server_api.schemas import RunExperimentRequest, RunBatchRequest, FitModelRequest, SensitivityRequest, MonteCarloRequest, AnalyzeRunsRequest, PostProcessRequest, CompareRunsRequest, GetDataRequest, ValidateParametersRequest, ListTemplatesRequest, CancelRunRequest
+from virtual_hardware_lab.simulation_core.netlist import UnsupportedNetlistError
+from virtual_hardware_lab.simulation_core.validation import ParameterValidationError
+from virtual_hardware_lab.simulation_core.process_limits import RunCancelledError
 
 from virtual_hardware_lab.mcp_server_api.schemas import JSONRPCRequest
 from virtual_hardware_lab.mcp_server_api.utils import jsonrpc_success, jsonrpc_error, safe_join
@@ -37,27 +40,38 @@ def rpc_initialize(params: Dict[str, Any]):
         },
         "capabilities": {
             "supportsNotifications": True,
+            "events": f"{BASE_URL}/events", # Server-Sent Events stream of run lifecycle events
         },
     }
 
 def rpc_shutdown(params: Dict[str, Any]):
     return {"shutdown": True}
 
-def rpc_list_models(params: Dict[str, Any]):
+def _list_templates(template_type: str, key: str, params: Dict[str, Any], as_json: bool = False):
+    req = ListTemplatesRequest.model_validate(params or {})
     try:
-        models = manager.list_models()
-        return {"models": models}
+        page = manager.list_templates(template_type, **req.model_dump())
+    except ValueError as e:
+        return {"error": str(e)}
     except Exception as e:
-        logger.exception("Error in rpc_list_models")
-        raise HTTPException(status_code=500, detail=f"Failed to list models: {str(e)}")
+        logger.exception("Error listing %ss", template_type)
+        raise HTTPException(status_code=500, detail=f"Failed to list {key}: {str(e)}")
+    encoded = page.pop("json", None)
+    if "items" in page:
+        page = {key: page.pop("items"), **page}
+    if as_json:
+        if encoded is None:
+            return json.dumps(page)
+        # The items are already serialized in the listing index; only the page envelope is encoded here.
+        page.pop(key)
+        return f'{{"{key}":{encoded},{json.dumps(page)[1:]}'
+    return page
+
+def rpc_list_models(params: Dict[str, Any]):
+    return _list_templates("model", "models", params)
 
 def rpc_list_controls(params: Dict[str, Any]):
-    try:
-        controls = manager.list_controls()
-        return {"controls": controls}
-    except Exception as e:
-        logger.exception("Error in rpc_list_controls")
-        raise HTTPException(status_code=500, detail=f"Failed to list controls: {str(e)}")
+    return _list_templates("control", "controls", params)
 
 def rpc_get_results(params: Dict[str, Any]):
     sim_id = None
@@ -94,15 +108,186 @@ async def rpc_run_experiment(params: Dict[str, Any]):
         params_obj = params or {}
 
     req = RunExperimentRequest.model_validate(params_obj)
-    sim_id = await manager.start_sim(
-        model_name=req.model_name,
-        model_params=req.model_params,
-        control_name=req.control_name,
-        control_params=req.control_params,
-        sim_id=req.sim_id,
-    )
+    try:
+        sim_id = await manager.start_sim(
+            model_name=req.model_name,
+            model_params=req.model_params,
+            control_name=req.control_name,
+            control_params=req.control_params,
+            sim_id=req.sim_id,
+            engine=req.engine,
+            sampling=req.sampling.model_dump() if req.sampling else None,
+            id_scheme=req.id_scheme,
+            persistence=req.persistence,
+            timeout=req.timeout,
+        )
+    except RunCancelledError as e:
+        return {"error": str(e)}
     return sim_id
 
+async def rpc_run_batch(params: Dict[str, Any]):
+    req = RunBatchRequest.model_validate(params or {})
+    try:
+        return await manager.start_batch(
+            model_name=req.model_name,
+            control_name=req.control_name,
+            param_sets=req.param_sets,
+            model_params=req.model_params,
+            control_params=req.control_params,
+            batch_id=req.batch_id,
+            id_scheme=req.id_scheme,
+            persistence=req.persistence,
+            timeout=req.timeout,
+            chunk_size=req.chunk_size,
+        )
+    except RunCancelledError as e:
+        return {"error": str(e)}
+    except ParameterValidationError:
+        raise # Parameter sets outside the declared ranges: -32602 with the structured errors
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+def rpc_cancel_run(params: Dict[str, Any]):
+    req = CancelRunRequest.model_validate(params or {})
+    try:
+        return manager.cancel_run(req.sim_id)
+    except KeyError as e:
+        return {"error": str(e)}
+
+async def rpc_fit_model(params: Dict[str, Any]):
+    req = FitModelRequest.model_validate(params or {})
+    try:
+        return await asyncio.to_thread(
+            manager.fit_model,
+            model_name=req.model_name,
+            control_name=req.control_name,
+            frequencies=req.frequencies,
+            z_real=req.z_real,
+            z_imag=req.z_imag,
+            fit_parameters=req.fit_parameters,
+            initial=req.initial,
+            bounds=req.bounds,
+            model_params=req.model_params,
+            control_params=req.control_params,
+            vector=req.vector,
+            weighting=req.weighting,
+            max_evaluations=req.max_evaluations,
+        )
+    except UnsupportedNetlistError as e:
+        return {"error": f"Model cannot be fitted with the native AC engine: {e}"}
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_sensitivity(params: Dict[str, Any]):
+    req = SensitivityRequest.model_validate(params or {})
+    try:
+        return await asyncio.to_thread(
+            manager.sensitivity,
+            model_name=req.model_name,
+            control_name=req.control_name,
+            model_params=req.model_params,
+            control_params=req.control_params,
+            parameters=req.parameters,
+            rel_step=req.rel_step,
+            vector=req.vector,
+            sim_id=req.sim_id,
+        )
+    except UnsupportedNetlistError as e:
+        return {"error": f"Sensitivity analysis requires the native AC engine: {e}"}
+    except ParameterValidationError:
+        raise # Base parameters outside the declared ranges: -32602 with the structured errors
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_monte_carlo(params: Dict[str, Any]):
+    req = MonteCarloRequest.model_validate(params or {})
+    try:
+        return await asyncio.to_thread(
+            manager.monte_carlo,
+            model_name=req.model_name,
+            control_name=req.control_name,
+            samples=req.samples,
+            parameters=req.parameters,
+            distributions=req.distributions,
+            method=req.method,
+            seed=req.seed,
+            model_params=req.model_params,
+            control_params=req.control_params,
+            vector=req.vector,
+            percentiles=req.percentiles,
+            outlier_threshold=req.outlier_threshold,
+            max_outliers=req.max_outliers,
+            chunk_size=req.chunk_size,
+            workers=req.workers,
+            sim_id=req.sim_id,
+        )
+    except UnsupportedNetlistError as e:
+        return {"error": f"Monte Carlo analysis requires the native AC engine: {e}"}
+    except ParameterValidationError:
+        raise # Sampled sets outside the declared ranges: -32602 with the structured errors
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_analyze_runs(params: Dict[str, Any]):
+    req = AnalyzeRunsRequest.model_validate(params or {})
+
+    async def analyze(sim_id):
+        try:
+            return await manager.analyze_run(sim_id, analyses=req.analyses, vector=req.vector, options=req.options)
+        except (KeyError, ValueError) as e:
+            return {"sim_id": sim_id, "error": str(e)}
+
+    # Runs are analysed concurrently; one failing run does not hide the others' results.
+    return {"results": await asyncio.gather(*(analyze(sim_id) for sim_id in req.sim_ids))}
+
+async def rpc_post_process(params: Dict[str, Any]):
+    req = PostProcessRequest.model_validate(params or {})
+    try:
+        return await manager.post_process(req.sim_id, stages=req.stages, options=req.options)
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_compare_runs(params: Dict[str, Any]):
+    req = CompareRunsRequest.model_validate(params or {})
+    try:
+        return await asyncio.to_thread(
+            manager.compare_runs,
+            sim_ids=req.sim_ids,
+            vectors=req.vectors,
+            points=req.points,
+            bands=req.bands,
+        )
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_get_data(params: Dict[str, Any]):
+    req = GetDataRequest.model_validate(params or {})
+    try:
+        return await asyncio.to_thread(
+            manager.get_data,
+            sim_id=req.sim_id,
+            vectors=req.vectors,
+            max_points=req.max_points,
+            method=req.method,
+            start=req.start,
+            stop=req.stop,
+        )
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
+async def rpc_validate_parameters(params: Dict[str, Any]):
+    req = ValidateParametersRequest.model_validate(params or {})
+    try:
+        return manager.validate_experiment_parameters(
+            model_name=req.model_name,
+            control_name=req.control_name,
+            model_params=req.model_params,
+            control_params=req.control_params,
+            param_sets=req.param_sets,
+        )
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+
 async def rpc_upload_model(params: Dict[str, Any]):
     filename = params.get("filename")
     content = params.get("content")
@@ -134,7 +319,7 @@ def rpc_get_artifact_link(params: Dict[str, Any]):
     if not sim_id or not artifact_filename:
         raise HTTPException(status_code=400, detail="Missing sim_id or artifact_filename")
     try:
-        artifact_path = safe_join(manager.runs_dir, sim_id, artifact_filename)
+        artifact_path = safe_join(manager.get_run_dir(sim_id), artifact_filename)
         if not os.path.exists(artifact_path):
              raise HTTPException(status_code=404, detail="Artifact not found")
     except ValueError:
@@ -169,20 +354,25 @@ async def rpc_tools_call(params: Dict[str, Any]):
 
     handler = RPC_METHODS[method_name]
     
-    if inspect.iscoroutinefunction(handler):
-        result = await handler(arguments)
+    if method_name in LISTING_METHODS:
+        text = _list_templates(*LISTING_METHODS[method_name], arguments, as_json=True)
+    elif inspect.iscoroutinefunction(handler):
+        text = json.dumps(await handler(arguments), indent=2)
     else:
-        result = handler(arguments)
+        text = json.dumps(handler(arguments), indent=2)
 
     return {
         "content": [
             {
                 "type": "text",
-                "text": json.dumps(result, indent=2)
+                "text": text
             }
         ]
     }
 
+# Listings are returned to tools/call as compact JSON assembled from the pre-serialized index.
+LISTING_METHODS = {"list_models": ("model", "models"), "list_controls": ("control", "controls")}
+
 
 RPC_METHODS: Dict[str, Callable] = {
     "initialize": rpc_initialize,
@@ -192,7 +382,17 @@ RPC_METHODS: Dict[str, Callable] = {
     "list_models": rpc_list_models,
     "list_controls": rpc_list_controls,
     "run_experiment": rpc_run_experiment,
+    "run_batch": rpc_run_batch,
     "get_results": rpc_get_results,
+    "cancel_run": rpc_cancel_run,
+    "fit_model": rpc_fit_model,
+    "sensitivity": rpc_sensitivity,
+    "monte_carlo": rpc_monte_carlo,
+    "analyze_runs": rpc_analyze_runs,
+    "post_process": rpc_post_process,
+    "compare_runs": rpc_compare_runs,
+    "get_data": rpc_get_data,
+    "validate_parameters": rpc_validate_parameters,
     "get_documentation": rpc_get_documentation,
     "upload_model": rpc_upload_model,
     "upload_control": rpc_upload_control,
@@ -268,6 +468,10 @@ async def dispatch_jsonrpc(payload: dict):
         return 404, jsonrpc_error(-32601, f"Method not found: {method}", id_val)
 
     try:
+        if not manager.ready:
+            # Requests that arrive during startup wait for the template inventory.
+            await manager.load_templates()
+
         handler = RPC_METHODS[method]
         
         if inspect.iscoroutinefunction(handler):
@@ -298,6 +502,8 @@ async def dispatch_jsonrpc(payload: dict):
         )
     except ValidationError as e:
         return 400, jsonrpc_error(-32602, "Invalid params", id_val, data=e.errors())
+    except ParameterValidationError as e:
+        return 400, jsonrpc_error(-32602, "Invalid params", id_val, data=e.errors)
     except Exception as e:
         logger.exception("Internal error in RPC handler for %s", method)
         return 500, jsonrpc_error(-32603, "Internal error", id_val, data=str(e))
@@ -1,13 +1,125 @@
 
-from typing import Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import BaseModel, Field
 
+class SamplingOptions(BaseModel):
+    mode: str = Field("fixed", description="'fixed' uses the control's AC grid; 'adaptive' refines it where the response bends.")
+    phase_tol_deg: Optional[float] = Field(None, gt=0, description="Refine intervals whose phase changes by more than this (degrees). Default 5.")
+    curvature_tol: Optional[float] = Field(None, gt=0, description="Refine where a point deviates from its neighbours' chord by more than this fraction of |Z|. Default 0.005.")
+    max_points: Optional[int] = Field(None, ge=2, description="Upper bound on the refined grid size. Default 2000.")
+    max_ppd: Optional[float] = Field(None, gt=0, description="Never refine beyond this many points per decade. Default 200.")
+    vector: Optional[str] = Field(None, description="Complex control vector that drives refinement. Default 'z'.")
+
 class RunExperimentRequest(BaseModel):
     model_name: str = Field(..., description="Model template file name (e.g., randles_cell.j2)")
     model_params: dict = Field(default_factory=dict)
     control_name: str = Field(..., description="Control template file name (e.g., eis_control.j2)")
     control_params: dict = Field(default_factory=dict)
     sim_id: Optional[str] = None
+    engine: Optional[str] = Field(None, description="Simulation engine: 'ngspice' or 'native' (NumPy AC solver with automatic ngspice fallback). Defaults to the server setting.")
+    sampling: Optional[SamplingOptions] = Field(None, description="AC frequency sampling. Adaptive sampling uses the native engine.")
+    id_scheme: Optional[str] = Field(None, description="'timestamp' or 'content' (sim_id = hash of the merged netlist and engine version; identical experiments reuse one run). Defaults to the server setting.")
+    persistence: Optional[str] = Field(None, description="Files kept for the run: 'all', 'data' (artifacts without netlists) or 'minimal' (data files and manifest). Defaults to the server setting.")
+    timeout: Optional[float] = Field(None, gt=0, description="ngspice time budget in seconds. Defaults to the control's `timeout` metadata, else the server setting; capped by the server.")
+
+class RunBatchRequest(BaseModel):
+    model_name: str = Field(..., description="Model template file name (e.g., randles_cell.j2)")
+    control_name: str = Field(..., description="Control template file name (e.g., eis_control.j2)")
+    param_sets: Union[List[Dict[str, float]], Dict[str, List[float]]] = Field(..., description="Model parameter sets: a list of {name: value} (same keys) or {name: [values]} of equal length. One run per set.")
+    model_params: dict = Field(default_factory=dict, description="Values of the parameters that are not swept.")
+    control_params: dict = Field(default_factory=dict)
+    batch_id: Optional[str] = Field(None, description="Id of the batch; its points are <batch_id>_0000, ... unless id_scheme is 'content'.")
+    id_scheme: Optional[str] = Field(None, description="'timestamp' or 'content' (points already simulated are reused). Defaults to the server setting.")
+    persistence: Optional[str] = Field(None, description="Files kept for each point: 'all', 'data' or 'minimal'. Defaults to the server setting.")
+    timeout: Optional[float] = Field(None, gt=0, description="ngspice time budget per point in seconds. Defaults to the control's `timeout` metadata, else the server setting; capped by the server.")
+    chunk_size: Optional[int] = Field(None, ge=1, description="Points per ngspice invocation; invocations run in parallel. Default: all points in one.")
+
+class CancelRunRequest(BaseModel):
+    sim_id: str = Field(..., description="sim_id of an executing run or batch_id of an executing batch (as passed to or returned by run_experiment/run_batch).")
+
+class FitModelRequest(BaseModel):
+    model_name: str = Field(..., description="Model template file name (e.g., randles_cell.j2)")
+    control_name: str = Field(..., description="AC control template defining the impedance vector (e.g., eis_control.j2)")
+    frequencies: List[float] = Field(..., description="Measured frequencies (Hz)")
+    z_real: List[float] = Field(..., description="Measured real part of the impedance (Ohm)")
+    z_imag: List[float] = Field(..., description="Measured imaginary part of the impedance (Ohm)")
+    fit_parameters: Optional[List[str]] = Field(None, description="Parameters to fit. Defaults to every metadata parameter with a range.")
+    initial: Dict[str, float] = Field(default_factory=dict, description="Initial guesses. Defaults to metadata defaults.")
+    bounds: Dict[str, List[float]] = Field(default_factory=dict, description="[lower, upper] overrides of the metadata ranges.")
+    model_params: dict = Field(default_factory=dict, description="Fixed values for parameters that are not fitted.")
+    control_params: dict = Field(default_factory=dict)
+    vector: str = Field("z", description="Control vector holding the complex impedance.")
+    weighting: str = Field("modulus", description="Residual weighting: 'modulus' (relative) or 'unit'.")
+    max_evaluations: int = Field(100, ge=1, le=10000)
+
+class SensitivityRequest(BaseModel):
+    model_name: str = Field(..., description="Model template file name (e.g., randles_cell.j2)")
+    control_name: str = Field(..., description="AC control template defining the impedance vector (e.g., eis_control.j2)")
+    model_params: dict = Field(default_factory=dict, description="Base point. Unset parameters use their metadata defaults.")
+    control_params: dict = Field(default_factory=dict)
+    parameters: Optional[List[str]] = Field(None, description="Parameters to analyse. Defaults to every numeric metadata parameter.")
+    rel_step: float = Field(1e-3, gt=0, lt=0.5, description="Relative central-difference step.")
+    vector: str = Field("z", description="Control vector holding the complex impedance.")
+    sim_id: Optional[str] = None
+
+class MonteCarloRequest(BaseModel):
+    model_name: str = Field(..., description="Model template file name (e.g., randles_cell.j2)")
+    control_name: str = Field(..., description="AC control template defining the impedance vector (e.g., eis_control.j2)")
+    samples: int = Field(1000, ge=1, le=10_000_000, description="Number of parameter sets to draw. Ignored by 'corners', which evaluates every range-endpoint combination.")
+    parameters: Optional[List[str]] = Field(None, description="Parameters to vary. Defaults to every parameter with a metadata range, plus those in distributions.")
+    distributions: dict = Field(default_factory=dict, description="Per-parameter overrides, e.g. {'r_val': {'distribution': 'uniform', 'low': 40, 'high': 60}}. normal takes mean/std, lognormal median/sigma.")
+    method: str = Field("normal", description="'normal', 'uniform' or 'lognormal' around the metadata defaults (range = +/- 3 sigma), or 'corners'.")
+    seed: Optional[int] = Field(None, ge=0, description="Seed for reproducible draws. Generated and returned when omitted.")
+    model_params: dict = Field(default_factory=dict, description="Values of the parameters that are not varied. Unset ones use their metadata defaults.")
+    control_params: dict = Field(default_factory=dict)
+    vector: str = Field("z", description="Control vector holding the complex impedance.")
+    percentiles: List[float] = Field([5, 50, 95], description="Percentiles of |Z| and phase to report per frequency.")
+    outlier_threshold: float = Field(3.0, gt=0, description="Keep spectra whose RMS deviation from the mean (ln|Z| and phase, in standard deviations) reaches this.")
+    max_outliers: int = Field(20, ge=0, le=1000, description="Upper bound on the outlier spectra kept.")
+    chunk_size: int = Field(256, ge=1, le=100000, description="Parameter sets solved per batched evaluation.")
+    workers: Optional[int] = Field(None, ge=1, le=64, description="Threads evaluating chunks in parallel. Default: up to 4.")
+    sim_id: Optional[str] = None
+
+class AnalyzeRunsRequest(BaseModel):
+    sim_ids: List[str] = Field(..., min_length=1, max_length=1000, description="AC runs to analyse (e.g. every run of a sweep).")
+    analyses: Optional[List[str]] = Field(None, description="'drt' (distribution of relaxation times) and/or 'kramers_kronig' (Lin-KK test). Default: both.")
+    vector: str = Field("z", description="Complex impedance vector of the runs.")
+    options: dict = Field(default_factory=dict, description="Per-analysis options, e.g. {'drt': {'regularization': 1e-4}, 'kramers_kronig': {'tolerance': 0.005}}.")
+
+class PostProcessRequest(BaseModel):
+    sim_id: str
+    stages: Optional[List[str]] = Field(None, description="Post-processing stages to run (e.g. ['drt_plot']); the stages they depend on run too. Default: the run's lazy stages.")
+    options: dict = Field(default_factory=dict, description="Per-stage options overriding the control's, e.g. {'drt': {'regularization': 1e-4}}.")
+
+class CompareRunsRequest(BaseModel):
+    sim_ids: List[str] = Field(..., min_length=2, description="Runs to compare; the first is the reference.")
+    vectors: Optional[List[str]] = Field(None, description="Data vectors to compare (e.g. ['z_real', 'z_imag']). Defaults to all shared vectors.")
+    points: Optional[int] = Field(None, ge=2, le=100000, description="Resample the common axis to this many points. Defaults to the reference run's points.")
+    bands: Optional[Union[int, List[float]]] = Field(None, description="Number of error bands, or explicit band edges. Defaults to decades for AC sweeps.")
+
+class GetDataRequest(BaseModel):
+    sim_id: str
+    vectors: Optional[List[str]] = Field(None, description="Vectors to return (e.g. ['z_real', 'z_imag']). Defaults to all. Decimation is driven by the first.")
+    max_points: int = Field(500, ge=2, le=100000, description="Point budget for the returned data.")
+    method: str = Field("lttb", description="'lttb' (shape preserving) or 'minmax' (envelope, keeps spikes).")
+    start: Optional[float] = Field(None, description="Lower bound of the time/frequency window.")
+    stop: Optional[float] = Field(None, description="Upper bound of the time/frequency window.")
+
+class ValidateParametersRequest(BaseModel):
+    model_name: str
+    control_name: Optional[str] = None
+    model_params: dict = Field(default_factory=dict)
+    control_params: dict = Field(default_factory=dict)
+    param_sets: Optional[Union[List[Dict[str, float]], Dict[str, List[float]]]] = Field(None, description="Model sweep grid to check in one pass: a list of parameter dicts or a dict of equal-length value lists.")
+
+class ListTemplatesRequest(BaseModel):
+    name: Optional[str] = Field(None, description="Case-insensitive substring of the template name, or a glob such as 'randles*'.")
+    tags: Optional[Union[str, List[str]]] = Field(None, description="Only templates whose metadata lists all of these tags.")
+    parameters: Optional[Union[str, List[str]]] = Field(None, description="Only templates declaring all of these parameters.")
+    fields: Optional[List[str]] = Field(None, description="Metadata keys to return (e.g. ['description']); 'sha256' adds the content hash. Default: all metadata.")
+    cursor: Optional[str] = Field(None, description="`next_cursor` of the previous page.")
+    limit: Optional[int] = Field(None, ge=1, le=500, description="Page size. Default 100.")
+    if_none_match: Optional[str] = Field(None, description="`etag` of a previous identical request; returns only `not_modified` if nothing changed.")
 
 class JSONRPCRequest(BaseModel):
     jsonrpc: str
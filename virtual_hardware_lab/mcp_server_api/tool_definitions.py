@@ -1,19 +1,74 @@
 
 
-from virtual_hardware_lab.mcp_server_api.schemas import RunExperimentRequest
+from virtual_hardware_lab.mcp_server_api.schemas import RunExperimentRequest, RunBatchRequest, FitModelRequest, SensitivityRequest, MonteCarloRequest, AnalyzeRunsRequest, PostProcessRequest, CompareRunsRequest, GetDataRequest, ValidateParametersRequest, ListTemplatesRequest, CancelRunRequest
 
 try:
     run_exp_schema = RunExperimentRequest.model_json_schema()
 except Exception:
     run_exp_schema = {"type": "object", "additionalProperties": True}
 
+try:
+    run_batch_schema = RunBatchRequest.model_json_schema()
+except Exception:
+    run_batch_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    fit_model_schema = FitModelRequest.model_json_schema()
+except Exception:
+    fit_model_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    sensitivity_schema = SensitivityRequest.model_json_schema()
+except Exception:
+    sensitivity_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    monte_carlo_schema = MonteCarloRequest.model_json_schema()
+except Exception:
+    monte_carlo_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    analyze_runs_schema = AnalyzeRunsRequest.model_json_schema()
+except Exception:
+    analyze_runs_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    post_process_schema = PostProcessRequest.model_json_schema()
+except Exception:
+    post_process_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    compare_runs_schema = CompareRunsRequest.model_json_schema()
+except Exception:
+    compare_runs_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    get_data_schema = GetDataRequest.model_json_schema()
+except Exception:
+    get_data_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    validate_parameters_schema = ValidateParametersRequest.model_json_schema()
+except Exception:
+    validate_parameters_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    list_templates_schema = ListTemplatesRequest.model_json_schema()
+except Exception:
+    list_templates_schema = {"type": "object", "additionalProperties": True}
+
+try:
+    cancel_run_schema = CancelRunRequest.model_json_schema()
+except Exception:
+    cancel_run_schema = {"type": "object", "additionalProperties": True}
+
 TOOLS = [
     {
         "id": "list_models",
         "name": "list_models",
         "title": "List Models",
-        "description": "List available NGSpice model templates (GET /models).",
-        "inputSchema": {"type": "object", "properties": {}}, 
+        "description": "List available NGSpice model templates (GET /models), paginated and filterable by name, tags and parameters.",
+        "inputSchema": list_templates_schema,
         "outputSchema": None,
         "version": "1.0",
     },
@@ -21,8 +76,8 @@ TOOLS = [
         "id": "list_controls",
         "name": "list_controls",
         "title": "List Controls",
-        "description": "List available control templates (GET /controls).",
-        "inputSchema": {"type": "object", "properties": {}},
+        "description": "List available control templates (GET /controls), paginated and filterable by name, tags and parameters.",
+        "inputSchema": list_templates_schema,
         "outputSchema": None,
         "version": "1.0",
     },
@@ -35,6 +90,15 @@ TOOLS = [
         "outputSchema": None,
         "version": "1.0",
     },
+    {
+        "id": "run_batch",
+        "name": "run_batch",
+        "title": "Run Batch",
+        "description": "Run one SPICE simulation per model parameter set in a single ngspice invocation (alterparam/reset loop); every point becomes a normal run with its own sim_id and manifest.",
+        "inputSchema": run_batch_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
     {
         "id": "get_results",
         "name": "get_results",
@@ -48,6 +112,87 @@ TOOLS = [
         "outputSchema": None,
         "version": "1.0",
     },
+    {
+        "id": "cancel_run",
+        "name": "cancel_run",
+        "title": "Cancel Run",
+        "description": "Cancel an executing simulation; its ngspice process is killed and run_experiment returns an error.",
+        "inputSchema": cancel_run_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "fit_model",
+        "name": "fit_model",
+        "title": "Fit Model",
+        "description": "Fit model parameters to measured impedance data (bounded least squares over metadata ranges). Returns fitted values, covariance and residuals.",
+        "inputSchema": fit_model_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "sensitivity",
+        "name": "sensitivity",
+        "title": "Parameter Sensitivity",
+        "description": "Rank model parameters by their influence on the impedance spectrum (normalised d|Z|/dp and dphase/dp over the sweep). Full matrices are stored as the sensitivity.npz artifact.",
+        "inputSchema": sensitivity_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "monte_carlo",
+        "name": "monte_carlo",
+        "title": "Monte Carlo Analysis",
+        "description": "Sample model parameters (normal, uniform, lognormal or range corners, seeded) and aggregate the impedance spectra: per-frequency mean, spread and percentiles of |Z| and phase. Stores only the aggregate (monte_carlo.npz) and outlier spectra (outliers.npz).",
+        "inputSchema": monte_carlo_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "analyze_runs",
+        "name": "analyze_runs",
+        "title": "Analyze EIS Runs",
+        "description": "Distribution of relaxation times (DRT peaks, R_inf, polarisation resistance) and Kramers-Kronig validity (Lin-KK residuals) of AC runs, computed server-side in parallel and cached per run.",
+        "inputSchema": analyze_runs_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "post_process",
+        "name": "post_process",
+        "title": "Post-Process Run",
+        "description": "Run post-processing stages (nyquist_plot, bode_plot, waveform_plot, summary, drt, kramers_kronig, drt_plot) on a finished run, with their dependencies, in a worker pool. Results are cached per run, stage and options. Defaults to the stages the control declared lazy.",
+        "inputSchema": post_process_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "get_data",
+        "name": "get_data",
+        "title": "Get Data",
+        "description": "Fetch named data vectors of a run, decimated server-side (LTTB or min/max) to a point budget, optionally windowed in time/frequency.",
+        "inputSchema": get_data_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "compare_runs",
+        "name": "compare_runs",
+        "title": "Compare Runs",
+        "description": "Compare the data of several sim_ids against the first on a common axis. Returns RMS, max and per-band deviation per vector instead of raw data.",
+        "inputSchema": compare_runs_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
+    {
+        "id": "validate_parameters",
+        "name": "validate_parameters",
+        "title": "Validate Parameters",
+        "description": "Check model/control parameters (or a whole model sweep grid) against the templates' declared types, ranges and constraints without running anything. Returns structured errors.",
+        "inputSchema": validate_parameters_schema,
+        "outputSchema": None,
+        "version": "1.0",
+    },
     {
         "id": "upload_model",
         "name": "upload_model",
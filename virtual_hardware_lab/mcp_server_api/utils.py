@@ -1,5 +1,6 @@
 
 
+import os
 from typing import Any
 from fastapi import HTTPException
 import logging
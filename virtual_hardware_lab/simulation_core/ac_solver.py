@@ -0,0 +1,614 @@
+"""
+Native small-signal AC solver for linear R/L/C/V/I netlists.
+
+Stamps the MNA matrices (A(w) = G + jwC) once and solves every frequency in one
+batched `numpy.linalg.solve`. A small `.control` interpreter evaluates `let`
+vectors and writes `wrdata` files in the ngspice text layout and `write`
+rawfiles (binary or ASCII) in the ngspice rawfile format. Anything outside
+the supported subset raises `UnsupportedNetlistError` so callers can fall back
+to ngspice.
+"""
+import os
+import re
+from typing import Optional
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.netlist import (
+    ExpressionError,
+    UnsupportedNetlistError,
+    evaluate_expression,
+    flatten_netlist,
+    parse_netlist,
+    parse_spice_number,
+    tokenize_card,
+)
+from virtual_hardware_lab.simulation_core.rawfile import RAWFILE_TYPES, write_rawfile
+
+NATIVE_ENGINE_VERSION = "vhl-native-ac 0.1.0"
+
+# Control commands that have no effect on the native engine's results.
+_IGNORED_CONTROL_COMMANDS = {"echo", "unset", "option", "options", "quit", "exit", "plot", "display", "setplot", "destroy", "rusage"}
+_VECTOR_ACCESS_RE = re.compile(r"\b([vi])\(\s*([^()]+?)\s*\)", re.IGNORECASE)
+_BRANCH_VECTOR_RE = re.compile(r"\b([\w.]+)#branch\b", re.IGNORECASE)
+
+
+def ac_frequencies(sweep: str, points, fstart, fstop) -> np.ndarray:
+    """Returns the frequency grid ngspice uses for `.ac {dec|oct|lin} points fstart fstop`."""
+    sweep = sweep.lower()
+    points = int(points)
+    fstart = float(fstart)
+    fstop = float(fstop)
+    if points < 1 or fstart <= 0 or fstop < fstart:
+        raise UnsupportedNetlistError(f"Invalid AC sweep: {sweep} {points} {fstart} {fstop}")
+    if sweep == "lin":
+        return np.linspace(fstart, fstop, points)
+    if sweep not in ("dec", "oct"):
+        raise UnsupportedNetlistError(f"Unsupported AC sweep type: {sweep}")
+    base = 10.0 if sweep == "dec" else 2.0
+    count = int(np.floor(points * np.log(fstop / fstart) / np.log(base) + 1e-9)) + 1
+    return fstart * base ** (np.arange(count) / points)
+
+
+def _parse_ac_tokens(tokens: list[str]) -> np.ndarray:
+    if len(tokens) < 4:
+        raise UnsupportedNetlistError(f"Malformed AC analysis: {' '.join(tokens)}")
+    return ac_frequencies(tokens[0], parse_spice_number(tokens[1]), parse_spice_number(tokens[2]), parse_spice_number(tokens[3]))
+
+
+def build_mna(elements: list[dict]) -> dict:
+    """
+    Stamps flattened elements into MNA matrices so that A(w) = G + jw*C and A x = b.
+
+    Unknowns are node voltages (ground excluded) followed by branch currents of
+    voltage sources and inductors. Element values may be NumPy arrays; the
+    matrices then carry the broadcast batch shape as leading dimensions.
+    """
+    node_index = {}
+    branch_index = {}
+    for element in elements:
+        for node in element["nodes"]:
+            if node != "0" and node not in node_index:
+                node_index[node] = len(node_index)
+    for element in elements:
+        if element["type"] in ("v", "l"):
+            branch_index[element["name"]] = len(node_index) + len(branch_index)
+
+    size = len(node_index) + len(branch_index)
+    if size == 0:
+        raise UnsupportedNetlistError("Netlist has no nodes to solve for.")
+
+    value_shapes = [np.shape(e["value"]) for e in elements] + [np.shape(e.get("ac", 0j)) for e in elements]
+    batch_shape = np.broadcast_shapes(*value_shapes) if value_shapes else ()
+    G = np.zeros(batch_shape + (size, size), dtype=float)
+    C = np.zeros(batch_shape + (size, size), dtype=float)
+    b = np.zeros(batch_shape + (size,), dtype=complex)
+
+    def stamp_admittance(matrix, a, c, value):
+        ia = node_index.get(a)
+        ic = node_index.get(c)
+        if ia is not None:
+            matrix[..., ia, ia] += value
+        if ic is not None:
+            matrix[..., ic, ic] += value
+        if ia is not None and ic is not None:
+            matrix[..., ia, ic] -= value
+            matrix[..., ic, ia] -= value
+
+    def stamp_branch(k, a, c):
+        ia = node_index.get(a)
+        ic = node_index.get(c)
+        if ia is not None:
+            G[..., ia, k] += 1.0
+            G[..., k, ia] += 1.0
+        if ic is not None:
+            G[..., ic, k] -= 1.0
+            G[..., k, ic] -= 1.0
+
+    for element in elements:
+        kind = element["type"]
+        a, c = element["nodes"]
+        value = element["value"]
+        if kind == "r":
+            if np.any(np.asarray(value) == 0):
+                raise UnsupportedNetlistError(f"Zero-valued resistor {element['name']}")
+            stamp_admittance(G, a, c, 1.0 / np.asarray(value, dtype=float))
+        elif kind == "c":
+            stamp_admittance(C, a, c, np.asarray(value, dtype=float))
+        elif kind == "l":
+            k = branch_index[element["name"]]
+            stamp_branch(k, a, c)
+            C[..., k, k] -= np.asarray(value, dtype=float)
+        elif kind == "v":
+            k = branch_index[element["name"]]
+            stamp_branch(k, a, c)
+            b[..., k] += element["ac"]
+        elif kind == "i":
+            # SPICE current sources push current from n+ through the source to n-.
+            ia = node_index.get(a)
+            ic = node_index.get(c)
+            if ia is not None:
+                b[..., ia] -= element["ac"]
+            if ic is not None:
+                b[..., ic] += element["ac"]
+
+    return {"node_index": node_index, "branch_index": branch_index, "G": G, "C": C, "b": b, "batch_shape": batch_shape}
+
+
+def solve_mna(system: dict, frequencies: np.ndarray) -> np.ndarray:
+    """
+    Solves the MNA system for all frequencies with one batched `numpy.linalg.solve`.
+    Returns an array of shape `batch_shape + (n_freq, n_unknowns)`.
+    """
+    omega = 2j * np.pi * np.asarray(frequencies, dtype=float)
+    G = system["G"][..., None, :, :]
+    C = system["C"][..., None, :, :]
+    A = G + omega[:, None, None] * C
+    b = np.broadcast_to(system["b"][..., None, :], A.shape[:-1])
+    try:
+        return np.linalg.solve(A, b[..., None])[..., 0]
+    except np.linalg.LinAlgError as e:
+        raise UnsupportedNetlistError(f"Singular MNA matrix ({e}); circuit may have floating nodes.") from e
+
+
+def prepare_ac_netlist(netlist_text: str, param_overrides: Optional[dict] = None) -> dict:
+    """
+    Parses a merged netlist and checks it is within the native engine's subset.
+    Returns the parsed netlist, its flattened elements and the `.ac` card tokens (if any).
+    `param_overrides` is forwarded to `flatten_netlist` (values may be arrays).
+    """
+    parsed = parse_netlist(netlist_text)
+    ac_tokens = None
+    for card in parsed["dot_cards"]:
+        tokens = tokenize_card(card)
+        directive = tokens[0].lower()
+        if directive == ".ac":
+            ac_tokens = tokens[1:]
+        elif directive in (".option", ".options", ".title", ".temp"):
+            continue
+        else:
+            raise UnsupportedNetlistError(f"Unsupported directive for native AC engine: {tokens[0]}")
+    elements = flatten_netlist(parsed, param_overrides)
+    return {"parsed": parsed, "elements": elements, "ac_tokens": ac_tokens}
+
+
+def run_native_ac(netlist_text: str) -> dict:
+    """
+    Runs a linear AC netlist natively.
+
+    Returns a dict with:
+    - `vectors`: the final vector table (lower-cased names, including `frequency`).
+    - `outputs`: a list of (filename, [vector names], options) requested via `wrdata`
+      or `write`; `options["format"]` is "wrdata" or "raw".
+    - `log`: text resembling the ngspice console output (print tables, notes).
+    """
+    try:
+        return execute_ac_control(prepare_ac_netlist(netlist_text))
+    except ValueError as e:
+        # Malformed numbers/expressions: let ngspice produce the authoritative error.
+        raise UnsupportedNetlistError(str(e)) from e
+
+
+def execute_ac_control(prepared: dict, elements: Optional[list] = None, batched: bool = False, frequencies: Optional[np.ndarray] = None) -> dict:
+    """
+    Executes the `.control` block of a prepared netlist against `elements`
+    (default: the prepared elements). With `batched=True` element values carry a
+    leading parameter-set dimension and console `print` output is skipped.
+    `frequencies`, if given, replaces the grid of every AC analysis (e.g. to
+    evaluate a model at measured frequencies).
+    """
+    control = prepared["parsed"]["control"]
+    if not control:
+        # Without a control block ngspice runs the .ac card and writes nothing.
+        control = ["run"]
+
+    state = {
+        "elements": prepared["elements"] if elements is None else elements,
+        "batched": batched,
+        "frequencies": None if frequencies is None else np.asarray(frequencies, dtype=float),
+        "vectors": {},
+        "outputs": [],
+        "log": [f"Native AC engine ({NATIVE_ENGINE_VERSION})", ""],
+        "variables": {},
+        "solution": None,
+    }
+    for line in control:
+        _execute_control_line(line, prepared, state)
+
+    if state["solution"] is None:
+        raise UnsupportedNetlistError("Control block never runs an AC analysis.")
+    return {"title": prepared["parsed"]["title"], "vectors": state["vectors"], "outputs": state["outputs"], "log": "\n".join(state["log"]) + "\n"}
+
+
+ADAPTIVE_SAMPLING_DEFAULTS = {
+    "phase_tol_deg": 5.0,
+    "curvature_tol": 0.005,
+    "max_points": 2000,
+    "max_ppd": 200,
+    "vector": "z",
+}
+
+
+def refine_frequency_grid(evaluate, frequencies, phase_tol_deg=5.0, curvature_tol=0.005, max_points=2000, max_ppd=200) -> dict:
+    """
+    Adaptively refines a coarse frequency grid.
+
+    `evaluate(f)` returns complex responses of shape [n_vectors, len(f)]. An
+    interval is bisected (at its geometric midpoint) when, for any vector, the
+    phase changes by more than `phase_tol_deg` across it, or when an adjacent
+    point lies further than `curvature_tol` (relative to its magnitude) from the
+    chord joining its neighbours in the complex plane. Intervals narrower than
+    `max_ppd` points per decade are never split, and the grid never grows past
+    `max_points`. Only new points are evaluated.
+
+    Returns `{"frequencies", "values", "coarse_points", "iterations"}` with the
+    merged, sorted grid.
+    """
+    f = np.unique(np.asarray(frequencies, dtype=float))
+    z = np.atleast_2d(evaluate(f))
+    coarse_points = len(f)
+    min_ratio = 10.0 ** (1.0 / max_ppd)
+    iterations = 0
+    while len(f) < max_points:
+        phase_step = np.abs(np.diff(np.unwrap(np.angle(z), axis=-1), axis=-1))
+        flags = np.any(np.rad2deg(phase_step) > phase_tol_deg, axis=0)
+        if len(f) > 2:
+            # Distance of each interior point from the chord joining its neighbours (Nyquist-plane curvature).
+            chord = z[:, 2:] - z[:, :-2]
+            offset = z[:, 1:-1] - z[:, :-2]
+            chord_length = np.maximum(np.abs(chord), np.finfo(float).tiny)
+            deviation = np.abs(np.imag(offset * np.conj(chord))) / chord_length
+            scale = np.maximum(np.abs(z[:, 1:-1]), np.finfo(float).tiny)
+            curved = np.any(deviation / scale > curvature_tol, axis=0)
+            flags[:-1] |= curved
+            flags[1:] |= curved
+        flags &= f[1:] / f[:-1] > min_ratio
+        if not np.any(flags):
+            break
+        new_f = np.sqrt(f[:-1] * f[1:])[flags][: max_points - len(f)]
+        new_z = np.atleast_2d(evaluate(new_f))
+        order = np.argsort(np.concatenate([f, new_f]), kind="stable")
+        f = np.concatenate([f, new_f])[order]
+        z = np.concatenate([z, new_z], axis=-1)[:, order]
+        iterations += 1
+    return {"frequencies": f, "values": z, "coarse_points": coarse_points, "iterations": iterations}
+
+
+def run_native_ac_adaptive(netlist_text: str, sampling: dict) -> dict:
+    """
+    Runs a linear AC netlist natively with adaptive frequency sampling.
+
+    The control's own AC grid is used as the coarse sweep and refined with
+    `refine_frequency_grid` on the `sampling["vector"]` control vector (falling
+    back to all node voltages if the control does not define it). The control
+    block is then executed once on the merged grid, so `wrdata` outputs contain
+    one sorted dataset. The result carries a `sampling` summary.
+    """
+    options = dict(ADAPTIVE_SAMPLING_DEFAULTS)
+    options.update({k: v for k, v in sampling.items() if k != "mode" and v is not None})
+    try:
+        prepared = prepare_ac_netlist(netlist_text)
+        coarse = execute_ac_control(prepared, batched=True)
+        coarse_frequencies = np.real(coarse["vectors"]["frequency"])
+        vector = str(options["vector"]).lower()
+
+        def evaluate(frequencies):
+            vectors = execute_ac_control(prepared, batched=True, frequencies=frequencies)["vectors"]
+            if vector in vectors:
+                return vectors[vector]
+            return np.array([v for k, v in vectors.items() if k.startswith("v(")])
+
+        refined = refine_frequency_grid(
+            evaluate,
+            coarse_frequencies,
+            phase_tol_deg=float(options["phase_tol_deg"]),
+            curvature_tol=float(options["curvature_tol"]),
+            max_points=int(options["max_points"]),
+            max_ppd=float(options["max_ppd"]),
+        )
+        result = execute_ac_control(prepared, frequencies=refined["frequencies"])
+    except ValueError as e:
+        raise UnsupportedNetlistError(str(e)) from e
+
+    result["sampling"] = {
+        "mode": "adaptive",
+        "points": int(len(refined["frequencies"])),
+        "coarse_points": int(refined["coarse_points"]),
+        "iterations": int(refined["iterations"]),
+        "options": options,
+    }
+    result["log"] += f"Adaptive sampling: {len(refined['frequencies'])} points (coarse {refined['coarse_points']}, {refined['iterations']} refinement passes)\n"
+    return result
+
+
+def stack_element_sets(element_sets: list[list[dict]]) -> list[dict]:
+    """
+    Stacks several flattened netlists with identical topology into one element
+    list whose values are arrays with a leading parameter-set dimension.
+    """
+    first = element_sets[0]
+    topology = [(e["type"], e["name"], e["nodes"]) for e in first]
+    for elements in element_sets[1:]:
+        if [(e["type"], e["name"], e["nodes"]) for e in elements] != topology:
+            raise UnsupportedNetlistError("Circuit topology differs between parameter sets.")
+    stacked = []
+    for index, element in enumerate(first):
+        combined = dict(element)
+        combined["value"] = np.array([elements[index]["value"] for elements in element_sets])
+        if "ac" in element:
+            combined["ac"] = np.array([elements[index]["ac"] for elements in element_sets])
+        stacked.append(combined)
+    return stacked
+
+
+def _slice_elements(elements: list[dict], selection: slice) -> list[dict]:
+    sliced = []
+    for element in elements:
+        element = dict(element)
+        for key in ("value", "ac"):
+            if key in element and np.ndim(element[key]) > 0:
+                element[key] = element[key][selection]
+        sliced.append(element)
+    return sliced
+
+
+def evaluate_ac_batch(prepared: dict, elements: list[dict], n_sets: int, vector: str, chunk_size: Optional[int] = None, max_chunk_bytes: int = 64 * 1024 * 1024, frequencies: Optional[np.ndarray] = None) -> dict:
+    """
+    Evaluates a control vector for `n_sets` parameter sets at once.
+
+    `elements` carry per-set values as arrays of length `n_sets` (scalars are
+    shared). The topology is stamped per chunk with broadcast values and solved
+    with batched linear solves; chunks are sized so the assembled system stays
+    under `max_chunk_bytes` unless `chunk_size` is given.
+    Returns `{"frequencies": (n_freq,), "values": (n_sets, n_freq)}`.
+    """
+    vector = vector.lower()
+    if chunk_size is None:
+        probe = execute_ac_control(prepared, _slice_elements(elements, slice(0, 1)), batched=True, frequencies=frequencies)
+        n_freq = len(probe["vectors"]["frequency"])
+        size = build_mna(_slice_elements(elements, slice(0, 1)))["b"].shape[-1]
+        chunk_size = max(1, int(max_chunk_bytes // max(1, n_freq * size * size * 16)))
+
+    values = None
+    grid = None
+    for start in range(0, n_sets, chunk_size):
+        selection = slice(start, min(start + chunk_size, n_sets))
+        count = selection.stop - selection.start
+        result = execute_ac_control(prepared, _slice_elements(elements, selection), batched=True, frequencies=frequencies)
+        if vector not in result["vectors"]:
+            available = sorted(k for k in result["vectors"] if "(" not in k and "#" not in k)
+            raise KeyError(f"Vector '{vector}' not produced by the control block. Available: {available}")
+        grid = np.real(result["vectors"]["frequency"])
+        chunk = np.broadcast_to(result["vectors"][vector], (count, len(grid)))
+        if values is None:
+            values = np.empty((n_sets, len(grid)), dtype=np.result_type(chunk.dtype, complex))
+        values[selection] = chunk
+    return {"frequencies": grid, "values": values}
+
+
+def _analysis_frequencies(tokens: list[str], state: dict) -> np.ndarray:
+    if state["frequencies"] is not None:
+        return state["frequencies"]
+    return _parse_ac_tokens(tokens)
+
+
+def _run_analysis(frequencies: np.ndarray, prepared: dict, state: dict):
+    system = build_mna(state["elements"])
+    x = solve_mna(system, frequencies)
+    state["solution"] = {"system": system, "x": x}
+    vectors = {"frequency": frequencies.astype(complex)}
+    for node, index in system["node_index"].items():
+        vectors[f"v({node})"] = x[..., index]
+    for name, index in system["branch_index"].items():
+        vectors[f"{name}#branch"] = x[..., index]
+    state["vectors"] = vectors
+    state["log"].append(f"Circuit: {prepared['parsed']['title']}")
+    state["log"].append(f"No. of Data Rows : {len(frequencies)}")
+    state["log"].append(f"MNA size: {len(system['node_index'])} nodes, {len(system['branch_index'])} branches")
+
+
+def _execute_control_line(line: str, prepared: dict, state: dict):
+    parts = line.split(None, 1)
+    command = parts[0].lower()
+    argument = parts[1].strip() if len(parts) > 1 else ""
+
+    if command == "run":
+        if prepared["ac_tokens"] is None:
+            raise UnsupportedNetlistError("`run` without an .ac analysis card.")
+        _run_analysis(_analysis_frequencies(prepared["ac_tokens"], state), prepared, state)
+    elif command == "ac":
+        _run_analysis(_analysis_frequencies(argument.split(), state), prepared, state)
+    elif command == "set":
+        for name, value in re.findall(r"(\w+)\s*(?:=\s*(\S+))?", argument):
+            state["variables"][name.lower()] = value.lower() if value else True
+    elif command == "let":
+        if "=" not in argument:
+            raise UnsupportedNetlistError(f"Unsupported let syntax: {line}")
+        name, expression = argument.split("=", 1)
+        state["vectors"][name.strip().lower()] = _evaluate_vector_expression(expression, state)
+    elif command == "print":
+        if not state["batched"]:
+            _print_vectors(argument, state)
+    elif command == "wrdata":
+        tokens = argument.split()
+        if len(tokens) < 2:
+            raise UnsupportedNetlistError(f"Unsupported wrdata syntax: {line}")
+        names = []
+        for token in tokens[1:]:
+            key = _vector_key(token)
+            if key not in state["vectors"]:
+                state["vectors"][key] = _evaluate_vector_expression(token, state)
+            names.append(key)
+        state["outputs"].append((tokens[0], names, {
+            "format": "wrdata",
+            "singlescale": bool(state["variables"].get("wr_singlescale")),
+            "vecnames": bool(state["variables"].get("wr_vecnames")),
+        }))
+    elif command == "write":
+        tokens = argument.split()
+        filetype = str(state["variables"].get("filetype", "binary"))
+        if filetype not in RAWFILE_TYPES:
+            raise UnsupportedNetlistError(f"Unsupported rawfile type: {filetype}")
+        names = []
+        for token in tokens[1:]:
+            key = _vector_key(token)
+            if key not in state["vectors"]:
+                state["vectors"][key] = _evaluate_vector_expression(token, state)
+            names.append(key)
+        # Without a vector list ngspice writes every vector of the current plot.
+        names = names or [name for name in state["vectors"] if name != "frequency"]
+        state["outputs"].append((tokens[0] if tokens else "rawspice.raw", names, {"format": "raw", "filetype": filetype}))
+    elif command in _IGNORED_CONTROL_COMMANDS:
+        return
+    else:
+        raise UnsupportedNetlistError(f"Unsupported control command for native AC engine: {command}")
+
+
+def _vector_key(token: str) -> str:
+    return token.strip().lower()
+
+
+def _control_functions(state: dict) -> dict:
+    degrees = str(state["variables"].get("units", "")).startswith("degree")
+    to_units = (lambda r: np.rad2deg(r)) if degrees else (lambda r: r)
+    return {
+        "abs": np.abs,
+        "mag": np.abs,
+        "ph": lambda z: to_units(np.angle(z)),
+        "phase": lambda z: to_units(np.angle(z)),
+        "cph": lambda z: to_units(np.unwrap(np.angle(z), axis=-1)),
+        "real": np.real,
+        "re": np.real,
+        "imag": np.imag,
+        "im": np.imag,
+        "db": lambda z: 20.0 * np.log10(np.abs(z)),
+        "sqrt": np.sqrt,
+        "exp": np.exp,
+        "ln": np.log,
+        "log": np.log10,
+        "log10": np.log10,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "atan": np.arctan,
+        "mean": lambda z: np.mean(z, axis=-1, keepdims=True),
+    }
+
+
+def _evaluate_vector_expression(expression: str, state: dict):
+    """Evaluates a `let`/`wrdata` vector expression against the current vector table."""
+    if state["solution"] is None:
+        raise UnsupportedNetlistError("Vector expression evaluated before `run`.")
+    scope = {}
+    substitutions = {}
+
+    def placeholder(key: str) -> str:
+        if key not in state["vectors"]:
+            raise UnsupportedNetlistError(f"Unknown vector {key}")
+        name = substitutions.setdefault(key, f"_vec{len(substitutions)}")
+        scope[name] = state["vectors"][key]
+        return name
+
+    def replace_access(match):
+        kind = match.group(1).lower()
+        args = [a.strip().lower() for a in match.group(2).split(",")]
+        if kind == "i":
+            return placeholder(f"{args[0]}#branch")
+        if len(args) == 2:
+            return f"({_node_voltage(args[0], state, placeholder)} - {_node_voltage(args[1], state, placeholder)})"
+        return _node_voltage(args[0], state, placeholder)
+
+    text = _VECTOR_ACCESS_RE.sub(replace_access, expression.strip())
+    text = _BRANCH_VECTOR_RE.sub(lambda m: placeholder(f"{m.group(1).lower()}#branch"), text)
+    for key, value in state["vectors"].items():
+        if re.fullmatch(r"[a-z_]\w*", key):
+            scope[key] = value
+    try:
+        return np.asarray(evaluate_expression(text, scope, _control_functions(state)))
+    except ExpressionError as e:
+        raise UnsupportedNetlistError(f"Cannot evaluate vector expression {expression!r}: {e}") from e
+
+
+def _node_voltage(node: str, state: dict, placeholder) -> str:
+    if node in ("0", "gnd"):
+        return "0"
+    return placeholder(f"v({node})")
+
+
+def _print_vectors(argument: str, state: dict):
+    names = [_vector_key(token) for token in argument.split()]
+    columns = []
+    for name in names:
+        if name not in state["vectors"]:
+            state["vectors"][name] = _evaluate_vector_expression(name, state)
+        columns.append(np.atleast_1d(state["vectors"][name]))
+    scale = np.real(state["vectors"]["frequency"])
+    log = state["log"]
+    log.append("Index   frequency       " + "".join(f"{name:<16}" for name in names))
+    log.append("-" * 80)
+    for row, freq in enumerate(scale):
+        cells = [f"{row}", f"{freq:e}"]
+        for column in columns:
+            value = column[row] if len(column) > row else column[-1]
+            if np.iscomplexobj(column):
+                cells.append(f"{value.real:e},\t{value.imag:e}")
+            else:
+                cells.append(f"{value:e}")
+        log.append("\t".join(cells) + "\t")
+    log.append("")
+
+
+def format_wrdata(scale: np.ndarray, columns: list, singlescale: bool = False, vecnames: list = None) -> str:
+    """
+    Formats vectors the way ngspice's `wrdata` does: every vector is preceded by
+    the (real part of the) scale, complex vectors occupy two columns, and each
+    number is written as `% .8e` followed by a space.
+    """
+    scale = np.real(scale)
+    lines = []
+    if vecnames:
+        header = ["frequency"] if singlescale else []
+        for name in vecnames:
+            if not singlescale:
+                header.append("frequency")
+            header.append(name)
+        lines.append(" " + " ".join(f"{h:<15}" for h in header) + " ")
+    for row in range(len(scale)):
+        fields = [scale[row]] if singlescale else []
+        for column in columns:
+            value = column[row] if np.ndim(column) and len(column) > row else np.ravel(column)[-1]
+            if not singlescale:
+                fields.append(scale[row])
+            if np.iscomplexobj(column):
+                fields.extend([value.real, value.imag])
+            else:
+                fields.append(value)
+        lines.append("".join(f"{field: .8e} " for field in fields))
+    return "\n".join(lines) + "\n"
+
+
+def execute_native_ac(netlist_text: str, log_filepath: str, workdir: Optional[str] = None, sampling: Optional[dict] = None) -> dict:
+    """
+    Runs a netlist with the native engine and writes its artifacts: every
+    `wrdata` and `write` target (resolved relative to `workdir`, default the current
+    directory, like ngspice) plus a console-style log at `log_filepath`.
+    `sampling={"mode": "adaptive", ...}` refines the AC grid (see
+    `run_native_ac_adaptive`). Returns the engine result.
+    """
+    if sampling and sampling.get("mode", "fixed") == "adaptive":
+        result = run_native_ac_adaptive(netlist_text, sampling)
+    else:
+        result = run_native_ac(netlist_text)
+    scale = result["vectors"]["frequency"]
+    for filename, names, options in result["outputs"]:
+        path = filename if os.path.isabs(filename) or workdir is None else os.path.join(workdir, filename)
+        if options.get("format") == "raw":
+            vectors = {"frequency": scale, **{name: result["vectors"][name] for name in names}}
+            write_rawfile(path, "frequency", vectors, title=result.get("title", ""), filetype=options["filetype"])
+            continue
+        columns = [result["vectors"][name] for name in names]
+        with open(path, "w") as f:
+            f.write(format_wrdata(scale, columns, options["singlescale"], names if options["vecnames"] else None))
+    with open(log_filepath, "w") as f:
+        f.write(result["log"])
+    return result
@@ -0,0 +1,90 @@
+from virtual_hardware_lab.simulation_core.netlist import split_netlist
+
+# Echoed by the batch control block before each point, so the ngspice log can be split per point.
+BATCH_POINT_MARKER = "VHL_BATCH_POINT"
+# Control commands that would end the batch early; ngspice -b exits after the block anyway.
+_EXIT_COMMANDS = ("quit", "exit")
+
+
+def substitute_symbols(text: str, values: dict) -> str:
+    """Replaces the `{symbol}` expressions of a symbolically rendered netlist with the values a concrete rendering shows."""
+    for symbol, value in values.items():
+        text = text.replace("{" + symbol + "}", str(value))
+    return text
+
+
+def build_batch_netlist(symbolic_netlist: str, point_values: list, point_controls: list) -> str:
+    """
+    Builds one netlist that simulates every parameter set of a batch in a
+    single ngspice invocation.
+
+    `symbolic_netlist` is the merged netlist rendered with each swept
+    parameter as a `{symbol}` expression; its own `.control` block is
+    dropped. `point_values` holds each point's {symbol: value} and
+    `point_controls` the control lines of each point's own netlist (which
+    differ only in their output paths). The symbols become top-level
+    `.param`s, and the control block repeats, per point:
+
+        echo VHL_BATCH_POINT <i>
+        alterparam <symbol> = <value>
+        reset
+        <the point's control lines>
+        destroy all
+
+    `reset` re-expands the circuit with the altered parameters, so the
+    netlist is parsed once; `destroy all` drops the point's plots once its
+    outputs are written.
+    """
+    if not point_values or len(point_values) != len(point_controls):
+        raise ValueError("A batch needs one control block per parameter set.")
+    lines = symbolic_netlist.splitlines()
+    title, body, in_control = lines[0] if lines else "", [], False
+    for line in lines[1:]:
+        lowered = line.strip().lower()
+        if lowered.startswith(".control"):
+            in_control = True
+        elif lowered.startswith(".endc"):
+            in_control = False
+        elif not in_control and lowered != ".end":
+            body.append(line)
+    params = [f".param {symbol} = {_format_value(value)}" for symbol, value in point_values[0].items()]
+    control = [".control"]
+    for index, (values, control_lines) in enumerate(zip(point_values, point_controls)):
+        control.append(f"echo {BATCH_POINT_MARKER} {index}")
+        control += [f"alterparam {symbol} = {_format_value(value)}" for symbol, value in values.items()]
+        control.append("reset")
+        control += [line for line in control_lines if line.split()[0].lower() not in _EXIT_COMMANDS]
+        control.append("destroy all")
+    control.append(".endc")
+    return "\n".join([title, "* --- batch parameters ---", *params, *body, *control, ".end", ""])
+
+
+def point_control_lines(merged_netlist: str) -> list:
+    """The `.control` lines of a point's merged netlist; raises ValueError if it has none to repeat."""
+    _, _, control_lines = split_netlist(merged_netlist)
+    if not any(line.split()[0].lower() == "run" for line in control_lines):
+        raise ValueError("Batched runs need a control with a .control block that calls 'run'.")
+    return control_lines
+
+
+def split_batch_log(log: str, n_points: int) -> list:
+    """
+    Splits the console output of a batch into each point's part, at the
+    markers echoed by `build_batch_netlist`. Output before the first marker
+    (ngspice's banner and the circuit parse) is common to all points and
+    dropped; points whose marker never appeared get an empty log.
+    """
+    parts = [[] for _ in range(n_points)]
+    current = None
+    for line in log.splitlines(keepends=True):
+        tokens = line.split()
+        if len(tokens) == 2 and tokens[0] == BATCH_POINT_MARKER and tokens[1].isdigit() and int(tokens[1]) < n_points:
+            current = int(tokens[1])
+            continue
+        if current is not None:
+            parts[current].append(line)
+    return ["".join(part) for part in parts]
+
+
+def _format_value(value) -> str:
+    return repr(float(value))
@@ -0,0 +1,80 @@
+from typing import Optional
+
+import numpy as np
+
+
+def common_axis(axes: list, log: bool = False, points: Optional[int] = None) -> np.ndarray:
+    """
+    Returns the comparison axis for several runs: the overlap of their ranges,
+    sampled at the first run's points inside it, or at `points` evenly spaced
+    (log-spaced if `log`) values.
+    """
+    lo = max(float(np.min(axis)) for axis in axes)
+    hi = min(float(np.max(axis)) for axis in axes)
+    if lo > hi:
+        raise ValueError("Runs do not share an overlapping axis range.")
+    if points:
+        return np.geomspace(lo, hi, points) if log else np.linspace(lo, hi, points)
+    reference = np.sort(np.asarray(axes[0], dtype=float))
+    # Tolerate round-off in the limits so shared end points are kept.
+    eps = 1e-12 * max(abs(lo), abs(hi), 1e-300)
+    return reference[(reference >= lo - eps) & (reference <= hi + eps)].clip(lo, hi)
+
+
+def interpolate_onto(axis: np.ndarray, values: np.ndarray, target: np.ndarray, log: bool = False) -> np.ndarray:
+    """Linearly interpolates (in log-axis space if `log`) real or complex `values` onto `target`."""
+    axis = np.asarray(axis, dtype=float)
+    order = np.argsort(axis)
+    x, x_new = (np.log10(axis[order]), np.log10(target)) if log else (axis[order], target)
+    values = np.asarray(values)[order]
+    if np.iscomplexobj(values):
+        return np.interp(x_new, x, values.real) + 1j * np.interp(x_new, x, values.imag)
+    return np.interp(x_new, x, values)
+
+
+def band_edges(axis: np.ndarray, log: bool = False, n_bands: Optional[int] = None) -> np.ndarray:
+    """
+    Default error bands: whole decades on a log axis, otherwise `n_bands` (4)
+    equal slices. An axis without extent gets one band.
+    """
+    lo, hi = float(axis[0]), float(axis[-1])
+    if lo == hi:
+        return np.array([lo, hi])
+    if log and not n_bands:
+        decades = np.arange(np.floor(np.log10(lo)), np.ceil(np.log10(hi)) + 1)
+        edges = np.clip(10.0 ** decades, lo, hi)
+        return np.unique(edges)
+    n_bands = n_bands or 4
+    return np.geomspace(lo, hi, n_bands + 1) if log else np.linspace(lo, hi, n_bands + 1)
+
+
+def residual_metrics(axis: np.ndarray, reference: np.ndarray, other: np.ndarray, edges: np.ndarray) -> dict:
+    """
+    RMS and maximum absolute deviation of `other` from `reference` on a shared
+    axis (complex values use the modulus of the difference), the RMS relative to
+    the reference RMS, and the same metrics per band between `edges` (points
+    outside the edges belong to no band).
+    """
+    deviation = np.abs(np.asarray(other) - np.asarray(reference))
+    scale = np.sqrt(np.mean(np.abs(reference) ** 2))
+    peak = int(np.argmax(deviation))
+    rms = float(np.sqrt(np.mean(deviation ** 2)))
+    # Assign every point within the edges to one band; the last band includes its upper edge.
+    inside = (axis >= edges[0]) & (axis <= edges[-1])
+    band_index = np.minimum(np.searchsorted(edges, axis[inside], side="right") - 1, len(edges) - 2)
+    counts = np.bincount(band_index, minlength=len(edges) - 1)
+    sums = np.bincount(band_index, weights=deviation[inside] ** 2, minlength=len(edges) - 1)
+    maxima = np.zeros(len(edges) - 1)
+    np.maximum.at(maxima, band_index, deviation[inside])
+    bands = [
+        {"range": [float(edges[i]), float(edges[i + 1])], "points": int(counts[i]),
+         "rms": float(np.sqrt(sums[i] / counts[i])), "max_abs": float(maxima[i])}
+        for i in range(len(edges) - 1) if counts[i]
+    ]
+    return {
+        "rms": rms,
+        "relative_rms": rms / scale if scale > 0 else None,
+        "max_abs": float(deviation[peak]),
+        "max_at": float(axis[peak]),
+        "bands": bands,
+    }
@@ -0,0 +1,81 @@
+import numpy as np
+
+DECIMATION_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `n_out` indices of (x, y) that keep
+    the visual shape of the curve. The first and last points are always kept;
+    every bucket in between contributes the point forming the largest triangle
+    with the previously selected point and the mean of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = hi, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        next_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        ax, ay = x[previous], y[previous]
+        area = np.abs((ax - next_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y - ay))
+        previous = lo + int(np.argmax(area))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max envelope: splits the samples into `(n_out - 2) // 2` buckets and keeps
+    the minimum and maximum of each plus both end points (in index order), so
+    peaks and glitches survive. Budgets below 4 have no room for a bucket: they
+    keep the end points and, given 3, the sample farthest from the mean.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    if n_out < 4:
+        if n_out < 3:
+            return np.array([0, n - 1])
+        extreme = 1 + int(np.argmax(np.abs(y[1:-1] - y.mean())))
+        return np.array([0, extreme, n - 1])
+    n_buckets = (n_out - 2) // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    # Pad each bucket to a common width so argmin/argmax run over a 2-D view in one pass.
+    width = int(np.max(np.diff(edges)))
+    positions = edges[:-1, None] + np.arange(width)[None, :]
+    valid = positions < edges[1:, None]
+    positions = np.minimum(positions, n - 1)
+    values = y[positions]
+    low = np.argmin(np.where(valid, values, np.inf), axis=1)
+    high = np.argmax(np.where(valid, values, -np.inf), axis=1)
+    rows = np.arange(n_buckets)
+    picked = np.concatenate([positions[rows, low], positions[rows, high], [0, n - 1]])
+    return np.unique(picked)
+
+
+def decimate(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb", log_x: bool = False) -> np.ndarray:
+    """
+    Returns the indices to keep so that (x, y) fits in `n_out` points. Complex
+    `y` is decimated on its modulus; `log_x` runs LTTB in log10(x) space, which
+    suits frequency sweeps.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation method '{method}'. Expected one of {DECIMATION_METHODS}.")
+    if n_out < 2:
+        raise ValueError("The point budget must be at least 2.")
+    y = np.abs(y) if np.iscomplexobj(y) else np.asarray(y, dtype=float)
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    x = np.log10(x) if log_x else np.asarray(x, dtype=float)
+    return lttb_indices(x, y, n_out)
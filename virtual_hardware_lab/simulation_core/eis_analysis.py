@@ -0,0 +1,188 @@
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.lazy_import import LazyModule
+
+optimize = LazyModule("scipy.optimize")
+
+# Bump when an analysis changes its results, so cached ones are recomputed.
+ANALYSIS_VERSION = 1
+
+
+def _check_spectrum(frequencies, z) -> tuple:
+    frequencies = np.asarray(frequencies, dtype=float)
+    z = np.asarray(z, dtype=complex)
+    if frequencies.ndim != 1 or frequencies.shape != z.shape:
+        raise ValueError("Frequencies and impedance must be 1-D arrays of equal length.")
+    if len(frequencies) < 3 or np.any(frequencies <= 0):
+        raise ValueError("An impedance spectrum needs at least 3 positive frequencies.")
+    if np.any(np.abs(z) == 0) or not np.all(np.isfinite(z)):
+        raise ValueError("The impedance spectrum contains zero or non-finite values.")
+    return frequencies, z
+
+
+def _relaxation_columns(omega: np.ndarray, tau: np.ndarray) -> tuple:
+    """Real and imaginary parts of 1 / (1 + j omega tau) as [n_freq, n_tau] matrices."""
+    wt = omega[:, None] * tau[None, :]
+    denominator = 1.0 + wt ** 2
+    return 1.0 / denominator, -wt / denominator
+
+
+def kramers_kronig(frequencies, z, mu_criterion: float = 0.85, elements_per_decade: float = 3.0, max_elements=None, tolerance: float = 0.01) -> dict:
+    """
+    Lin-KK validity test (Schoenleber et al., 2014). The spectrum is fitted by
+    linear least squares with a series resistance, inductance and capacitance
+    plus M RC elements whose time constants are log-spaced over the measured
+    range; M grows until the fit starts over-fitting (mu <= `mu_criterion`).
+    M starts at `elements_per_decade` per decade of frequency: noise-free
+    simulated spectra otherwise meet the mu criterion while still under-fitted.
+    As every such circuit is Kramers-Kronig compliant, large residuals mean
+    the data is not (drift, non-linearity, a broken simulation).
+
+    Returns the residuals relative to |Z| and a summary: number of elements,
+    mu, pseudo chi-squared, the largest residual and `valid` (all residuals
+    within `tolerance`).
+    """
+    frequencies, z = _check_spectrum(frequencies, z)
+    omega = 2 * np.pi * frequencies
+    weight = 1.0 / np.abs(z)
+    n = len(frequencies)
+    max_elements = int(max_elements or n)
+    min_elements = min(max(1, int(np.ceil(elements_per_decade * np.log10(omega.max() / omega.min())))), max_elements)
+    b = np.concatenate([z.real * weight, z.imag * weight])
+    # R0, L and 1/C columns shared by every M.
+    fixed = np.column_stack([
+        np.concatenate([weight, np.zeros(n)]),
+        np.concatenate([np.zeros(n), omega * weight]),
+        np.concatenate([np.zeros(n), -weight / omega]),
+    ])
+    for m in range(min_elements, max_elements + 1):
+        tau = np.geomspace(1 / omega.max(), 1 / omega.min(), m)
+        real, imag = _relaxation_columns(omega, tau)
+        design = np.hstack([fixed, np.vstack([real * weight[:, None], imag * weight[:, None]])])
+        coefficients = np.linalg.lstsq(design, b, rcond=None)[0]
+        resistances = coefficients[3:]
+        positive = np.sum(np.abs(resistances[resistances >= 0]))
+        mu = 1.0 - np.sum(np.abs(resistances[resistances < 0])) / positive if positive > 0 else 0.0
+        if mu <= mu_criterion:
+            break
+    fitted = design @ coefficients
+    residuals_real = b[:n] - fitted[:n]
+    residuals_imag = b[n:] - fitted[n:]
+    max_residual = float(max(np.max(np.abs(residuals_real)), np.max(np.abs(residuals_imag))))
+    return {
+        "arrays": {
+            "frequencies": frequencies,
+            "residuals_real": residuals_real,
+            "residuals_imag": residuals_imag,
+            "tau": tau,
+            "resistances": resistances,
+        },
+        "summary": {
+            "elements": m,
+            "mu": float(mu),
+            "pseudo_chi_squared": float(np.sum(residuals_real ** 2 + residuals_imag ** 2)),
+            "max_abs_residual": max_residual,
+            "tolerance": tolerance,
+            "valid": max_residual <= tolerance,
+        },
+    }
+
+
+def distribution_of_relaxation_times(frequencies, z, regularization: float = 1e-3, n_tau=None, tau_extension: float = 1.0, max_peaks: int = 10) -> dict:
+    """
+    Distribution of relaxation times by Tikhonov-regularised, non-negative
+    least squares:
+
+        Z(w) = R_inf + j w L + 1 / (j w C) + sum_k gamma_k dln(tau) / (1 + j w tau_k)
+
+    on `n_tau` log-spaced time constants spanning the measured range widened
+    by `tau_extension` decades on each side. Residuals are weighted by 1/|Z|
+    and `regularization` penalises the second derivative of gamma (scaled by
+    max |Z|). The whole system is assembled with broadcasting and solved once
+    with a bounded-variable least-squares solver.
+
+    Returns gamma(tau) (Ohm per unit ln tau), the fit residuals and a summary
+    with R_inf, the total polarisation resistance and the peaks (time
+    constant, characteristic frequency and resistance under each peak,
+    largest first).
+    """
+    frequencies, z = _check_spectrum(frequencies, z)
+    if regularization < 0:
+        raise ValueError("regularization must be non-negative.")
+    omega = 2 * np.pi * frequencies
+    weight = 1.0 / np.abs(z)
+    n = len(frequencies)
+    n_tau = int(n_tau or min(max(2 * n, 50), 400))
+    tau = np.logspace(np.log10(1 / omega.max()) - tau_extension, np.log10(1 / omega.min()) + tau_extension, n_tau)
+    d_ln_tau = np.log(tau[1] / tau[0])
+    real, imag = _relaxation_columns(omega, tau)
+    design = np.vstack([
+        np.column_stack([real * d_ln_tau, np.ones(n), np.zeros(n), np.zeros(n)]),
+        np.column_stack([imag * d_ln_tau, np.zeros(n), omega, -1.0 / omega]),
+    ]) * np.concatenate([weight, weight])[:, None]
+    b = np.concatenate([z.real * weight, z.imag * weight])
+    penalty = np.zeros((n_tau - 2, n_tau + 3))
+    penalty[:, :n_tau] = np.diff(np.eye(n_tau), 2, axis=0) * (np.sqrt(regularization) / np.max(np.abs(z)))
+    lower = np.concatenate([np.zeros(n_tau), [0.0, -np.inf, 0.0]])
+    solution = optimize.lsq_linear(
+        np.vstack([design, penalty]), np.concatenate([b, np.zeros(n_tau - 2)]),
+        bounds=(lower, np.full(n_tau + 3, np.inf)), method="bvls",
+    )
+    gamma, r_inf, inductance, inverse_capacitance = solution.x[:n_tau], *solution.x[n_tau:]
+    fitted = design @ solution.x
+    residuals_real, residuals_imag = b[:n] - fitted[:n], b[n:] - fitted[n:]
+    return {
+        "arrays": {
+            "frequencies": frequencies,
+            "tau": tau,
+            "gamma": gamma,
+            "residuals_real": residuals_real,
+            "residuals_imag": residuals_imag,
+        },
+        "summary": {
+            "r_inf": float(r_inf),
+            "inductance": float(inductance),
+            "capacitance": float(1 / inverse_capacitance) if inverse_capacitance > 0 else None,
+            "polarization_resistance": float(np.sum(gamma) * d_ln_tau),
+            "peaks": drt_peaks(tau, gamma, d_ln_tau)[:max_peaks],
+            "regularization": regularization,
+            "rms_residual": float(np.sqrt(np.mean(residuals_real ** 2 + residuals_imag ** 2))),
+        },
+    }
+
+
+def drt_peaks(tau: np.ndarray, gamma: np.ndarray, d_ln_tau: float, min_fraction: float = 0.01) -> list:
+    """Local maxima of gamma above `min_fraction` of its maximum, with the resistance between the neighbouring minima."""
+    if not np.any(gamma > 0):
+        return []
+    padded = np.concatenate([[-np.inf], gamma, [-np.inf]])
+    maxima = np.flatnonzero((padded[1:-1] > padded[:-2]) & (padded[1:-1] >= padded[2:]) & (gamma > min_fraction * gamma.max()))
+    minima = np.flatnonzero((padded[1:-1] <= padded[:-2]) & (padded[1:-1] < padded[2:]))
+    peaks = []
+    for index in maxima:
+        start = minima[minima < index].max() if np.any(minima < index) else 0
+        stop = minima[minima > index].min() if np.any(minima > index) else len(gamma)
+        peaks.append({
+            "tau": float(tau[index]),
+            "frequency": float(1 / (2 * np.pi * tau[index])),
+            "gamma": float(gamma[index]),
+            "resistance": float(np.sum(gamma[start:stop]) * d_ln_tau),
+        })
+    peaks.sort(key=lambda peak: peak["resistance"], reverse=True)
+    return peaks
+
+
+ANALYSES = {
+    "drt": distribution_of_relaxation_times,
+    "kramers_kronig": kramers_kronig,
+}
+
+
+def run_analysis(name: str, frequencies, z, options: dict) -> dict:
+    """Runs one of `ANALYSES`; a module-level entry point so it can be sent to a process pool."""
+    if name not in ANALYSES:
+        raise ValueError(f"Unknown analysis '{name}'. Expected one of {sorted(ANALYSES)}.")
+    try:
+        return ANALYSES[name](frequencies, z, **(options or {}))
+    except TypeError as e:
+        raise ValueError(f"Invalid options for {name}: {e}")
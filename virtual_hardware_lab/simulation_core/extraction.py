@@ -0,0 +1,184 @@
+import logging
+import os
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.decimation import decimate
+from virtual_hardware_lab.simulation_core.eis_analysis import ANALYSIS_VERSION, run_analysis
+from virtual_hardware_lab.simulation_core.lazy_import import LazyModule
+from virtual_hardware_lab.simulation_core.post_processing import POST_PROCESSORS, register_post_processor
+
+plt = LazyModule("matplotlib.pyplot")
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+OUTPUT_FORMATS = ("wrdata", "raw")
+DEFAULT_OUTPUT_FILES = {"wrdata": "eis_data.txt", "raw": "results.raw"}
+# Plots of long waveforms are decimated to this many points per vector.
+PLOT_POINT_BUDGET = 4000
+
+
+def build_extraction_plan(metadata: dict) -> dict:
+    """
+    Compiles a control's `outputs` metadata into an extraction plan:
+
+        outputs:
+          format: raw            # or wrdata (default)
+          file: results.raw      # default: results.raw / eis_data.txt
+          vectors: [z]           # vectors the control is expected to produce
+          post_processors:       # names, or {name: options} mappings
+            - bode_plot: {vector: z}
+            - summary
+            - drt: {lazy: true}  # computed when first requested (`post_process`)
+
+    Controls without an `outputs` block get the legacy EIS plan (wrdata to
+    eis_data.txt plus a Nyquist plot). Unknown post-processors are dropped
+    with a warning.
+    """
+    outputs = metadata.get("outputs") if isinstance(metadata, dict) else None
+    if not isinstance(outputs, dict):
+        return {"legacy": True, "format": "wrdata", "file": DEFAULT_OUTPUT_FILES["wrdata"], "vectors": [], "post_processors": []}
+    output_format = str(outputs.get("format", "wrdata")).lower()
+    if output_format not in OUTPUT_FORMATS:
+        logger.warning(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}; using wrdata.")
+        output_format = "wrdata"
+    post_processors = []
+    for entry in outputs.get("post_processors") or []:
+        name, options = (next(iter(entry.items())) if isinstance(entry, dict) and len(entry) == 1 else (entry, {}))
+        if name not in POST_PROCESSORS:
+            logger.warning(f"Unknown post-processor '{name}' ignored. Available: {sorted(POST_PROCESSORS)}")
+            continue
+        options = dict(options or {})
+        lazy = bool(options.pop("lazy", False))
+        post_processors.append({"name": name, "options": options, "lazy": lazy})
+    return {
+        "legacy": False,
+        "format": output_format,
+        "file": os.path.basename(str(outputs.get("file") or DEFAULT_OUTPUT_FILES[output_format])),
+        "vectors": [str(name).lower() for name in outputs.get("vectors") or []],
+        "post_processors": post_processors,
+    }
+
+
+def complex_vector(run: dict, name: str) -> np.ndarray:
+    """Returns a complex vector either stored as such or as `<name>_real`/`<name>_imag` pairs."""
+    vectors = run["vectors"]
+    name = name.lower()
+    if name in vectors:
+        return np.asarray(vectors[name])
+    if f"{name}_real" in vectors and f"{name}_imag" in vectors:
+        return np.asarray(vectors[f"{name}_real"]) + 1j * np.asarray(vectors[f"{name}_imag"])
+    raise KeyError(f"Vector '{name}' not found. Available: {sorted(vectors)}")
+
+
+def _nyquist_plot(run, run_dir, sim_id, options):
+    z = complex_vector(run, options.get("vector", "z"))
+    path = os.path.join(run_dir, options.get("file", "nyquist_plot.png"))
+    plt.figure(figsize=(10, 8))
+    plt.plot(z.real, -z.imag, "-o")
+    plt.xlabel("Z_real (Ohms)")
+    plt.ylabel("-Z_imag (Ohms)")
+    plt.title(f"Nyquist Plot (Sim ID: {sim_id})")
+    plt.grid(True)
+    plt.axis("equal")
+    plt.savefig(path)
+    plt.close()
+    return {"artifacts": {"nyquist_plot": path}}
+
+
+def _bode_plot(run, run_dir, sim_id, options):
+    z = complex_vector(run, options.get("vector", "z"))
+    frequencies = np.asarray(run["scale"])
+    path = os.path.join(run_dir, options.get("file", "bode_plot.png"))
+    fig, (ax_mag, ax_phase) = plt.subplots(2, 1, sharex=True, figsize=(10, 8))
+    ax_mag.loglog(frequencies, np.abs(z))
+    ax_mag.set_ylabel("|Z| (Ohms)")
+    ax_mag.grid(True, which="both")
+    ax_phase.semilogx(frequencies, np.degrees(np.angle(z)))
+    ax_phase.set_ylabel("Phase (deg)")
+    ax_phase.set_xlabel("Frequency (Hz)")
+    ax_phase.grid(True, which="both")
+    fig.suptitle(f"Bode Plot (Sim ID: {sim_id})")
+    fig.savefig(path)
+    plt.close(fig)
+    return {"artifacts": {"bode_plot": path}}
+
+
+def _waveform_plot(run, run_dir, sim_id, options):
+    names = [name.lower() for name in options.get("vectors") or list(run["vectors"])]
+    scale = run["scale"]
+    path = os.path.join(run_dir, options.get("file", "waveform_plot.png"))
+    plt.figure(figsize=(10, 6))
+    for name in names:
+        if name not in run["vectors"]:
+            raise KeyError(f"Vector '{name}' not found. Available: {sorted(run['vectors'])}")
+        values = run["vectors"][name]
+        # Decimate with a min/max envelope so long transients plot quickly without hiding spikes.
+        keep = decimate(scale, values, PLOT_POINT_BUDGET, "minmax")
+        plt.plot(scale[keep], np.real(values[keep]), label=name)
+    plt.xlabel(run["axis"])
+    plt.legend()
+    plt.grid(True)
+    plt.title(f"Waveforms (Sim ID: {sim_id})")
+    plt.savefig(path)
+    plt.close()
+    return {"artifacts": {"waveform_plot": path}}
+
+
+def _summary(run, run_dir, sim_id, options):
+    names = [name.lower() for name in options.get("vectors") or list(run["vectors"])]
+    summary = {}
+    for name in names:
+        if name not in run["vectors"]:
+            raise KeyError(f"Vector '{name}' not found. Available: {sorted(run['vectors'])}")
+        values = np.asarray(run["vectors"][name])
+        magnitude = np.abs(values) if np.iscomplexobj(values) else values
+        summary[name] = {
+            "min": float(np.min(magnitude)),
+            "max": float(np.max(magnitude)),
+            "mean": float(np.mean(magnitude)),
+            "final": float(magnitude[-1]),
+            "points": int(len(values)),
+        }
+    return {"summary": summary}
+
+
+def _eis_analysis(name, run, run_dir, options):
+    """Runs an `eis_analysis` analysis on the run's impedance vector (option `vector`, default z); arrays go to `<name>.npz`."""
+    options = dict(options)
+    z = complex_vector(run, options.pop("vector", "z"))
+    result = run_analysis(name, np.asarray(run["scale"]), z, options)
+    path = os.path.join(run_dir, f"{name}.npz")
+    np.savez_compressed(path, **result["arrays"])
+    return {"artifacts": {name: path}, "summary": {name: result["summary"]}, "arrays": result["arrays"]}
+
+
+def _drt(run, run_dir, sim_id, options):
+    return _eis_analysis("drt", run, run_dir, options)
+
+
+def _kramers_kronig(run, run_dir, sim_id, options):
+    return _eis_analysis("kramers_kronig", run, run_dir, options)
+
+
+def _drt_plot(drt, run_dir, sim_id, options):
+    tau, gamma = drt["arrays"]["tau"], drt["arrays"]["gamma"]
+    path = os.path.join(run_dir, options.get("file", "drt_plot.png"))
+    plt.figure(figsize=(10, 6))
+    plt.semilogx(tau, gamma)
+    plt.xlabel("tau (s)")
+    plt.ylabel("gamma (Ohms)")
+    plt.grid(True, which="both")
+    plt.title(f"Distribution of Relaxation Times (Sim ID: {sim_id})")
+    plt.savefig(path)
+    plt.close()
+    return {"artifacts": {"drt_plot": path}}
+
+
+register_post_processor("nyquist_plot", _nyquist_plot, outputs=("nyquist_plot",), description="Nyquist plot of a complex vector (option vector, default z).")
+register_post_processor("bode_plot", _bode_plot, outputs=("bode_plot",), description="Bode magnitude/phase plot of a complex vector.")
+register_post_processor("waveform_plot", _waveform_plot, outputs=("waveform_plot",), description="Plot of (decimated) vectors against the scale.")
+register_post_processor("summary", _summary, description="Min/max/mean/final of each vector.")
+register_post_processor("drt", _drt, outputs=("drt",), version=ANALYSIS_VERSION, description="Distribution of relaxation times of the impedance.")
+register_post_processor("kramers_kronig", _kramers_kronig, outputs=("kramers_kronig",), version=ANALYSIS_VERSION, description="Lin-KK validity test of the impedance.")
+register_post_processor("drt_plot", _drt_plot, inputs=("drt",), outputs=("drt_plot",), description="Plot of gamma(tau) from the drt stage.")
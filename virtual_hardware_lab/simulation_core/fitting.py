@@ -0,0 +1,139 @@
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.lazy_import import LazyModule
+
+optimize = LazyModule("scipy.optimize")
+
+WEIGHTINGS = ("modulus", "unit")
+
+
+def fit_impedance(
+    evaluate: Callable[[np.ndarray], np.ndarray],
+    z_measured: np.ndarray,
+    names: list[str],
+    initial: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    weighting: str = "modulus",
+    max_evaluations: int = 100,
+    rel_step: float = 1e-6,
+) -> dict:
+    """
+    Fits model parameters to a measured impedance spectrum with bounded least squares.
+
+    `evaluate` maps a [k, n_params] array of parameter sets to the complex model
+    impedance [k, n_freq]; all finite-difference Jacobian columns for one
+    iterate are requested in a single call so the solver can batch them.
+    Parameters whose lower bound is positive are optimised in log10 space.
+    Objective evaluations are memoised, so repeated points cost nothing.
+
+    Returns fitted values, standard errors, covariance, residuals and solver
+    statistics.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting '{weighting}'. Expected one of {WEIGHTINGS}.")
+    z_measured = np.asarray(z_measured, dtype=complex)
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    if np.any(lower >= upper):
+        raise ValueError("Each lower bound must be smaller than its upper bound.")
+    log_scaled = lower > 0
+    weights = 1.0 / np.abs(z_measured) if weighting == "modulus" else np.ones(len(z_measured))
+    if not np.all(np.isfinite(weights)):
+        raise ValueError("Modulus weighting requires non-zero measured impedance.")
+
+    def to_params(u):
+        u = np.asarray(u, dtype=float)
+        return np.where(log_scaled, 10.0 ** u, u)
+
+    def to_fit_space(p):
+        p = np.asarray(p, dtype=float)
+        return np.where(log_scaled, np.log10(np.where(log_scaled, p, 1.0)), p)
+
+    lo = to_fit_space(lower)
+    hi = to_fit_space(upper)
+    u0 = np.clip(to_fit_space(initial), lo, hi)
+
+    cache = {}
+    stats = {"model_evaluations": 0, "batches": 0}
+
+    def residuals_for(points):
+        """Returns stacked real/imag weighted residuals for each row of `points` (fit space)."""
+        points = np.atleast_2d(points)
+        keys = [p.tobytes() for p in points]
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+        if missing:
+            z_model = np.atleast_2d(evaluate(to_params(points[missing])))
+            stats["model_evaluations"] += len(missing)
+            stats["batches"] += 1
+            for row, i in enumerate(missing):
+                diff = (z_model[row] - z_measured) * weights
+                cache[keys[i]] = np.concatenate([diff.real, diff.imag])
+        return np.array([cache[key] for key in keys])
+
+    def fun(u):
+        return residuals_for(u)[0]
+
+    def jac(u):
+        steps = rel_step * np.maximum(1.0, np.abs(u))
+        # Step inwards at the upper bound so perturbed points stay feasible.
+        steps = np.where(u + steps > hi, -steps, steps)
+        points = np.vstack([u, u + np.diag(steps)])
+        r = residuals_for(points)
+        return ((r[1:] - r[0]) / steps[:, None]).T
+
+    started = time.perf_counter()
+    result = optimize.least_squares(fun, u0, jac=jac, bounds=(lo, hi), method="trf", x_scale="jac", max_nfev=max_evaluations)
+    elapsed = time.perf_counter() - started
+
+    fitted = to_params(result.x)
+    m = len(result.fun)
+    n = len(fitted)
+    dof = max(m - n, 1)
+    s_sq = 2.0 * result.cost / dof
+    J = result.jac
+    cov_fit = np.linalg.pinv(J.T @ J) * s_sq
+    # Map the covariance from fit space to parameter space: dp/du = p ln(10) for log-scaled parameters.
+    scale = np.where(log_scaled, fitted * np.log(10.0), 1.0)
+    covariance = cov_fit * np.outer(scale, scale)
+    std_errors = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+
+    n_freq = len(z_measured)
+    weighted = result.fun[:n_freq] + 1j * result.fun[n_freq:]
+    return {
+        "parameters": {name: float(value) for name, value in zip(names, fitted)},
+        "std_errors": {name: float(value) for name, value in zip(names, std_errors)},
+        "parameter_order": list(names),
+        "covariance": covariance.tolist(),
+        "residuals": {
+            "real": (weighted.real / weights).tolist(),
+            "imag": (weighted.imag / weights).tolist(),
+        },
+        "rms_weighted_residual": float(np.sqrt(np.mean(np.abs(weighted) ** 2))),
+        "cost": float(result.cost),
+        "success": bool(result.success),
+        "message": result.message,
+        "iterations": int(result.nfev),
+        "model_evaluations": stats["model_evaluations"],
+        "elapsed_s": elapsed,
+    }
+
+
+def default_initial_guess(spec: dict, lower: float, upper: float) -> float:
+    """Uses the metadata default if present, otherwise the (geometric) midpoint of the range."""
+    if "default" in spec:
+        return float(spec["default"])
+    if lower > 0:
+        return float(np.sqrt(lower * upper))
+    return 0.5 * (lower + upper)
+
+
+def parameter_bounds(spec: dict, override: Optional[list] = None) -> tuple:
+    """Returns (lower, upper) from an explicit override or the metadata `range`."""
+    bounds = override if override is not None else spec.get("range")
+    if not bounds or len(bounds) != 2:
+        return None
+    return float(bounds[0]), float(bounds[1])
@@ -0,0 +1,108 @@
+import base64
+import fnmatch
+import hashlib
+import json
+from typing import Optional
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def inventory_version(*inventories: dict) -> str:
+    """Short hash over the names and content hashes of every template; changes whenever any template does."""
+    digest = hashlib.sha256()
+    for inventory in inventories:
+        for name in sorted(inventory):
+            digest.update(f"{name}\0{inventory[name].get('sha256', '')}\n".encode())
+        digest.update(b"\1")
+    return digest.hexdigest()[:16]
+
+
+def build_listing_index(inventory: dict) -> list:
+    """
+    Precomputes what listings need from an inventory, sorted by name: the
+    listed item, its compact JSON (so full listings are concatenated rather
+    than re-encoded) and lower-cased filter keys (tags, declared parameters).
+    """
+    records = []
+    for name in sorted(inventory):
+        metadata = inventory[name].get("metadata") or {}
+        item = {"name": name, "sha256": inventory[name].get("sha256"), "metadata": metadata}
+        declared = metadata.get("input_parameters") or metadata.get("parameters") or {}
+        tags = metadata.get("tags") or []
+        records.append({
+            "name": name,
+            "item": item,
+            "json": json.dumps(item, separators=(",", ":"), default=str),
+            "tags": {str(tag).lower() for tag in (tags if isinstance(tags, list) else [tags])},
+            "parameters": {str(param).lower() for param in declared} if isinstance(declared, dict) else set(),
+        })
+    return records
+
+
+def query_listing(records: list, name: Optional[str] = None, tags=None, parameters=None, cursor: Optional[str] = None,
+                  limit: Optional[int] = None, fields=None) -> dict:
+    """
+    Filters and pages an index. `name` matches case-insensitively as a substring,
+    or as a glob if it contains `*`/`?`; every one of `tags` and `parameters`
+    must be present. Pages follow name order: `cursor` is the opaque
+    `next_cursor` of the previous page. `fields` projects the metadata to the
+    given keys. Returns {"items", "json", "next_cursor", "total"}; `json` is the
+    items' JSON array.
+    """
+    limit = min(max(int(limit or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    pattern = name.lower() if name else None
+    wanted_tags = {str(tag).lower() for tag in _as_list(tags)}
+    wanted_parameters = {str(param).lower() for param in _as_list(parameters)}
+    after = decode_cursor(cursor) if cursor else None
+
+    matches = []
+    for record in records:
+        if pattern and not (fnmatch.fnmatchcase(record["name"].lower(), pattern) if any(c in pattern for c in "*?[") else pattern in record["name"].lower()):
+            continue
+        if not wanted_tags <= record["tags"] or not wanted_parameters <= record["parameters"]:
+            continue
+        matches.append(record)
+    page = [record for record in matches if after is None or record["name"] > after][:limit]
+    has_more = bool(page) and page[-1]["name"] < matches[-1]["name"]
+
+    if fields is None:
+        items = [record["item"] for record in page]
+        encoded = "[" + ",".join(record["json"] for record in page) + "]"
+    else:
+        fields = _as_list(fields)
+        items = [_project(record["item"], fields) for record in page]
+        encoded = json.dumps(items, separators=(",", ":"), default=str)
+    return {
+        "items": items,
+        "json": encoded,
+        "next_cursor": encode_cursor(page[-1]["name"]) if has_more else None,
+        "total": len(matches),
+    }
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def _project(item: dict, fields: list) -> dict:
+    projected = {"name": item["name"]}
+    if "sha256" in fields:
+        projected["sha256"] = item["sha256"]
+    metadata_fields = [field for field in fields if field not in ("name", "sha256")]
+    if metadata_fields:
+        projected["metadata"] = {field: item["metadata"][field] for field in metadata_fields if field in item["metadata"]}
+    return projected
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
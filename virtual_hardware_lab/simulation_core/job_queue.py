@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobQueue:
+    """
+    Durable queue shared by an API front end and simulation workers.
+
+    Jobs are claimed under a lease that the worker renews while it runs; a job
+    whose lease expires (the worker died) is queued again, up to `max_attempts`.
+    Template sources travel as content-addressed blobs, so workers fetch exactly
+    the template versions a job was rendered from. Implementations must make
+    `claim` atomic across processes and hosts.
+    """
+
+    def submit(self, kind: str, payload: dict, job_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        """Takes the oldest queued job and returns it (None if there is none)."""
+        raise NotImplementedError
+
+    def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extends a lease; False if the job is no longer running on this worker (e.g. it was cancelled)."""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, worker_id: str, result: dict):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        raise NotImplementedError
+
+    def release(self, job_id: str, worker_id: str):
+        """Returns a claimed job to the queue (the worker is shutting down)."""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put_blob(self, content: str) -> str:
+        """Stores content under its SHA-256 (once) and returns the hash."""
+        raise NotImplementedError
+
+    def get_blob(self, sha256: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    `JobQueue` in a SQLite database (WAL mode), for any number of worker
+    processes on one host or on hosts sharing a filesystem that supports
+    SQLite locking. Every call opens its own connection, so an instance can be
+    used from worker threads.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL,
+                worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL,
+                result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            db.execute("CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, content TEXT NOT NULL)")
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly where a read-modify-write must be atomic.
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def submit(self, kind, payload, job_id=None):
+        """Queues a job. Resubmitting the id of a finished job queues it again; an active job is left as is."""
+        job_id = job_id or hashlib.sha256(f"{time.time_ns()}{os.getpid()}{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()[:32]
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                """INSERT INTO jobs (id, kind, payload, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET kind=excluded.kind, payload=excluded.payload, status='queued', worker=NULL,
+                       attempts=0, lease_until=NULL, result=NULL, error=NULL, created=excluded.created, updated=excluded.updated
+                   WHERE status IN ('done', 'failed', 'cancelled')""",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Leases of dead workers expire: their jobs are retried, or failed after max_attempts.
+                db.execute("UPDATE jobs SET status='queued', worker=NULL, lease_until=NULL, updated=? WHERE status='running' AND lease_until < ? AND attempts < ?",
+                           (now, now, self.max_attempts))
+                db.execute("UPDATE jobs SET status='failed', error='Worker lease expired too often.', updated=? WHERE status='running' AND lease_until < ?", (now, now))
+                row = db.execute("SELECT id FROM jobs WHERE status='queued' ORDER BY created, rowid LIMIT 1").fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status='running', worker=?, attempts=attempts+1, lease_until=?, updated=? WHERE id=?",
+                               (worker_id, now + lease_seconds, now, row[0]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def renew(self, job_id, worker_id, lease_seconds):
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET lease_until=?, updated=? WHERE id=? AND worker=? AND status='running'",
+                                (now + lease_seconds, now, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        self._finish(job_id, worker_id, "done", result=json.dumps(result))
+
+    def fail(self, job_id, worker_id, error):
+        self._finish(job_id, worker_id, "failed", error=error)
+
+    def release(self, job_id, worker_id):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status='queued', worker=NULL, lease_until=NULL, attempts=MAX(attempts-1, 0), updated=? WHERE id=? AND worker=? AND status='running'",
+                       (time.time(), job_id, worker_id))
+
+    def cancel(self, job_id):
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET status='cancelled', updated=? WHERE id=? AND status IN ('queued', 'running')", (time.time(), job_id))
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> dict:
+        """Number of jobs per status."""
+        with self._connect() as db:
+            return {status: count for status, count in db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    def put_blob(self, content):
+        sha256 = hashlib.sha256(content.encode()).hexdigest()
+        with self._connect() as db:
+            db.execute("INSERT OR IGNORE INTO blobs (sha256, content) VALUES (?, ?)", (sha256, content))
+        return sha256
+
+    def get_blob(self, sha256):
+        with self._connect() as db:
+            row = db.execute("SELECT content FROM blobs WHERE sha256=?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status=?, result=?, error=?, lease_until=NULL, updated=? WHERE id=? AND worker=? AND status='running'",
+                       (status, result, error, time.time(), job_id, worker_id))
+
@@ -0,0 +1,22 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stands in for a heavy module (matplotlib, scipy, ...) and imports it on first
+    attribute access, so importing the server does not pay for libraries a
+    request may never need. Use as `plt = LazyModule("matplotlib.pyplot")`.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
@@ -0,0 +1,312 @@
+import heapq
+import itertools
+import math
+from typing import Optional
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.fitting import parameter_bounds
+
+DISTRIBUTIONS = ("normal", "uniform", "lognormal")
+SAMPLING_METHODS = DISTRIBUTIONS + ("corners",)
+# Keys accepted per parameter in a `distributions` override, besides `distribution` itself.
+DISTRIBUTION_KEYS = {"normal": ("mean", "std"), "uniform": ("low", "high"), "lognormal": ("median", "sigma")}
+MAX_CORNERS = 4096
+
+
+def resolve_distribution(name: str, spec: dict, override: Optional[dict] = None, method: str = "normal") -> dict:
+    """
+    Returns the sampling distribution of one parameter. Unset moments come from
+    the metadata: the `range` spans +/- 3 standard deviations (of ln p for
+    lognormal) around the `default`, or around the range midpoint (geometric for
+    lognormal). Normal and lognormal draws are truncated to the declared range.
+    """
+    override = dict(override or {})
+    kind = override.pop("distribution", method)
+    if kind not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{kind}' for '{name}'. Expected one of {DISTRIBUTIONS}.")
+    unknown = set(override) - set(DISTRIBUTION_KEYS[kind])
+    if unknown:
+        raise ValueError(f"Unexpected keys {sorted(unknown)} for the {kind} distribution of '{name}'. Expected {DISTRIBUTION_KEYS[kind]}.")
+    try:
+        override = {key: float(value) for key, value in override.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f"The distribution of '{name}' takes numbers for {DISTRIBUTION_KEYS[kind]}.")
+    bounds = parameter_bounds(spec or {})
+    default = (spec or {}).get("default")
+    default = float(default) if isinstance(default, (int, float)) and not isinstance(default, bool) else None
+    resolved = {"distribution": kind, "truncate": list(bounds) if bounds and kind != "uniform" else None}
+    if kind == "uniform":
+        low = override.get("low", bounds[0] if bounds else None)
+        high = override.get("high", bounds[1] if bounds else None)
+        if low is None or high is None:
+            raise ValueError(f"Parameter '{name}' has no range: pass low and high for its uniform distribution.")
+        if not low <= high:
+            raise ValueError(f"The uniform distribution of '{name}' needs low <= high.")
+        resolved.update(low=low, high=high)
+    elif kind == "normal":
+        mean = override.get("mean", default if default is not None else (sum(bounds) / 2 if bounds else math.nan))
+        std = override.get("std", (bounds[1] - bounds[0]) / 6 if bounds else math.nan)
+        if not (math.isfinite(mean) and math.isfinite(std) and std >= 0):
+            raise ValueError(f"Parameter '{name}' needs a mean and a non-negative std: declare a metadata range or pass them.")
+        resolved.update(mean=mean, std=std)
+    else:
+        positive = bounds is not None and bounds[0] > 0
+        median = override.get("median", default if default is not None else (math.sqrt(bounds[0] * bounds[1]) if positive else math.nan))
+        sigma = override.get("sigma", math.log(bounds[1] / bounds[0]) / 6 if positive else math.nan)
+        if not (median > 0 and math.isfinite(sigma) and sigma >= 0):
+            raise ValueError(f"Parameter '{name}' needs a positive median and a non-negative sigma: declare a positive metadata range or pass them.")
+        resolved.update(median=median, sigma=sigma)
+    return resolved
+
+
+def sample_distribution(distribution: dict, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Draws `n` values; truncated distributions redraw out-of-range values (then clip the rare leftovers)."""
+    kind = distribution["distribution"]
+
+    def draw(size):
+        if kind == "uniform":
+            return rng.uniform(distribution["low"], distribution["high"], size)
+        if kind == "normal":
+            return rng.normal(distribution["mean"], distribution["std"], size)
+        return distribution["median"] * np.exp(rng.normal(0.0, distribution["sigma"], size))
+
+    values = draw(n)
+    if distribution.get("truncate"):
+        low, high = distribution["truncate"]
+        for _ in range(100):
+            outside = (values < low) | (values > high)
+            if not outside.any():
+                break
+            values[outside] = draw(int(outside.sum()))
+        values = np.clip(values, low, high)
+    return values
+
+
+def corner_points(ranges: list) -> np.ndarray:
+    """Every combination of range endpoints, as [2**n_params, n_params]."""
+    if 2 ** len(ranges) > MAX_CORNERS:
+        raise ValueError(f"{len(ranges)} parameters have {2 ** len(ranges)} corners; at most {MAX_CORNERS} are evaluated. Vary fewer parameters.")
+    return np.array(list(itertools.product(*ranges)), dtype=float).reshape(-1, len(ranges))
+
+
+class RunningMoments:
+    """Streaming mean and variance of [n_samples, n_series] batches (Chan et al.'s pairwise update)."""
+
+    def __init__(self, n_series: int):
+        self.count = 0
+        self.mean = np.zeros(n_series)
+        self._m2 = np.zeros(n_series)
+
+    def add(self, batch: np.ndarray):
+        n = len(batch)
+        if n == 0:
+            return
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self._m2)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+class _BucketSketch:
+    """Per-series histograms over integer bucket keys; quantiles are read from the cumulative counts."""
+
+    def __init__(self, n_series: int):
+        self.n_series = n_series
+        self.counts = np.zeros((n_series, 0), dtype=np.int64)
+        self.offset = 0
+
+    def _keys(self, values: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _value(self, keys: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _cover(self, low: int, high: int) -> None:
+        """Widens the bucket window to [low, high]."""
+        if self.counts.shape[1] == 0:
+            self.offset = low
+            self.counts = np.zeros((self.n_series, high - low + 1), dtype=np.int64)
+            return
+        pad_low = max(self.offset - low, 0)
+        pad_high = max(high - (self.offset + self.counts.shape[1] - 1), 0)
+        if pad_low or pad_high:
+            self.counts = np.pad(self.counts, ((0, 0), (pad_low, pad_high)))
+            self.offset -= pad_low
+
+    def add(self, values: np.ndarray):
+        keys = self._keys(values)
+        self._cover(int(keys.min()), int(keys.max()))
+        keys = np.maximum(keys, self.offset) # Below merged buckets
+        width = self.counts.shape[1]
+        index = np.arange(self.n_series)[None, :] * width + (keys - self.offset)
+        self.counts += np.bincount(index.ravel(), minlength=self.n_series * width).reshape(self.n_series, width)
+
+    def quantiles(self, levels) -> np.ndarray:
+        """[len(levels), n_series] values at the quantile `levels` (0-1)."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+        result = []
+        for level in levels:
+            rank = level * (total - 1)
+            keys = np.argmax(cumulative > rank[:, None], axis=1)
+            result.append(self._value(keys + self.offset))
+        return np.array(result)
+
+
+class LogQuantileSketch(_BucketSketch):
+    """
+    Quantiles of positive values with a relative error of at most
+    `relative_accuracy`, from logarithmic buckets (as in DDSketch). Memory grows
+    with the dynamic range of the data, not with the sample count; past
+    `max_buckets` the lowest buckets are merged.
+    """
+
+    def __init__(self, n_series: int, relative_accuracy: float = 0.005, max_buckets: int = 4096):
+        super().__init__(n_series)
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+
+    def _keys(self, values):
+        return np.ceil(np.log(np.maximum(values, np.finfo(float).tiny)) / self._log_gamma).astype(np.int64)
+
+    def _value(self, keys):
+        return 2 * self.gamma ** keys.astype(float) / (self.gamma + 1)
+
+    def _cover(self, low, high):
+        super()._cover(max(low, high - self.max_buckets + 1), high)
+        excess = self.counts.shape[1] - self.max_buckets
+        if excess > 0:
+            self.counts[:, excess] += self.counts[:, :excess].sum(axis=1)
+            self.counts = self.counts[:, excess:]
+            self.offset += excess
+
+
+class LinearQuantileSketch(_BucketSketch):
+    """Quantiles of values in [low, high] to within `resolution`, from fixed-width buckets."""
+
+    def __init__(self, n_series: int, low: float, high: float, resolution: float):
+        super().__init__(n_series)
+        self.low = low
+        self.resolution = resolution
+        super()._cover(0, int(math.ceil((high - low) / resolution)))
+
+    def _keys(self, values):
+        keys = np.floor((np.asarray(values) - self.low) / self.resolution).astype(np.int64)
+        return np.clip(keys, 0, self.counts.shape[1] - 1)
+
+    def _value(self, keys):
+        return self.low + (keys + 0.5) * self.resolution
+
+
+class SpectrumAggregator:
+    """
+    Streaming statistics of complex spectra ([n_samples, n_freq] batches):
+    mean and standard deviation of the real and imaginary parts, of ln|Z| and of
+    the phase, plus percentiles of |Z| and of the phase from fixed-memory
+    sketches. Memory is independent of the number of samples.
+    """
+
+    def __init__(self, frequencies: np.ndarray, relative_accuracy: float = 0.005, phase_resolution_deg: float = 0.1):
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        n = len(self.frequencies)
+        self.real = RunningMoments(n)
+        self.imag = RunningMoments(n)
+        self.log_magnitude = RunningMoments(n)
+        self.phase = RunningMoments(n)
+        self.magnitude_sketch = LogQuantileSketch(n, relative_accuracy)
+        self.phase_sketch = LinearQuantileSketch(n, -180.0, 180.0, phase_resolution_deg)
+
+    @property
+    def count(self) -> int:
+        return self.real.count
+
+    def add(self, z: np.ndarray):
+        z = np.asarray(z, dtype=complex)
+        magnitude = np.abs(z)
+        phase = np.degrees(np.angle(z))
+        self.real.add(z.real)
+        self.imag.add(z.imag)
+        self.log_magnitude.add(np.log(np.maximum(magnitude, np.finfo(float).tiny)))
+        self.phase.add(phase)
+        self.magnitude_sketch.add(magnitude)
+        self.phase_sketch.add(phase)
+
+    def scores(self, z: np.ndarray) -> np.ndarray:
+        """
+        Outlier score of each spectrum: the RMS over frequencies of its ln|Z|
+        and phase deviations from the current mean, in standard deviations.
+        Frequencies without spread do not contribute.
+        """
+        z = np.asarray(z, dtype=complex)
+        log_magnitude = np.log(np.maximum(np.abs(z), np.finfo(float).tiny))
+        phase_deviation = (np.degrees(np.angle(z)) - self.phase.mean + 180.0) % 360.0 - 180.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_magnitude = np.where(self.log_magnitude.std > 0, (log_magnitude - self.log_magnitude.mean) / self.log_magnitude.std, 0.0)
+            z_phase = np.where(self.phase.std > 0, phase_deviation / self.phase.std, 0.0)
+        return np.sqrt(np.mean((z_magnitude ** 2 + z_phase ** 2) / 2, axis=1))
+
+    def result(self, percentiles) -> dict:
+        levels = np.asarray(percentiles, dtype=float) / 100.0
+        return {
+            "frequencies": self.frequencies,
+            "samples": self.count,
+            "percentiles": np.asarray(percentiles, dtype=float),
+            "z_real_mean": self.real.mean,
+            "z_real_std": self.real.std,
+            "z_imag_mean": self.imag.mean,
+            "z_imag_std": self.imag.std,
+            "log_magnitude_mean": self.log_magnitude.mean,
+            "log_magnitude_std": self.log_magnitude.std,
+            "phase_mean_deg": self.phase.mean,
+            "phase_std_deg": self.phase.std,
+            "magnitude_percentiles": self.magnitude_sketch.quantiles(levels),
+            "phase_percentiles_deg": self.phase_sketch.quantiles(levels),
+        }
+
+
+class OutlierTracker:
+    """
+    Keeps the spectra most likely to be outliers in bounded memory. Samples are
+    scored against the statistics seen so far and the best `capacity`
+    candidates kept; `select` rescores them against the final statistics.
+    """
+
+    def __init__(self, max_outliers: int, threshold: float):
+        self.max_outliers = max_outliers
+        self.threshold = threshold
+        self.capacity = 4 * max_outliers
+        self._heap = []
+
+    def offer(self, scores: np.ndarray, indices: np.ndarray, values: np.ndarray, z: np.ndarray):
+        if self.capacity == 0:
+            return
+        for i in np.argsort(scores)[::-1][:self.capacity]:
+            entry = (float(scores[i]), int(indices[i]), values[i].copy(), z[i].copy())
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+            else:
+                break
+
+    def select(self, aggregator: SpectrumAggregator) -> list:
+        """Candidates scoring at least `threshold` against the final statistics, highest first."""
+        if not self._heap:
+            return []
+        z = np.array([entry[3] for entry in self._heap])
+        scores = aggregator.scores(z)
+        order = [i for i in np.argsort(scores)[::-1] if scores[i] >= self.threshold][:self.max_outliers]
+        return [{"index": self._heap[i][1], "score": float(scores[i]), "values": self._heap[i][2], "impedance": self._heap[i][3]} for i in order]
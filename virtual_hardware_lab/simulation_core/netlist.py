@@ -0,0 +1,543 @@
+import ast
+import hashlib
+import math
+import re
+from typing import Any, Optional
+
+import numpy as np
+
+
+class UnsupportedNetlistError(Exception):
+    """Raised when a netlist uses a construct the native engine cannot handle."""
+
+
+class ExpressionError(ValueError):
+    """Raised when a parameter or vector expression cannot be evaluated."""
+
+
+SPICE_SCALE_FACTORS = {
+    "t": 1e12,
+    "g": 1e9,
+    "meg": 1e6,
+    "k": 1e3,
+    "mil": 25.4e-6,
+    "m": 1e-3,
+    "u": 1e-6,
+    "n": 1e-9,
+    "p": 1e-12,
+    "f": 1e-15,
+}
+
+_NUMBER_RE = re.compile(r"^([+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)(meg|mil|[tgkmunpf])?[a-z]*$", re.IGNORECASE)
+# A numeric literal immediately followed by letters (e.g. "10k", "1V") inside an expression.
+_SUFFIXED_NUMBER_RE = re.compile(r"(?<![\w.])((?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?[a-z]+)\b", re.IGNORECASE)
+_CARD_TOKEN_RE = re.compile(r"[^\s{']*(?:\{[^}]*\}|'[^']*')|\S+")
+_PARAM_ASSIGN_RE = re.compile(r"([A-Za-z_][\w]*)\s*=\s*(\{[^}]*\}|'[^']*'|\"[^\"]*\"|[^\s]+)")
+
+EXPRESSION_FUNCTIONS = {
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "ln": np.log,
+    "log": np.log,
+    "log10": np.log10,
+    "abs": np.abs,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "atan": np.arctan,
+    "sinh": np.sinh,
+    "cosh": np.cosh,
+    "tanh": np.tanh,
+    "pow": np.power,
+    "pwr": np.power,
+    "min": np.minimum,
+    "max": np.maximum,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "int": np.trunc,
+}
+
+EXPRESSION_CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Pow: lambda a, b: a ** b,
+    ast.Mod: lambda a, b: a % b,
+}
+
+_COMPARE_OPERATORS = {
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+}
+
+
+def parse_spice_number(token: str) -> float:
+    """
+    Parses a SPICE numeric literal such as `10k`, `1.5meg`, `2u` or `1V`.
+    Trailing unit letters after the scale factor are ignored, as ngspice does.
+    """
+    match = _NUMBER_RE.match(token.strip())
+    if not match:
+        raise ExpressionError(f"Invalid SPICE number: {token!r}")
+    value = float(match.group(1))
+    suffix = match.group(2)
+    if suffix:
+        value *= SPICE_SCALE_FACTORS[suffix.lower()]
+    return value
+
+
+def is_spice_number(token: str) -> bool:
+    return bool(_NUMBER_RE.match(token.strip()))
+
+
+def compile_expression(expression: str) -> ast.Expression:
+    """
+    Compiles a SPICE/metadata expression into a Python AST after normalising
+    SPICE-specific syntax (`^` for powers, suffixed literals, case-insensitive names).
+    """
+    text = expression.strip()
+    if (text.startswith("{") and text.endswith("}")) or (text.startswith("'") and text.endswith("'")):
+        text = text[1:-1]
+    text = _SUFFIXED_NUMBER_RE.sub(lambda m: repr(parse_spice_number(m.group(1))), text)
+    text = text.replace("^", "**").lower()
+    try:
+        return ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression {expression!r}: {e.msg}") from e
+
+
+def evaluate_expression(expression, scope: dict, functions: Optional[dict] = None) -> Any:
+    """
+    Safely evaluates an arithmetic/comparison expression against `scope`.
+
+    Only numeric literals, names from `scope` (or the built-in constants),
+    whitelisted function calls, arithmetic, comparisons and boolean operators
+    are allowed. Values may be Python scalars or NumPy arrays, so the same
+    expression can be evaluated for a whole batch of parameter sets at once.
+    """
+    tree = expression if isinstance(expression, ast.Expression) else compile_expression(str(expression))
+    funcs = EXPRESSION_FUNCTIONS if functions is None else functions
+    try:
+        return _eval_node(tree.body, scope, funcs)
+    except (ArithmeticError, TypeError) as e:
+        raise ExpressionError(f"Cannot evaluate expression: {e}") from e
+
+
+def _eval_node(node, scope: dict, functions: dict):
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return node.value
+        raise ExpressionError(f"Unsupported literal: {node.value!r}")
+    if isinstance(node, ast.Name):
+        if node.id in scope:
+            return scope[node.id]
+        if node.id in EXPRESSION_CONSTANTS:
+            return EXPRESSION_CONSTANTS[node.id]
+        raise ExpressionError(f"Unknown name: {node.id}")
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return _BINARY_OPERATORS[type(node.op)](_eval_node(node.left, scope, functions), _eval_node(node.right, scope, functions))
+    if isinstance(node, ast.UnaryOp):
+        operand = _eval_node(node.operand, scope, functions)
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(operand)
+    if isinstance(node, ast.Compare):
+        left = _eval_node(node.left, scope, functions)
+        result = True
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPERATORS:
+                break
+            right = _eval_node(comparator, scope, functions)
+            result = np.logical_and(result, _COMPARE_OPERATORS[type(op)](left, right))
+            left = right
+        else:
+            return result
+    if isinstance(node, ast.BoolOp):
+        values = [_eval_node(v, scope, functions) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = values[0]
+        for value in values[1:]:
+            result = combine(result, value)
+        return result
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        func = functions.get(node.func.id)
+        if func is None:
+            raise ExpressionError(f"Unknown function: {node.func.id}")
+        return func(*[_eval_node(arg, scope, functions) for arg in node.args])
+    raise ExpressionError(f"Unsupported expression element: {ast.dump(node)}")
+
+
+def split_netlist(netlist_text: str):
+    """
+    Splits a netlist into (title, cards, control_lines).
+
+    The first line is the title (as in ngspice), continuation lines (`+`) are joined,
+    full-line (`*`) and inline (`;`, ` $ `) comments are removed and blank lines
+    dropped. Lines between `.control` and `.endc` are returned separately.
+    """
+    raw_lines = netlist_text.splitlines()
+    title = raw_lines[0].strip() if raw_lines else ""
+    cards = []
+    control_lines = []
+    in_control = False
+    for raw in raw_lines[1:]:
+        line = raw.strip()
+        if not line or line.startswith("*"):
+            continue
+        line = _strip_inline_comment(line)
+        if not line:
+            continue
+        lowered = line.lower()
+        if lowered.startswith(".control"):
+            in_control = True
+            continue
+        if lowered.startswith(".endc"):
+            in_control = False
+            continue
+        if in_control:
+            control_lines.append(line)
+            continue
+        if line.startswith("+") and cards:
+            cards[-1] = cards[-1] + " " + line[1:].strip()
+            continue
+        cards.append(line)
+    return title, cards, control_lines
+
+
+def _strip_inline_comment(line: str) -> str:
+    for marker in (";", " $ ", "\t$ "):
+        index = line.find(marker)
+        if index != -1:
+            line = line[:index]
+    return line.strip()
+
+
+def tokenize_card(card: str) -> list[str]:
+    """Splits a card into tokens, keeping `{...}` and `'...'` expressions (and `name={...}`) intact."""
+    card = re.sub(r"\s*=\s*", "=", card)
+    return _CARD_TOKEN_RE.findall(card)
+
+
+def parse_param_assignments(text: str) -> dict:
+    """Parses `name=value` pairs (as found on `.param` and subcircuit lines) into raw expression strings."""
+    return {name.lower(): value for name, value in _PARAM_ASSIGN_RE.findall(text)}
+
+
+def parse_netlist(netlist_text: str) -> dict:
+    """
+    Parses a flat SPICE netlist into a structured description.
+
+    Returns a dict with:
+    - `title`: the title line.
+    - `params`: top-level `.param` raw expressions (ordered, lower-cased names).
+    - `subckts`: subcircuit definitions keyed by lower-cased name, each holding
+      `ports`, `defaults`, `params` and element `cards`.
+    - `elements`: top-level element cards.
+    - `dot_cards`: remaining top-level dot cards (analyses, options, ...).
+    - `control`: lines of the `.control` block.
+    """
+    title, cards, control_lines = split_netlist(netlist_text)
+    top = {"params": {}, "cards": []}
+    subckts = {}
+    dot_cards = []
+    stack = []
+
+    for card in cards:
+        lowered = card.lower()
+        scope = stack[-1] if stack else top
+        if lowered.startswith(".subckt"):
+            tokens = tokenize_card(card)
+            if len(tokens) < 2:
+                raise UnsupportedNetlistError(f"Malformed .subckt card: {card}")
+            ports = []
+            defaults = {}
+            for token in tokens[2:]:
+                if token.lower() == "params:":
+                    continue
+                if "=" in token:
+                    defaults.update(parse_param_assignments(token))
+                else:
+                    ports.append(token.lower())
+            definition = {"name": tokens[1].lower(), "ports": ports, "defaults": defaults, "params": {}, "cards": []}
+            subckts[definition["name"]] = definition
+            stack.append(definition)
+        elif lowered.startswith(".ends"):
+            if not stack:
+                raise UnsupportedNetlistError(".ends without matching .subckt")
+            stack.pop()
+        elif lowered.startswith(".param"):
+            scope["params"].update(parse_param_assignments(card[len(".param"):]))
+        elif lowered.startswith(".end"):
+            break
+        elif card.startswith("."):
+            if stack:
+                raise UnsupportedNetlistError(f"Unsupported card inside subcircuit: {card}")
+            dot_cards.append(card)
+        else:
+            scope["cards"].append(card)
+
+    if stack:
+        raise UnsupportedNetlistError(f"Unterminated .subckt {stack[-1]['name']}")
+
+    return {
+        "title": title,
+        "params": top["params"],
+        "subckts": subckts,
+        "elements": top["cards"],
+        "dot_cards": dot_cards,
+        "control": control_lines,
+    }
+
+
+# Number of node tokens following the name of each element type; value tokens come after them.
+_ELEMENT_NODE_COUNTS = {"r": 2, "c": 2, "l": 2, "v": 2, "i": 2, "d": 2, "b": 2, "f": 2, "h": 2, "w": 2,
+                        "q": 3, "j": 3, "z": 3, "m": 4, "e": 4, "g": 4, "s": 4, "t": 4, "k": 0}
+# Dot cards whose positional tokens are names (ports, nodes, paths) rather than numbers.
+_NAME_DOT_CARDS = (".subckt", ".ends", ".include", ".inc", ".lib", ".global", ".title", ".save", ".ic", ".nodeset")
+
+
+def canonicalize_netlist(netlist_text: str) -> str:
+    """
+    Returns a canonical form of a netlist, so that semantically identical
+    netlists hash identically.
+
+    - The title line and all comments are dropped; continuations are joined.
+    - Element and dot cards are lower-cased (SPICE is case-insensitive) and
+      whitespace is normalised, including inside `{...}` expressions.
+    - Numeric literals in value positions are rewritten in one format
+      (`0.5`, `5e-1` and `500m` all become `0.5`). Node and port names are kept.
+    - Within the top level and each subcircuit, element and `.model` cards are
+      sorted; other dot cards keep their relative order. Subcircuits are sorted
+      by name. `.control` lines keep their order (they may contain file paths)
+      and only have their whitespace normalised.
+    """
+    _, cards, control_lines = split_netlist(netlist_text)
+    scopes = [{"header": None, "dots": [], "models": [], "elements": []}]
+    subckts = []
+    for card in cards:
+        lowered = card.lower()
+        if lowered == ".end" or lowered.startswith(".end "):
+            break
+        if lowered.startswith((".include", ".inc ", ".lib")):
+            # File names may be case-sensitive.
+            scopes[-1]["dots"].append(" ".join(card.split()))
+            continue
+        tokens = [_canonical_token(token) for token in tokenize_card(lowered)]
+        if lowered.startswith(".subckt"):
+            scopes.append({"header": " ".join(tokens), "dots": [], "models": [], "elements": []})
+        elif lowered.startswith(".ends"):
+            if len(scopes) > 1:
+                subckts.append(_render_canonical_scope(scopes.pop()))
+        elif lowered.startswith("."):
+            if not tokens[0].startswith(_NAME_DOT_CARDS):
+                tokens = tokens[:1] + [_canonical_number(token) for token in tokens[1:]]
+            (scopes[-1]["models"] if tokens[0] == ".model" else scopes[-1]["dots"]).append(" ".join(tokens))
+        else:
+            n_nodes = _ELEMENT_NODE_COUNTS.get(tokens[0][0])
+            if n_nodes is not None:
+                tokens = tokens[: 1 + n_nodes] + [_canonical_number(token) for token in tokens[1 + n_nodes:]]
+            scopes[-1]["elements"].append(" ".join(tokens))
+    while len(scopes) > 1:
+        subckts.append(_render_canonical_scope(scopes.pop()))
+    lines = _render_canonical_scope(scopes[0]) + [line for block in sorted(subckts) for line in block]
+    if control_lines:
+        lines += [".control"] + [" ".join(line.split()) for line in control_lines] + [".endc"]
+    return "\n".join(lines + [".end"]) + "\n"
+
+
+def canonical_netlist_hash(netlist_text: str) -> str:
+    """SHA-256 of `canonicalize_netlist(netlist_text)`."""
+    return hashlib.sha256(canonicalize_netlist(netlist_text).encode("utf-8")).hexdigest()
+
+
+def _render_canonical_scope(scope: dict) -> list[str]:
+    lines = [scope["header"]] if scope["header"] else []
+    lines += scope["dots"] + sorted(scope["models"]) + sorted(scope["elements"])
+    if scope["header"]:
+        lines.append(".ends")
+    return lines
+
+
+def _canonical_token(token: str) -> str:
+    """Removes whitespace inside expressions and normalises the value of `name=value` tokens."""
+    if "{" in token or "'" in token:
+        token = re.sub(r"\s+", "", token)
+    if "=" in token:
+        name, value = token.split("=", 1)
+        return f"{name}={_canonical_number(value)}"
+    return token
+
+
+def _canonical_number(token: str) -> str:
+    if is_spice_number(token):
+        return format(parse_spice_number(token), ".12g")
+    return token
+
+
+def evaluate_value(raw: str, scope: dict):
+    """Evaluates a card value: a SPICE number, a bare parameter name or a braced expression."""
+    raw = raw.strip().strip('"')
+    if is_spice_number(raw):
+        return parse_spice_number(raw)
+    return evaluate_expression(raw, scope)
+
+
+def resolve_params(raw_params: dict, base_scope: dict) -> dict:
+    """
+    Resolves raw `.param` expressions on top of `base_scope`, allowing forward
+    references. Returns a new scope dict.
+    """
+    scope = dict(base_scope)
+    pending = dict(raw_params)
+    while pending:
+        progressed = False
+        for name in list(pending):
+            try:
+                scope[name] = evaluate_value(pending[name], scope)
+            except ExpressionError:
+                continue
+            del pending[name]
+            progressed = True
+        if not progressed:
+            name, raw = next(iter(pending.items()))
+            # Re-evaluate to surface the underlying error message
+            try:
+                evaluate_value(raw, scope)
+            except ExpressionError as e:
+                raise UnsupportedNetlistError(f"Cannot resolve parameter {name}={raw}: {e}") from e
+    return scope
+
+
+def flatten_netlist(parsed: dict, param_overrides: Optional[dict] = None) -> list[dict]:
+    """
+    Flattens subcircuit instances into a list of primitive elements.
+
+    Each element is a dict with `type` (one of r, c, l, v, i), `name`, `nodes`
+    (two node names, internal nodes prefixed with the instance path as ngspice
+    does, e.g. `x_cell.1`), `value` and, for sources, `ac` (complex phasor).
+
+    `param_overrides` replaces top-level `.param` values; values may be NumPy
+    arrays, in which case element values are broadcast arrays as well.
+    """
+    overrides = {k.lower(): v for k, v in (param_overrides or {}).items()}
+    raw_params = {k: v for k, v in parsed["params"].items() if k not in overrides}
+    global_scope = resolve_params(raw_params, overrides)
+    elements = []
+    _flatten_cards(parsed["elements"], parsed["subckts"], global_scope, "", {}, elements, depth=0)
+    return elements
+
+
+def _flatten_cards(cards, subckts, scope, prefix, port_map, elements, depth):
+    if depth > 32:
+        raise UnsupportedNetlistError("Subcircuit nesting too deep (recursive definition?)")
+
+    def node_name(node):
+        node = node.lower()
+        if node in ("0", "gnd"):
+            return "0"
+        if node in port_map:
+            return port_map[node]
+        return f"{prefix}{node}" if prefix else node
+
+    for card in cards:
+        tokens = tokenize_card(card)
+        name = tokens[0].lower()
+        kind = name[0]
+        full_name = f"{prefix}{name}" if prefix else name
+        if kind in ("r", "c", "l"):
+            if len(tokens) < 4:
+                raise UnsupportedNetlistError(f"Malformed element card: {card}")
+            value_token = tokens[3]
+            for token in tokens[3:]:
+                if token.lower().startswith(("r=", "c=", "l=", "value=")):
+                    value_token = token.split("=", 1)[1]
+            try:
+                value = evaluate_value(value_token, scope)
+            except ExpressionError as e:
+                raise UnsupportedNetlistError(f"Cannot evaluate value of {tokens[0]}: {e}") from e
+            elements.append({"type": kind, "name": full_name, "nodes": (node_name(tokens[1]), node_name(tokens[2])), "value": value})
+        elif kind in ("v", "i"):
+            if len(tokens) < 3:
+                raise UnsupportedNetlistError(f"Malformed source card: {card}")
+            dc, ac = _parse_source_spec(tokens[3:], scope, card)
+            elements.append({"type": kind, "name": full_name, "nodes": (node_name(tokens[1]), node_name(tokens[2])), "value": dc, "ac": ac})
+        elif kind == "x":
+            positional = []
+            instance_params = {}
+            for token in tokens[1:]:
+                if token.lower() == "params:":
+                    continue
+                if "=" in token:
+                    instance_params.update(parse_param_assignments(token))
+                else:
+                    positional.append(token)
+            if not positional:
+                raise UnsupportedNetlistError(f"Malformed subcircuit instance: {card}")
+            subckt_name = positional[-1].lower()
+            definition = subckts.get(subckt_name)
+            if definition is None:
+                raise UnsupportedNetlistError(f"Unknown subcircuit {positional[-1]} in {card}")
+            nodes = positional[:-1]
+            if len(nodes) != len(definition["ports"]):
+                raise UnsupportedNetlistError(f"Port count mismatch for {tokens[0]} ({len(nodes)} vs {len(definition['ports'])})")
+            child_ports = {port: node_name(node) for port, node in zip(definition["ports"], nodes)}
+            child_scope = dict(scope)
+            for key, raw in definition["defaults"].items():
+                child_scope[key] = evaluate_value(raw, scope)
+            for key, raw in instance_params.items():
+                child_scope[key] = evaluate_value(raw, scope)
+            child_scope = resolve_params(definition["params"], child_scope)
+            _flatten_cards(definition["cards"], subckts, child_scope, f"{full_name}.", child_ports, elements, depth + 1)
+        else:
+            raise UnsupportedNetlistError(f"Unsupported element type '{tokens[0]}'")
+
+
+def _parse_source_spec(tokens: list[str], scope: dict, card: str):
+    """Extracts the DC value and AC phasor from independent source tokens."""
+    dc = 0.0
+    ac = 0j
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        lowered = token.lower()
+        if lowered == "dc" and index + 1 < len(tokens):
+            dc = evaluate_value(tokens[index + 1], scope)
+            index += 2
+        elif lowered == "ac":
+            magnitude = 1.0
+            phase = 0.0
+            if index + 1 < len(tokens) and _is_value_token(tokens[index + 1]):
+                magnitude = evaluate_value(tokens[index + 1], scope)
+                index += 1
+                if index + 1 < len(tokens) and _is_value_token(tokens[index + 1]):
+                    phase = evaluate_value(tokens[index + 1], scope)
+                    index += 1
+            ac = magnitude * np.exp(1j * np.deg2rad(phase))
+            index += 1
+        elif index == 0 and _is_value_token(token):
+            dc = evaluate_value(token, scope)
+            index += 1
+        else:
+            # Transient specifications (sin, pulse, pwl, ...) do not affect small-signal AC.
+            if "(" in token and ")" not in token:
+                while index < len(tokens) and ")" not in tokens[index]:
+                    index += 1
+            index += 1
+    return dc, ac
+
+
+def _is_value_token(token: str) -> bool:
+    return is_spice_number(token) or token.startswith("{") or token.startswith("'")
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import logging
+import os
+import re
+import subprocess
+from typing import Callable, Optional
+
+from virtual_hardware_lab.simulation_core.process_limits import apply_resource_limits, kill_process_group
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+NGSPICE_PIPE_COMMAND = ("ngspice", "-p")
+_CONTROL_BLOCK_RE = re.compile(r"^\s*\.control\b", re.IGNORECASE | re.MULTILINE)
+# Run after every simulation so vectors and circuits of previous runs do not accumulate in a worker.
+_CLEANUP_COMMANDS = ("destroy all", "remcirc")
+
+
+class NgspiceWorker:
+    """
+    One long-lived ngspice process in pipe mode (`ngspice -p`). Commands are
+    written to stdin; the end of each exchange is detected by echoing a unique
+    marker, so no prompt parsing is needed. Init files are loaded once, at start.
+    """
+
+    _markers = itertools.count()
+
+    def __init__(self, command=NGSPICE_PIPE_COMMAND, resource_limits: Optional[dict] = None):
+        self.command = list(command)
+        # CPU time accumulates over a worker's lifetime, so only memory and file size caps apply to workers.
+        self.resource_limits = {key: value for key, value in (resource_limits or {}).items() if key != "cpu_seconds"}
+        self.process = None
+        self.runs = 0
+        self.baseline_rss_kb = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, timeout: float):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=os.environ.copy(),
+            start_new_session=True, # Own process group, so a hung run can be killed with its children
+        )
+        apply_resource_limits(self.process.pid, self.resource_limits)
+        _, exited = await self.exchange([], timeout)
+        if exited:
+            raise RuntimeError(f"ngspice worker exited during startup: {' '.join(self.command)}")
+        self.baseline_rss_kb = self.rss_kb()
+
+    async def exchange(self, commands, timeout: float, on_output: Optional[Callable[[str], None]] = None) -> tuple[str, bool]:
+        """
+        Sends `commands` and returns (output, exited) once ngspice has processed
+        them. `exited` is True if the process ended instead (e.g. a control block
+        called `quit`). Output lines are also passed to `on_output` as they arrive.
+        Raises asyncio.TimeoutError if the marker does not arrive.
+        """
+        marker = f"vhl_done_{next(self._markers)}"
+        payload = "".join(f"{command}\n" for command in commands) + f"echo {marker}\n"
+        try:
+            self.process.stdin.write(payload.encode())
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The process is gone; whatever it printed is still read below.
+        lines = []
+
+        async def read_until_marker():
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    await self.process.wait()
+                    return True
+                text = line.decode(errors="replace")
+                if text.rstrip().endswith(marker):
+                    # Anything printed before the marker on the same line (e.g. a prompt) is kept.
+                    lines.append(text.rstrip()[: -len(marker)])
+                    return False
+                lines.append(text)
+                if on_output is not None:
+                    on_output(text)
+
+        exited = await asyncio.wait_for(read_until_marker(), timeout)
+        return "".join(lines), exited
+
+    async def run(self, netlist_path: str, timeout: float, on_output: Optional[Callable[[str], None]] = None) -> str:
+        """Sources a netlist (its `.control` block runs on load; otherwise `run` is issued) and returns the console output."""
+        with open(netlist_path) as f:
+            has_control_block = bool(_CONTROL_BLOCK_RE.search(f.read()))
+        commands = [f"source {netlist_path}"] + ([] if has_control_block else ["run"])
+        output, exited = await self.exchange(commands, timeout, on_output)
+        self.runs += 1
+        if not exited:
+            await self.exchange(_CLEANUP_COMMANDS, timeout)
+        return output
+
+    async def is_healthy(self, timeout: float) -> bool:
+        if not self.alive:
+            return False
+        try:
+            _, exited = await self.exchange([], timeout)
+        except asyncio.TimeoutError:
+            return False
+        return not exited
+
+    def rss_kb(self) -> Optional[int]:
+        """Resident memory of the worker in kB (Linux only; None elsewhere)."""
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError, TypeError):
+            return None
+        return None
+
+    async def close(self, timeout: float = 2.0):
+        """Asks ngspice to quit, killing its process group if it does not exit in time."""
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.write(b"quit\n")
+            await self.process.stdin.drain()
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except (BrokenPipeError, ConnectionResetError, asyncio.TimeoutError):
+            self.kill()
+            await self.process.wait()
+
+    def kill(self):
+        if self.process is not None:
+            kill_process_group(self.process)
+
+
+class NgspiceWorkerPool:
+    """
+    A bounded pool of warm `NgspiceWorker`s. Each run takes an idle worker
+    (health-checked with an echo round trip, replaced if dead or hung) or
+    starts one, and returns it afterwards. Workers are recycled after
+    `max_runs` simulations or once their resident memory has grown by more
+    than `max_rss_growth_mb`; a worker whose run times out or is cancelled is
+    killed. `resource_limits` (see `apply_resource_limits`) cap every worker.
+    """
+
+    def __init__(self, size: int, command=NGSPICE_PIPE_COMMAND, max_runs: int = 200, max_rss_growth_mb: float = 256,
+                 run_timeout: float = 60, health_timeout: float = 5, startup_timeout: float = 30, resource_limits: Optional[dict] = None):
+        if size < 1:
+            raise ValueError("An ngspice worker pool needs at least one worker.")
+        self.size = size
+        self.command = tuple(command)
+        self.max_runs = max_runs
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self.run_timeout = run_timeout
+        self.health_timeout = health_timeout
+        self.startup_timeout = startup_timeout
+        self.resource_limits = resource_limits
+        if (resource_limits or {}).get("cpu_seconds") is not None:
+            logger.warning("The cpu_seconds resource limit does not apply to warm ngspice workers (CPU time accumulates over a worker's lifetime); runs are bounded by their timeout only.")
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.stats = {"started": 0, "recycled": 0, "replaced": 0, "killed": 0, "runs": 0}
+
+    async def run(self, netlist_path: str, timeout: Optional[float] = None, on_output: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Simulates `netlist_path` on a warm worker and returns the ngspice console
+        output (also streamed to `on_output`). Raises `subprocess.TimeoutExpired`
+        (like batch mode) on timeout.
+        """
+        timeout = timeout or self.run_timeout
+        async with self._slots:
+            worker = await self._acquire()
+            try:
+                output = await worker.run(netlist_path, timeout, on_output)
+            except asyncio.TimeoutError:
+                await self._discard(worker, "killed")
+                raise subprocess.TimeoutExpired(list(self.command) + [netlist_path], timeout)
+            except BaseException:
+                # Cancelled or failed mid-exchange: the worker's state is unknown.
+                await asyncio.shield(self._discard(worker, "killed"))
+                raise
+            self.stats["runs"] += 1
+            if worker.alive and not self._needs_recycling(worker):
+                self._idle.append(worker)
+            else:
+                self.stats["recycled"] += 1
+                await worker.close()
+            return output
+
+    async def close(self):
+        """Stops every idle worker (busy ones are stopped when their run returns)."""
+        workers, self._idle = self._idle, []
+        await asyncio.gather(*(worker.close() for worker in workers))
+
+    async def _acquire(self) -> NgspiceWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if await worker.is_healthy(self.health_timeout):
+                return worker
+            logger.warning(f"ngspice worker {worker.pid} failed its health check; replacing it.")
+            await self._discard(worker, "replaced")
+        worker = NgspiceWorker(self.command, self.resource_limits)
+        await worker.start(self.startup_timeout)
+        self.stats["started"] += 1
+        return worker
+
+    def _needs_recycling(self, worker: NgspiceWorker) -> bool:
+        if worker.runs >= self.max_runs:
+            return True
+        rss = worker.rss_kb()
+        return rss is not None and worker.baseline_rss_kb is not None and (rss - worker.baseline_rss_kb) > self.max_rss_growth_mb * 1024
+
+    async def _discard(self, worker: NgspiceWorker, reason: str):
+        self.stats[reason] += 1
+        worker.kill()
+        await worker.process.wait()
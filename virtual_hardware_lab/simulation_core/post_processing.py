@@ -0,0 +1,205 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+# The input every pipeline starts from: the run's loaded data (see `load_run_data`).
+RUN_INPUT = "run"
+
+# Registered stages by name: {"function", "inputs", "outputs", "version", "description"}.
+POST_PROCESSORS = {}
+
+
+def register_post_processor(name: str, function: Callable, inputs=(RUN_INPUT,), outputs=(), version: int = 1, description: str = ""):
+    """
+    Registers a post-processing stage. `function(*inputs, out_dir, sim_id,
+    options)` receives the run data for `RUN_INPUT` and the result of the named
+    stage for every other input, writes its files into `out_dir` and returns
+    {"artifacts": {name: path}, "summary": {...}, "arrays": {...}} (all
+    optional). `outputs` declares the artifact names it may produce. Bump
+    `version` when the stage's results change, so cached ones are recomputed.
+    The function must be importable by name (module level) to run in a process pool.
+    """
+    if name == RUN_INPUT:
+        raise ValueError(f"'{RUN_INPUT}' is reserved for the run data.")
+    POST_PROCESSORS[name] = {
+        "function": function,
+        "inputs": tuple(inputs),
+        "outputs": tuple(outputs),
+        "version": version,
+        "description": description,
+    }
+    return function
+
+
+def post_processor(name: str, inputs=(RUN_INPUT,), outputs=(), version: int = 1, description: str = ""):
+    """Decorator form of `register_post_processor`."""
+
+    def decorate(function):
+        return register_post_processor(name, function, inputs, outputs, version, description)
+
+    return decorate
+
+
+def describe_post_processors() -> list:
+    """The registered stages with their declared inputs and outputs."""
+    return [
+        {"name": name, "inputs": list(spec["inputs"]), "outputs": list(spec["outputs"]), "description": spec["description"]}
+        for name, spec in sorted(POST_PROCESSORS.items())
+    ]
+
+
+def resolve_stages(steps: list) -> list:
+    """
+    Orders `steps` ({"name", "options"}) so every stage follows its inputs,
+    adding missing input stages with default options. Raises ValueError for
+    unknown stages and dependency cycles.
+    """
+    requested = {step["name"]: dict(step.get("options") or {}) for step in steps}
+    ordered, state = [], {}
+
+    def visit(name, path):
+        if name not in POST_PROCESSORS:
+            raise ValueError(f"Unknown post-processor '{name}'. Available: {sorted(POST_PROCESSORS)}")
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Post-processor dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for dependency in POST_PROCESSORS[name]["inputs"]:
+            if dependency != RUN_INPUT:
+                visit(dependency, path + [name])
+        state[name] = "done"
+        ordered.append({"name": name, "options": requested.get(name, {})})
+
+    for name in requested:
+        visit(name, [])
+    return ordered
+
+
+def stage_keys(steps: list, fingerprint: str) -> dict:
+    """Cache key of each resolved stage: a hash of its name, version and options and of its inputs' keys."""
+    keys = {RUN_INPUT: fingerprint}
+    for step in steps:
+        spec = POST_PROCESSORS[step["name"]]
+        material = [step["name"], spec["version"], step["options"], [keys[name] for name in spec["inputs"]]]
+        keys[step["name"]] = hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return keys
+
+
+def call_stage(function: Callable, inputs: list, out_dir: str, sim_id: str, options: dict, outputs: tuple) -> dict:
+    """Runs one stage (in a pool process or inline) and normalises its result."""
+    os.makedirs(out_dir, exist_ok=True)
+    produced = function(*inputs, out_dir, sim_id, dict(options)) or {}
+    undeclared = set(produced.get("artifacts") or {}) - set(outputs)
+    if undeclared:
+        raise ValueError(f"Produced undeclared artifacts {sorted(undeclared)} (declared: {list(outputs)}).")
+    return {
+        "artifacts": dict(produced.get("artifacts") or {}),
+        "summary": dict(produced.get("summary") or {}),
+        "arrays": dict(produced.get("arrays") or {}),
+    }
+
+
+def _completed(function, *args) -> concurrent.futures.Future:
+    """Runs `function` now and wraps the outcome in a Future, standing in for `executor.submit`."""
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run_pipeline(steps: list, load_run: Callable[[], dict], out_dir: str, sim_id: str,
+                 executor: Optional[concurrent.futures.Executor] = None, cache_dir: Optional[str] = None,
+                 fingerprint: Optional[str] = None) -> dict:
+    """
+    Executes post-processing `steps` and the stages they depend on as a DAG.
+    Stages whose inputs are ready are submitted together to `executor` (e.g.
+    a process pool; inline without one). The run data is loaded (`load_run`)
+    only if a stage that needs it is not cached.
+
+    Without `cache_dir`, artifacts are written to `out_dir`. With it, each
+    stage writes to `<cache_dir>/<name>_<key>/` and its result is recorded in
+    `<cache_dir>/<name>_<key>.json`, where the key hashes the stage's options
+    and version with its inputs' keys, down to the run's data `fingerprint`;
+    recorded results are reused.
+
+    Returns {"artifacts", "summary", "errors", "cached": [names], "stages":
+    {name: result}}. A stage raising KeyError or ValueError is reported in
+    `errors`, as are the stages depending on it; the others still run.
+    """
+    steps = resolve_stages(steps)
+    keys = stage_keys(steps, fingerprint or "") if cache_dir else {}
+    results, errors, cached = {}, {}, []
+    run = []
+    pending = list(steps)
+    while pending:
+        ready = [step for step in pending if all(name == RUN_INPUT or name in results or name in errors for name in POST_PROCESSORS[step["name"]]["inputs"])]
+        pending = [step for step in pending if step not in ready]
+        futures = {}
+        for step in ready:
+            name, spec = step["name"], POST_PROCESSORS[step["name"]]
+            failed = [dependency for dependency in spec["inputs"] if dependency in errors]
+            if failed:
+                errors[name] = f"Input '{failed[0]}' failed."
+                continue
+            record_path = os.path.join(cache_dir, f"{name}_{keys[name]}.json") if cache_dir else None
+            if record_path and os.path.exists(record_path):
+                results[name] = _read_record(record_path)
+                cached.append(name)
+                continue
+            if RUN_INPUT in spec["inputs"] and not run:
+                run.append(load_run())
+            inputs = [run[0] if dependency == RUN_INPUT else results[dependency] for dependency in spec["inputs"]]
+            stage_dir = record_path[:-len(".json")] if record_path else out_dir
+            args = (spec["function"], inputs, stage_dir, sim_id, step["options"], spec["outputs"])
+            futures[name] = (executor.submit(call_stage, *args) if executor is not None else _completed(call_stage, *args), record_path)
+        for name, (future, record_path) in futures.items():
+            try:
+                results[name] = future.result()
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Post-processor {name} failed for {sim_id}: {e}")
+                errors[name] = str(e)
+                continue
+            if record_path:
+                _write_record(record_path, name, keys[name], results[name])
+
+    outcome = {"artifacts": {}, "summary": {}, "errors": errors, "cached": cached, "stages": {}}
+    for step in steps:
+        result = results.get(step["name"])
+        if result is None:
+            continue
+        outcome["artifacts"].update(result["artifacts"])
+        outcome["summary"].update(result["summary"])
+        outcome["stages"][step["name"]] = {"artifacts": result["artifacts"], "summary": result["summary"], "cached": step["name"] in cached}
+    return outcome
+
+
+def _write_record(path: str, name: str, key: str, result: dict):
+    arrays_path = None
+    if result["arrays"]:
+        arrays_path = os.path.join(path[:-len(".json")], "arrays.npz")
+        np.savez_compressed(arrays_path, **result["arrays"])
+    record = {"stage": name, "key": key, "artifacts": result["artifacts"], "summary": result["summary"], "arrays": arrays_path}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(temporary, path)
+
+
+def _read_record(path: str) -> dict:
+    with open(path) as f:
+        record = json.load(f)
+    arrays = {}
+    if record.get("arrays") and os.path.exists(record["arrays"]):
+        with np.load(record["arrays"]) as data:
+            arrays = {name: data[name] for name in data.files}
+    return {"artifacts": record["artifacts"], "summary": record["summary"], "arrays": arrays}
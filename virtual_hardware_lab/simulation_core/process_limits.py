@@ -0,0 +1,117 @@
+import asyncio
+import codecs
+import logging
+import os
+import signal
+import subprocess
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+# Keys accepted in a `resource_limits` dict and their units.
+RESOURCE_LIMITS = {
+    "cpu_seconds": ("RLIMIT_CPU", 1),
+    "address_space_mb": ("RLIMIT_AS", 1024 * 1024),
+    "file_size_mb": ("RLIMIT_FSIZE", 1024 * 1024),
+}
+
+
+class RunCancelledError(RuntimeError):
+    """Raised by `start_sim` when its run was cancelled through `cancel_run`."""
+
+    def __init__(self, sim_id: str):
+        self.sim_id = sim_id
+        super().__init__(f"Run {sim_id} was cancelled.")
+
+
+def apply_resource_limits(pid: int, limits: Optional[dict]):
+    """
+    Caps a running process with `prlimit` (Linux): `cpu_seconds` (SIGXCPU, then
+    SIGKILL one second later), `address_space_mb` and `file_size_mb`. Limits
+    above the process's current hard limit are clamped to it. Limits are set
+    right after the process starts, so no `preexec_fn` runs in the forked child.
+    """
+    if not limits:
+        return
+    if resource is None or not hasattr(resource, "prlimit"):
+        logger.warning("Resource limits are not supported on this platform; running ngspice without them.")
+        return
+    for key, value in limits.items():
+        if key not in RESOURCE_LIMITS:
+            raise ValueError(f"Unknown resource limit '{key}'. Expected one of {tuple(RESOURCE_LIMITS)}.")
+        if value is None:
+            continue
+        name, unit = RESOURCE_LIMITS[key]
+        which = getattr(resource, name)
+        soft = int(float(value) * unit)
+        hard = soft + 1 if key == "cpu_seconds" else soft
+        _, current_hard = resource.prlimit(pid, which)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        try:
+            resource.prlimit(pid, which, (soft, hard))
+        except ProcessLookupError:
+            return # Already exited
+
+
+def kill_process_group(process):
+    """SIGKILLs a process started with `start_new_session=True` together with its children."""
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_limited(command, timeout: float, limits: Optional[dict] = None, env: Optional[dict] = None,
+                      on_output: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
+    """
+    Runs `command` in its own process group under `limits` and returns a
+    `subprocess.CompletedProcess` with text output. Output is read as it is
+    produced and passed to `on_output` (stdout and stderr chunks alike). On
+    timeout the process group is killed and `subprocess.TimeoutExpired` raised
+    (carrying the output read so far); if the awaiting task is cancelled the
+    process group is killed too.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+        start_new_session=True,
+    )
+    stdout, stderr = [], []
+
+    async def pump(stream, chunks):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = await stream.read(65536)
+            text = decoder.decode(data, final=not data)
+            if text:
+                chunks.append(text)
+                if on_output is not None:
+                    on_output(text)
+            if not data:
+                return
+
+    try:
+        apply_resource_limits(process.pid, limits)
+        await asyncio.wait_for(asyncio.gather(pump(process.stdout, stdout), pump(process.stderr, stderr), process.wait()), timeout)
+    except asyncio.TimeoutError:
+        kill_process_group(process)
+        await process.wait()
+        raise subprocess.TimeoutExpired(list(command), timeout, output="".join(stdout), stderr="".join(stderr))
+    except BaseException:
+        kill_process_group(process)
+        await asyncio.shield(process.wait())
+        raise
+    return subprocess.CompletedProcess(list(command), process.returncode, "".join(stdout), "".join(stderr))
@@ -0,0 +1,151 @@
+import datetime
+import os
+from typing import Optional
+
+import numpy as np
+
+RAWFILE_TYPES = ("binary", "ascii")
+
+_SCALE_TYPES = {"frequency": "frequency", "time": "time"}
+
+
+def write_rawfile(path: str, scale_name: str, vectors: dict, title: str = "", plotname: str = "AC Analysis", filetype: str = "binary"):
+    """
+    Writes one plot in ngspice's rawfile format. `vectors` maps names to equal
+    length arrays, the scale (`scale_name`) first. The plot is complex if any
+    vector is complex, in which case every value is stored as a (real, imag)
+    pair, exactly as ngspice does.
+    """
+    if filetype not in RAWFILE_TYPES:
+        raise ValueError(f"Unknown rawfile type '{filetype}'. Expected one of {RAWFILE_TYPES}.")
+    names = [scale_name] + [name for name in vectors if name != scale_name]
+    complex_plot = any(np.iscomplexobj(vectors[name]) for name in names)
+    dtype = np.complex128 if complex_plot else np.float64
+    data = np.column_stack([np.asarray(vectors[name]).astype(dtype) for name in names])
+    header = [
+        f"Title: {title}",
+        f"Date: {datetime.datetime.now().strftime('%a %b %d %H:%M:%S %Y')}",
+        f"Plotname: {plotname}",
+        f"Flags: {'complex' if complex_plot else 'real'}",
+        f"No. Variables: {len(names)}",
+        f"No. Points: {len(data)}",
+        "Variables:",
+    ]
+    for index, name in enumerate(names):
+        header.append(f"\t{index}\t{name}\t{_vector_type(name, scale_name)}")
+    with open(path, "wb") as f:
+        if filetype == "binary":
+            f.write(("\n".join(header) + "\nBinary:\n").encode())
+            f.write(np.ascontiguousarray(data).tobytes())
+            return
+        f.write(("\n".join(header) + "\nValues:\n").encode())
+        lines = []
+        for row, values in enumerate(data):
+            fields = [f"{v.real:.15e},{v.imag:.15e}" if complex_plot else f"{v.real:.15e}" for v in values]
+            lines.append(f" {row}\t" + "\n\t".join(fields))
+        f.write(("\n".join(lines) + "\n").encode())
+
+
+def read_rawfile(path: str) -> list[dict]:
+    """
+    Reads every plot of an ngspice rawfile.
+
+    Binary plots are memory-mapped: each vector is a zero-copy (strided) view
+    into the file, so only the samples actually touched are paged in. ASCII
+    plots are parsed into memory. Each plot is a dict with `title`, `plotname`,
+    `flags`, `scale` (name of the first variable), `names` and `vectors`
+    ({name: array}, names lower-cased; complex plots yield complex vectors).
+    """
+    plots = []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset < file_size:
+            f.seek(offset)
+            header, data_kind = _read_header(f)
+            if data_kind is None:
+                break
+            offset = f.tell()
+            n_vars = int(header["no. variables"])
+            n_points = int(header["no. points"])
+            complex_plot = "complex" in header.get("flags", "").lower()
+            names = header["variables"]
+            if len(names) != n_vars:
+                raise ValueError(f"{path}: expected {n_vars} variables, found {len(names)}.")
+            if data_kind == "binary":
+                dtype = np.dtype(np.complex128 if complex_plot else np.float64)
+                # A simulation that was interrupted leaves fewer points than announced.
+                n_points = min(n_points, (file_size - offset) // (dtype.itemsize * n_vars))
+                table = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n_points, n_vars)) if n_points else np.empty((0, n_vars), dtype)
+                offset += n_points * n_vars * dtype.itemsize
+            else:
+                table, offset = _read_ascii_values(f, n_points, n_vars, complex_plot)
+            plots.append({
+                "title": header.get("title", ""),
+                "plotname": header.get("plotname", ""),
+                "flags": header.get("flags", ""),
+                "scale": names[0],
+                "names": names,
+                "vectors": {name: table[:, index] for index, name in enumerate(names)},
+            })
+    if not plots:
+        raise ValueError(f"{path} is not an ngspice rawfile.")
+    return plots
+
+
+def _read_header(f) -> tuple[dict, Optional[str]]:
+    header = {"variables": []}
+    in_variables = False
+    while True:
+        line = f.readline()
+        if not line:
+            return header, None
+        text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+        stripped = text.strip()
+        key = stripped.lower()
+        if key in ("binary:", "values:"):
+            return header, key[:-1] if key == "binary:" else "ascii"
+        if in_variables and text[:1] in ("\t", " ") and stripped:
+            fields = stripped.split()
+            if len(fields) >= 2 and fields[0].isdigit():
+                header["variables"].append(fields[1].lower())
+                continue
+        in_variables = False
+        if key == "variables:":
+            in_variables = True
+        elif ":" in stripped:
+            name, value = stripped.split(":", 1)
+            header[name.strip().lower()] = value.strip()
+
+
+def _read_ascii_values(f, n_points: int, n_vars: int, complex_plot: bool) -> tuple[np.ndarray, int]:
+    values = []
+    expected = n_points * n_vars
+    while len(values) < expected:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        fields = line.decode().split()
+        if not fields:
+            continue
+        if ":" in fields[0]:
+            # Start of the next plot header: the file holds fewer points than announced.
+            f.seek(position)
+            break
+        # The first value of every point is preceded by the point index.
+        values.append(fields[-1])
+    parsed = [complex(*map(float, v.split(","))) if complex_plot else float(v) for v in values]
+    rows = len(parsed) // n_vars
+    table = np.array(parsed[: rows * n_vars], dtype=complex if complex_plot else float).reshape(rows, n_vars)
+    return table, f.tell()
+
+
+def _vector_type(name: str, scale_name: str) -> str:
+    if name == scale_name:
+        return _SCALE_TYPES.get(name, "notype") + (" grid=3" if name == "frequency" else "")
+    if name.startswith("v(") or name.startswith("v-"):
+        return "voltage"
+    if name.startswith("i(") or name.endswith("#branch"):
+        return "current"
+    return "notype"
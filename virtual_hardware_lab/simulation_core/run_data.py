@@ -0,0 +1,167 @@
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.netlist import split_netlist, tokenize_card
+from virtual_hardware_lab.simulation_core.rawfile import read_rawfile
+
+ANALYSIS_AXES = {".ac": "frequency", ".tran": "time", ".dc": "sweep", ".noise": "frequency"}
+
+
+def data_outputs(netlist_text: str) -> list:
+    """
+    Returns the `wrdata` and `write` commands of a netlist's control block as
+    (filename, vector_names, options) tuples, where `options["format"]` is
+    "wrdata" or "raw". `set wr_singlescale` and `set wr_vecnames` are tracked
+    the same way the native engine does.
+    """
+    _, _, control_lines = split_netlist(netlist_text)
+    options = {"singlescale": False, "vecnames": False}
+    outputs = []
+    for line in control_lines:
+        tokens = tokenize_card(line)
+        if not tokens:
+            continue
+        command = tokens[0].lower()
+        if command in ("set", "unset") and len(tokens) > 1:
+            name = tokens[1].split("=")[0].lower()
+            if name in ("wr_singlescale", "wr_vecnames"):
+                options[name[3:]] = command == "set"
+        elif command == "wrdata" and len(tokens) > 2:
+            outputs.append((tokens[1], tokens[2:], dict(options, format="wrdata")))
+        elif command == "write":
+            outputs.append((tokens[1] if len(tokens) > 1 else "rawspice.raw", tokens[2:], {"format": "raw"}))
+    return outputs
+
+
+def analysis_axis(netlist_text: str) -> str:
+    """Names the scale of the netlist's analysis: 'frequency', 'time' or 'sweep'."""
+    _, cards, control_lines = split_netlist(netlist_text)
+    for line in cards + control_lines:
+        command = line.split()[0].lower()
+        key = command if command.startswith(".") else "." + command
+        if key in ANALYSIS_AXES:
+            return ANALYSIS_AXES[key]
+    return "sweep"
+
+
+def read_wrdata(path: str, names: list, singlescale: bool = False) -> dict:
+    """
+    Reads a `wrdata` file into {"scale": array, "vectors": {name: array}}.
+
+    Each vector is preceded by its own copy of the scale unless `singlescale`;
+    complex vectors occupy two columns and come back as complex arrays. A
+    `wr_vecnames` header line is skipped.
+    """
+    with open(path) as f:
+        first = f.readline()
+    skip = 0 if _is_numeric_line(first) else 1
+    data = np.loadtxt(path, skiprows=skip, ndmin=2)
+    if data.shape[1] == 0:
+        raise ValueError(f"{path} contains no data.")
+    scale = data[:, 0]
+    vectors = {}
+    if singlescale:
+        values = data.shape[1] - 1
+        if values == len(names):
+            widths = [1] * len(names)
+        elif values == 2 * len(names):
+            widths = [2] * len(names)
+        else:
+            raise ValueError(f"Cannot map {values} columns of {path} onto vectors {names}.")
+        column = 1
+        for name, width in zip(names, widths):
+            vectors[name] = _column_value(data, column, width)
+            column += width
+    else:
+        column = 0
+        for name in names:
+            if column + 1 >= data.shape[1] or not np.array_equal(data[:, column], scale):
+                raise ValueError(f"Unexpected column layout in {path} at vector '{name}'.")
+            # A complex vector has a second value column before the next copy of the scale.
+            next_is_scale = column + 2 >= data.shape[1] or np.array_equal(data[:, column + 2], scale)
+            width = 1 if next_is_scale else 2
+            vectors[name] = _column_value(data, column + 1, width)
+            column += 1 + width
+    return {"scale": scale, "vectors": vectors}
+
+
+def load_run_data(run_dir: str, netlist_filename: str = "merged.cir", netlist_path: Optional[str] = None) -> dict:
+    """
+    Loads every vector a run wrote with `write` or `wrdata`, using the run's
+    merged netlist to find the files and recover `wrdata` vector names/layout.
+
+    Rawfiles are preferred: binary ones are memory-mapped, so the returned
+    vectors are zero-copy views and only the samples a caller touches are read.
+    Text `wrdata` files are parsed in full and only fill in vectors no rawfile
+    provided.
+
+    Returns {"axis": 'frequency'|'time'|'sweep', "scale": array, "vectors": {name: array}};
+    vector names are lower-cased, as ngspice treats them. `netlist_path` points
+    at the netlist when it is not kept in the run directory (fragment store).
+    """
+    netlist_path = netlist_path or os.path.join(run_dir, netlist_filename)
+    if not os.path.exists(netlist_path):
+        raise FileNotFoundError(f"No {os.path.basename(netlist_path)} for {run_dir}")
+    with open(netlist_path) as f:
+        netlist_text = f.read()
+    outputs = data_outputs(netlist_text)
+    # Rawfiles first: they are exact and cheap to open.
+    outputs.sort(key=lambda output: output[2]["format"] != "raw")
+    scale = None
+    vectors = {}
+    for filename, names, options in outputs:
+        # Paths in merged netlists are relative to where ngspice ran; the file itself lives in the run directory.
+        path = os.path.join(run_dir, os.path.basename(filename))
+        if not os.path.exists(path):
+            continue
+        if options["format"] == "raw":
+            plot = read_rawfile(path)[0]
+            data = {"scale": np.real(plot["vectors"][plot["scale"]]), "vectors": {name: values for name, values in plot["vectors"].items() if name != plot["scale"]}}
+        else:
+            data = read_wrdata(path, names, options["singlescale"])
+        if scale is None:
+            scale = data["scale"]
+        elif not np.array_equal(scale, data["scale"]):
+            continue
+        for name, values in data["vectors"].items():
+            vectors.setdefault(name.lower(), values)
+    if scale is None:
+        raise FileNotFoundError(f"No data output found for {run_dir}")
+    return {"axis": analysis_axis(netlist_text), "scale": scale, "vectors": vectors}
+
+
+def data_fingerprint(run_dir: str, netlist_filename: str = "merged.cir", netlist_path: Optional[str] = None) -> str:
+    """
+    Identifies the data a run holds by the name, size and mtime of its output
+    files (those `load_run_data` would read), without parsing them. Used to
+    key results derived from the data.
+    """
+    netlist_path = netlist_path or os.path.join(run_dir, netlist_filename)
+    if not os.path.exists(netlist_path):
+        raise FileNotFoundError(f"No {os.path.basename(netlist_path)} for {run_dir}")
+    with open(netlist_path) as f:
+        outputs = data_outputs(f.read())
+    digest = hashlib.sha256()
+    for filename, _, _ in outputs:
+        path = os.path.join(run_dir, os.path.basename(filename))
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _column_value(data: np.ndarray, column: int, width: int) -> np.ndarray:
+    if width == 2:
+        return data[:, column] + 1j * data[:, column + 1]
+    return data[:, column]
+
+
+def _is_numeric_line(line: str) -> bool:
+    try:
+        [float(token) for token in line.split()]
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import math
+import re
+import time
+from collections import deque
+from typing import Optional
+
+from virtual_hardware_lab.simulation_core.batch_netlist import BATCH_POINT_MARKER
+from virtual_hardware_lab.simulation_core.netlist import ExpressionError, parse_spice_number
+
+EVENT_TYPES = ("queued", "started", "progress", "finished", "failed", "cancelled")
+# ngspice reports the current sweep point ("Reference value : 1.23e+03") and, in some modes, a percentage ("tran 45.2%").
+_REFERENCE_VALUE_RE = re.compile(r"Reference value\s*:\s*([-+0-9.eE]+)")
+_PERCENT_RE = re.compile(r"^\s*(?:\w+\s+)?(\d+(?:\.\d+)?)%\s*$")
+_AC_RE = re.compile(r"^\s*\.ac\s+(dec|oct|lin)\s+\S+\s+(\S+)\s+(\S+)", re.IGNORECASE | re.MULTILINE)
+_TRAN_RE = re.compile(r"^\s*\.tran\s+\S+\s+(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+class RunEventBus:
+    """
+    Run lifecycle events (`EVENT_TYPES`) fanned out to subscribers. Every event
+    gets an increasing id and is kept in a replay buffer of the last
+    `replay_size` events, so a client that reconnects with the last id it saw
+    receives what it missed. A subscriber that falls more than `queue_size`
+    events behind is disconnected (its iterator ends) and must resume from its
+    last id. Publish from the event loop thread.
+    """
+
+    def __init__(self, replay_size: int = 1000, queue_size: int = 1000):
+        self.replay_size = replay_size
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._buffer = deque(maxlen=replay_size)
+        self._subscribers = []
+
+    def publish(self, sim_id: str, event: str, **data) -> dict:
+        record = {"id": next(self._ids), "event": event, "sim_id": sim_id, "time": time.time(), **data}
+        self._buffer.append(record)
+        for wanted, queue in list(self._subscribers):
+            if wanted is not None and wanted != sim_id:
+                continue
+            try:
+                queue.put_nowait(record)
+            except asyncio.QueueFull:
+                # Too slow: drop what is pending and tell the subscriber to reconnect (it resumes from the replay buffer).
+                self._subscribers.remove((wanted, queue))
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return record
+
+    def replay(self, sim_id: Optional[str] = None, after: int = 0) -> list:
+        """Buffered events newer than `after`, optionally for one run."""
+        return [record for record in self._buffer if record["id"] > after and (sim_id is None or record["sim_id"] == sim_id)]
+
+    async def subscribe(self, sim_id: Optional[str] = None, after: Optional[int] = None):
+        """
+        Yields the events of one run (or of all runs): first the buffered events
+        newer than `after` (none if `after` is None), then live ones.
+        """
+        subscriber = (sim_id, asyncio.Queue(self.queue_size))
+        self._subscribers.append(subscriber)
+        try:
+            last_id = after or 0
+            for record in (self.replay(sim_id, after) if after is not None else []):
+                last_id = record["id"]
+                yield record
+            while True:
+                record = await subscriber[1].get()
+                if record is None:
+                    return
+                if record["id"] > last_id: # Already sent from the replay buffer otherwise
+                    last_id = record["id"]
+                    yield record
+        finally:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class NgspiceProgress:
+    """
+    Turns ngspice console output into a completion percentage. The netlist's
+    `.ac` or `.tran` card gives the sweep range, in which the "Reference value"
+    lines ngspice prints (frequency or time) are placed (logarithmically for
+    dec/oct sweeps). Explicit "NN%" reports are used as they are.
+    """
+
+    def __init__(self, netlist: str):
+        self.percent = 0.0
+        self._pending = ""
+        self._range = None
+        ac, tran = _AC_RE.search(netlist), _TRAN_RE.search(netlist)
+        try:
+            if ac:
+                self._range = (parse_spice_number(ac.group(2)), parse_spice_number(ac.group(3)), ac.group(1).lower() != "lin")
+            elif tran:
+                self._range = (0.0, parse_spice_number(tran.group(1)), False)
+        except ExpressionError:
+            self._range = None
+
+    def feed(self, text: str) -> Optional[float]:
+        """Consumes console output; returns the new percentage if it advanced, else None."""
+        self._pending += text
+        *lines, self._pending = re.split(r"[\r\n]", self._pending)
+        advanced = None
+        for line in lines:
+            percent = self._parse(line)
+            if percent is not None and percent > self.percent:
+                self.percent = advanced = min(percent, 100.0)
+        return advanced
+
+    def _parse(self, line: str) -> Optional[float]:
+        match = _REFERENCE_VALUE_RE.search(line)
+        if match:
+            if self._range is None:
+                return None
+            start, stop, logarithmic = self._range
+            try:
+                value = float(match.group(1))
+            except ValueError:
+                return None
+            if logarithmic:
+                if not 0 < start < stop or value <= 0:
+                    return None
+                return 100.0 * math.log(value / start) / math.log(stop / start)
+            return 100.0 * (value - start) / (stop - start) if stop > start else None
+        match = _PERCENT_RE.match(line)
+        return float(match.group(1)) if match else None
+
+
+class BatchProgress:
+    """
+    Completion percentage of a batch (see `batch_netlist.build_batch_netlist`)
+    of `total` points, whose invocations each repeat the netlist's sweep once
+    per point. The `BATCH_POINT_MARKER` lines separate the points: progress
+    is (points done + fraction of each invocation's current sweep) / total,
+    shared by all invocations of the batch and never going back.
+    """
+
+    def __init__(self, netlist: str, total: int):
+        self.total = max(total, 1)
+        self.percent = 0.0
+        self._netlist = netlist
+        self._done = 0
+        # Per invocation: unparsed output and the progress of its current point.
+        self._invocations = {}
+
+    def feed(self, invocation, text: str) -> tuple:
+        """
+        Consumes console output of one invocation. Returns (percent, started):
+        the new batch percentage if it advanced (else None) and the indices,
+        within the invocation, of the points that started.
+        """
+        state = self._invocations.setdefault(invocation, {"pending": "", "point": None})
+        state["pending"] += text
+        *lines, state["pending"] = re.split(r"[\r\n]", state["pending"])
+        started = []
+        for line in lines:
+            tokens = line.split()
+            if len(tokens) == 2 and tokens[0] == BATCH_POINT_MARKER and tokens[1].isdigit():
+                if state["point"] is not None:
+                    self._done += 1
+                state["point"] = NgspiceProgress(self._netlist)
+                started.append(int(tokens[1]))
+            elif state["point"] is not None:
+                state["point"].feed(line + "\n")
+        return self._advance(), started
+
+    def finish(self, invocation) -> Optional[float]:
+        """Marks the current point of a finished invocation done; returns the new percentage if it advanced."""
+        state = self._invocations.pop(invocation, None)
+        if state is not None and state["point"] is not None:
+            self._done += 1
+        return self._advance()
+
+    def _advance(self) -> Optional[float]:
+        current = sum(state["point"].percent / 100.0 for state in self._invocations.values() if state["point"] is not None)
+        percent = min(100.0 * (self._done + current) / self.total, 100.0)
+        if percent > self.percent:
+            self.percent = percent
+            return percent
+        return None
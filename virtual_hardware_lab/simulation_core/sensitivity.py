@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def central_difference_points(base: np.ndarray, rel_step: float = 1e-3) -> np.ndarray:
+    """
+    Returns the [2 * n_params, n_params] parameter sets for multiplicative central
+    differences: rows 2k and 2k + 1 scale parameter k by (1 + h) and (1 - h).
+    """
+    if not 0 < rel_step < 1:
+        raise ValueError("rel_step must be between 0 and 1.")
+    base = np.asarray(base, dtype=float)
+    n = len(base)
+    factors = np.ones((2 * n, n))
+    factors[0::2][np.arange(n), np.arange(n)] = 1.0 + rel_step
+    factors[1::2][np.arange(n), np.arange(n)] = 1.0 - rel_step
+    return factors * base[None, :]
+
+
+def normalized_sensitivities(z_perturbed: np.ndarray, z_base: np.ndarray, rel_step: float = 1e-3) -> dict:
+    """
+    Computes log-normalised sensitivities from the responses at the points of
+    `central_difference_points`:
+
+    - `magnitude`: d ln|Z| / d ln p (dimensionless, `p/|Z| * d|Z|/dp`)
+    - `phase_deg`: d phase / d ln p in degrees (`p * dphase/dp`)
+
+    Both are [n_params, n_freq]. The phase difference is taken from the ratio of
+    the perturbed responses so it never wraps.
+    """
+    z_perturbed = np.asarray(z_perturbed, dtype=complex)
+    z_plus, z_minus = z_perturbed[0::2], z_perturbed[1::2]
+    d_log_p = np.log1p(rel_step) - np.log1p(-rel_step)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = (np.log(np.abs(z_plus)) - np.log(np.abs(z_minus))) / d_log_p
+        phase = np.degrees(np.angle(z_plus / z_minus)) / d_log_p
+    # A response that vanishes at the base point has no meaningful relative sensitivity.
+    zero = np.abs(np.asarray(z_base)) == 0
+    magnitude = np.where(zero[None, :], 0.0, np.nan_to_num(magnitude))
+    phase = np.where(zero[None, :], 0.0, np.nan_to_num(phase))
+    return {"magnitude": magnitude, "phase_deg": phase}
+
+
+def rank_parameters(names: list[str], magnitude: np.ndarray, phase_deg: np.ndarray) -> list[dict]:
+    """Summarises each parameter's influence (RMS and peak over frequency), most influential first."""
+    summary = []
+    for name, mag_row, phase_row in zip(names, magnitude, phase_deg):
+        peak = int(np.argmax(np.abs(mag_row)))
+        summary.append({
+            "name": name,
+            "rms_magnitude": float(np.sqrt(np.mean(mag_row ** 2))),
+            "max_abs_magnitude": float(np.abs(mag_row[peak])),
+            "peak_index": peak,
+            "rms_phase_deg": float(np.sqrt(np.mean(phase_row ** 2))),
+            "max_abs_phase_deg": float(np.max(np.abs(phase_row))),
+        })
+    summary.sort(key=lambda entry: (entry["rms_magnitude"], entry["rms_phase_deg"]), reverse=True)
+    return summary
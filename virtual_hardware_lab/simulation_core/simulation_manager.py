@@ -3,21 +3,70 @@
 import os
 import hashlib
 import json
-import jinja2
 import subprocess
-import matplotlib.pyplot as plt
 import datetime
-import yaml # Import yaml for metadata parsing
 import tempfile
+import shutil
+import time
 import asyncio
+import collections
+import concurrent.futures
 import logging
+import multiprocessing
 from typing import Any, Optional
 import numpy as np
 import re
 import cmath
+from collections import OrderedDict
+
+from virtual_hardware_lab.simulation_core.ac_solver import (
+    NATIVE_ENGINE_VERSION,
+    evaluate_ac_batch,
+    execute_native_ac,
+    prepare_ac_netlist,
+    stack_element_sets,
+)
+from virtual_hardware_lab.simulation_core.lazy_import import LazyModule
+from virtual_hardware_lab.simulation_core.batch_netlist import build_batch_netlist, point_control_lines, split_batch_log, substitute_symbols
+from virtual_hardware_lab.simulation_core.fitting import default_initial_guess, fit_impedance, parameter_bounds
+from virtual_hardware_lab.simulation_core.job_queue import FINAL_STATUSES
+from virtual_hardware_lab.simulation_core.monte_carlo import (
+    SAMPLING_METHODS,
+    OutlierTracker,
+    SpectrumAggregator,
+    corner_points,
+    resolve_distribution,
+    sample_distribution,
+)
+from virtual_hardware_lab.simulation_core.inventory_index import build_listing_index, inventory_version, query_listing
+from virtual_hardware_lab.simulation_core.ngspice_pool import NgspiceWorkerPool
+from virtual_hardware_lab.simulation_core.process_limits import RESOURCE_LIMITS, RunCancelledError, run_limited
+from virtual_hardware_lab.simulation_core.run_events import BatchProgress, NgspiceProgress, RunEventBus
+from virtual_hardware_lab.simulation_core.netlist import UnsupportedNetlistError, canonical_netlist_hash, flatten_netlist
+from virtual_hardware_lab.simulation_core.decimation import decimate
+from virtual_hardware_lab.simulation_core.extraction import DEFAULT_OUTPUT_FILES, build_extraction_plan
+from virtual_hardware_lab.simulation_core.eis_analysis import ANALYSES
+from virtual_hardware_lab.simulation_core.post_processing import POST_PROCESSORS, resolve_stages, run_pipeline
+from virtual_hardware_lab.simulation_core.comparison import band_edges, common_axis, interpolate_onto, residual_metrics
+from virtual_hardware_lab.simulation_core.run_data import data_fingerprint, load_run_data
+from virtual_hardware_lab.simulation_core.sensitivity import central_difference_points, normalized_sensitivities, rank_parameters
+from virtual_hardware_lab.simulation_core.validation import (
+    ParameterValidationError,
+    compile_parameter_validator,
+    validate_parameter_grid,
+    validate_parameters,
+)
 
 logger = logging.getLogger("virtual_hardware_lab")
 
+# Bump when the parsed form of templates changes, so stale inventory caches are ignored.
+INVENTORY_CACHE_VERSION = 1
+
+# Imported on first use so that starting the server does not pay for them.
+jinja2 = LazyModule("jinja2")
+plt = LazyModule("matplotlib.pyplot")
+yaml = LazyModule("yaml")
+
 class SimulationManager:
     """
     Manages the lifecycle of SPICE simulations within the Virtual Hardware Lab framework.
@@ -36,34 +85,139 @@ class SimulationManager:
     Managed Directories:
     - `models/`: Stores Jinja2 templates for SPICE models (.j2 files) with embedded YAML metadata.
     - `controls/`: Stores Jinja2 templates for SPICE control programs (.j2 files) with embedded YAML metadata.
-    - `runs/`: Stores output artifacts for each unique simulation run, organized by `sim_id`.
+    - `runs/`: Stores output artifacts for each unique simulation run, organized by `sim_id`
+      (content-derived ids are sharded as `runs/ab/cd/<sim_id>`).
+    - `runs/netlists/`: With a persistence policy other than "all", rendered netlist fragments
+      are stored here once, by SHA-256, instead of in every run directory.
     - `cache/`: Stores manifests of previous runs for caching and reproducibility.
 
     Key Features:
     - Metadata parsing: Extracts YAML metadata from model and control templates.
-    - Parameter validation: Ensures simulation parameters adhere to types and ranges defined in metadata.
+    - Parameter validation: Ensures simulation parameters adhere to types, ranges and constraint
+      expressions defined in metadata, compiled once per template and checked before rendering.
     - Forbidden directive checks: Prevents unsafe or non-compliant SPICE directives.
     - Deterministic merging: Combines model and control netlists into a single, normalized SPICE file.
     - Caching: Reuses results of identical simulations to ensure efficiency and reproducibility.
     - Artifact generation: Executes ngspice and generates logs, data files, and plots for each run.
+      Controls declare their outputs and post-processors in an `outputs` metadata block; only
+      those are extracted (controls without one are treated as EIS experiments).
     - Manifest creation: Produces a `manifest.json` for each run, detailing all aspects of the simulation.
+    - Warm ngspice workers: With `ngspice_workers > 0`, runs are sourced into long-lived
+      `ngspice -p` processes instead of starting ngspice per run (see `NgspiceWorkerPool`).
+    - Scratch execution: With `scratch_dir`, runs execute outside `runs/` and only the artifacts
+      selected by the persistence policy are moved there afterwards.
+    - Native AC engine: Optionally solves linear R/L/C/V/I netlists in-process with NumPy
+      (`engine="native"`), falling back to ngspice for anything unsupported.
     """
-    def __init__(self, models_dir="models", controls_dir="controls", runs_dir="runs"):
+    ENGINES = ("ngspice", "native")
+    SIM_ID_SCHEMES = ("timestamp", "content")
+    # Which files of a run are kept in `runs/`: everything, every artifact but the netlists, or only the data.
+    PERSISTENCE_POLICIES = ("all", "data", "minimal")
+    MINIMAL_ARTIFACTS = ("data", "eis_data", "raw_data")
+    BASE_RESPONSE_CACHE_SIZE = 64
+
+    def __init__(self, models_dir="models", controls_dir="controls", runs_dir="runs", engine="ngspice", id_scheme="timestamp", ngspice_workers=0, scratch_dir=None, persistence="all", load_templates=True, inventory_cache=True,
+                 run_timeout=60, max_run_timeout=600, resource_limits=None, job_queue=None, event_replay=1000, post_process_workers=0):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown simulation engine '{engine}'. Expected one of {self.ENGINES}.")
+        if id_scheme not in self.SIM_ID_SCHEMES:
+            raise ValueError(f"Unknown sim_id scheme '{id_scheme}'. Expected one of {self.SIM_ID_SCHEMES}.")
+        if persistence not in self.PERSISTENCE_POLICIES:
+            raise ValueError(f"Unknown persistence policy '{persistence}'. Expected one of {self.PERSISTENCE_POLICIES}.")
         self.models_dir = models_dir
         self.controls_dir = controls_dir
         self.runs_dir = runs_dir
-        # Jinja2 environment configured to load from both models and controls directories
-        self.env = jinja2.Environment(loader=jinja2.FileSystemLoader([models_dir, controls_dir]))
+        self.engine = engine
+        self.id_scheme = id_scheme
+        # Runs execute in a scratch directory (e.g. /dev/shm) when set; `persistence` decides what is moved to `runs/`.
+        self.scratch_dir = scratch_dir
+        self.persistence = persistence
+        self._ngspice_version = None
+        # Warm ngspice processes in pipe mode; 0 launches `ngspice -b` per run.
+        self.ngspice_workers = ngspice_workers
+        self._ngspice_pool = None
+        # Wall-clock budget of an ngspice run (overridable per control via `timeout` metadata and per run, up to
+        # `max_run_timeout`) and OS limits for the ngspice process, e.g. {"cpu_seconds": 120, "address_space_mb": 2048}.
+        self.run_timeout = run_timeout
+        self.max_run_timeout = max_run_timeout
+        unknown = set(resource_limits or {}) - set(RESOURCE_LIMITS)
+        if unknown:
+            raise ValueError(f"Unknown resource limits {sorted(unknown)}. Expected any of {tuple(RESOURCE_LIMITS)}.")
+        self.resource_limits = dict(resource_limits or {})
+        # With a `JobQueue`, runs are executed by `SimulationWorker`s and this manager only renders, queues and waits.
+        self.job_queue = job_queue
+        # Post-processing stages (plots, summaries, DRT, ...) run in a process pool of this size; 0 runs them in the calling thread.
+        self.post_process_workers = post_process_workers
+        self._post_process_pool = None
+        # Run lifecycle events (queued, started, progress, finished, failed, cancelled) for push notifications.
+        self.events = RunEventBus(event_replay)
+        # Last whole percentage reported per executing batch.
+        self._batch_progress = {}
+        # Jinja2 environment configured to load from both models and controls directories (created on first use)
+        self._env = None
         os.makedirs(self.runs_dir, exist_ok=True)
+        if self.scratch_dir:
+            os.makedirs(self.scratch_dir, exist_ok=True)
 
         self._model_inventory = {}
         self._control_inventory = {}
-        self._load_all_templates()
+        # Hash of every template's name and content; listing indexes are rebuilt only when it changes.
+        self.inventory_version = None
+        self._listing_index = {}
+        # Base-point AC responses keyed by canonical merged netlist hash, reused across sensitivity requests.
+        self._base_response_cache = OrderedDict()
+        # (future, persistence) of running simulations keyed by merged netlist (+ engine/sampling) hash.
+        self._in_flight = {}
+        # Tasks of executing runs by sim_id, for `cancel_run`.
+        self._active_runs = {}
+        self._cancelled_runs = set()
+        # Parsed templates are cached on disk keyed by path, mtime and size (True: `<runs_dir>/.inventory_cache.json`).
+        if inventory_cache is True:
+            inventory_cache = os.path.join(self.runs_dir, ".inventory_cache.json")
+        self.inventory_cache_path = inventory_cache or None
+        # The server defers the template scan to its startup phase (see `load_templates`).
+        self.ready = False
+        self._loading = None
+        if load_templates:
+            self._load_all_templates()
+
+    @property
+    def env(self):
+        if self._env is None:
+            self._env = jinja2.Environment(loader=jinja2.FileSystemLoader([self.models_dir, self.controls_dir]))
+        return self._env
 
     def _load_all_templates(self):
-        """Loads all .j2 template contents into memory for quick access and validation."""
-        self._model_inventory = _load_templates_from_dir(self.models_dir, "model")
-        self._control_inventory = _load_templates_from_dir(self.controls_dir, "control")
+        """
+        Loads all .j2 template contents into memory for quick access and validation.
+        Only templates changed since the last load (per the inventory cache) are parsed.
+        """
+        cache = _read_inventory_cache(self.inventory_cache_path) if self.inventory_cache_path else None
+        self._model_inventory = _load_templates_from_dir(self.models_dir, "model", cache)
+        self._control_inventory = _load_templates_from_dir(self.controls_dir, "control", cache)
+        if cache is not None:
+            _write_inventory_cache(self.inventory_cache_path, cache)
+        version = inventory_version(self._model_inventory, self._control_inventory)
+        if version != self.inventory_version:
+            self.inventory_version, self._listing_index = version, {}
+        self.ready = True
+
+    async def load_templates(self):
+        """
+        Loads the template inventory in a worker thread, so the event loop (and
+        the server's port) stays responsive while templates are scanned and their
+        metadata parsed. Concurrent callers share one load; returns at once when
+        the inventory is already loaded.
+        """
+        if self.ready:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self._load_all_templates))
+        try:
+            await asyncio.shield(self._loading)
+        except Exception:
+            self._loading = None # Let the next caller retry
+            raise
 
     
 
@@ -107,7 +261,7 @@ class SimulationManager:
         final_spice_code_for_validation = full_validation_context + "\n" + rendered_spice_code
 
         # 3. Validate the rendered SPICE code using ngspice
-        validation_error = await _validate_spice_code(final_spice_code_for_validation)
+        validation_error = await _validate_spice_code(final_spice_code_for_validation, self.run_timeout, self.resource_limits)
         if validation_error:
             logger.error(f"SPICE validation failed for {filename}: {validation_error}")
             return {"error": validation_error}
@@ -161,22 +315,614 @@ class SimulationManager:
             return control_info["metadata"]
         return None
 
+    def list_templates(self, template_type, name=None, tags=None, parameters=None, fields=None, cursor=None, limit=None, if_none_match=None):
+        """
+        Lists one page of model or control templates, filtered by name, tags and
+        declared parameters and optionally projected to some metadata `fields`
+        (see `query_listing`). Pages are served from an index built once per
+        inventory version. The returned `etag` identifies this page of this
+        inventory version; passing it back as `if_none_match` returns only
+        {"not_modified": True, ...} while nothing has changed.
+        """
+        inventories = {"model": self._model_inventory, "control": self._control_inventory}
+        if template_type not in inventories:
+            raise ValueError(f"Unknown template type '{template_type}'. Expected 'model' or 'control'.")
+        query = [template_type, name, tags, parameters, fields, cursor, limit]
+        etag = hashlib.sha256(json.dumps([self.inventory_version] + query, default=str).encode()).hexdigest()[:16]
+        if if_none_match is not None and if_none_match == etag:
+            return {"not_modified": True, "etag": etag, "inventory_version": self.inventory_version}
+        index = self._listing_index.get(template_type)
+        if index is None:
+            index = self._listing_index[template_type] = build_listing_index(inventories[template_type])
+        page = query_listing(index, name=name, tags=tags, parameters=parameters, cursor=cursor, limit=limit, fields=fields)
+        page.update({"etag": etag, "inventory_version": self.inventory_version})
+        return page
+
+
+    def evaluate_ac_batch(self, model_name, control_name, param_sets, model_params=None, control_params=None, vector="z", chunk_size=None):
+        """
+        Evaluates an AC control vector (the impedance `Z` for EIS controls) for many
+        model parameter sets without launching a simulation per point.
+
+        `param_sets` is either a list of dicts (one per set, same keys) or a dict of
+        equal-length sequences. Swept parameters override `model_params`.
+
+        The model is rendered once with symbolic placeholders for the swept
+        parameters so the topology is parsed and stamped once and element values
+        are broadcast through batched linear solves (chunked to bound memory). If
+        the template manipulates a swept parameter in Jinja (filters, arithmetic,
+        conditionals), each set is rendered separately and stacked instead.
+
+        Returns a dict with `parameters` (swept names), `param_values`
+        ([n_params, n_swept]), `frequencies` ([n_freq]) and `impedance`
+        (complex [n_params, n_freq]). Raises `ParameterValidationError` if any set
+        violates the model's declared ranges or constraints (checked for the whole
+        grid at once) and `UnsupportedNetlistError` if the circuit is outside the
+        native engine's subset.
+        """
+        names, columns = _normalize_param_sets(param_sets)
+        self._check_parameters(model_name, control_name, model_params, control_params, columns)
+        evaluate = self._make_ac_batch_evaluator(model_name, control_name, names, model_params, control_params, vector, chunk_size=chunk_size)
+        result = evaluate(columns)
+        n_sets = len(result["values"])
+        return {
+            "parameters": names,
+            "param_values": np.column_stack([columns[name] for name in names]) if names else np.empty((n_sets, 0)),
+            "frequencies": result["frequencies"],
+            "impedance": result["values"],
+        }
+
+    def _make_ac_batch_evaluator(self, model_name, control_name, names, model_params=None, control_params=None, vector="z", frequencies=None, chunk_size=None):
+        """
+        Prepares a model/control pair once and returns `evaluate(columns)`, which maps
+        `{name: array}` parameter columns to `{"frequencies", "values"}` via the
+        native batched AC solver. `frequencies` overrides the control's AC grid.
+        """
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        base_params = dict(model_params or {})
+        control_params = dict(control_params or {})
+        control_params.setdefault("output_data_file", "eis_data.txt")
+        model_raw_content = self._model_inventory[model_name]["raw_string"]
+        control_content = _render_template(self.env, control_name, control_params)
+
+        def render_set(columns, index):
+            params = dict(base_params)
+            params.update({name: columns[name][index].item() for name in names})
+            model_content = _render_template(self.env, model_name, params, raw_content=model_raw_content)
+            return prepare_ac_netlist(_merge_netlist(model_content, control_content))
+
+        symbolic = {"prepared": None, "verified": False}
+        try:
+            symbolic_params = dict(base_params)
+            symbolic_params.update({name: _SweepPlaceholder(name) for name in names})
+            model_content = _render_template(self.env, model_name, symbolic_params, raw_content=model_raw_content)
+            symbolic["prepared"] = prepare_ac_netlist(
+                _merge_netlist(model_content, control_content),
+                {_sweep_symbol(name): 1.0 for name in names},
+            )
+        except (jinja2.TemplateError, TypeError, ValueError, UnsupportedNetlistError) as e:
+            logger.info(f"Falling back to per-set rendering for {model_name}: {e}")
+
+        def evaluate(columns):
+            columns = {name: np.atleast_1d(np.asarray(columns[name], dtype=float)) for name in names}
+            n_sets = len(columns[names[0]]) if names else 1
+            prepared = symbolic["prepared"]
+            if prepared is not None:
+                try:
+                    elements = flatten_netlist(prepared["parsed"], {_sweep_symbol(name): columns[name] for name in names})
+                    if not symbolic["verified"]:
+                        # The placeholder rendering is only trusted if it reproduces a concrete rendering exactly.
+                        if not _elements_match(elements, render_set(columns, 0)["elements"], 0):
+                            raise UnsupportedNetlistError("Symbolic rendering does not match concrete rendering.")
+                        symbolic["verified"] = True
+                except (ValueError, UnsupportedNetlistError) as e:
+                    logger.info(f"Falling back to per-set rendering for {model_name}: {e}")
+                    symbolic["prepared"] = prepared = None
+            if prepared is None:
+                prepared_sets = [render_set(columns, i) for i in range(n_sets)]
+                prepared = prepared_sets[0]
+                elements = stack_element_sets([p["elements"] for p in prepared_sets])
+            return evaluate_ac_batch(prepared, elements, n_sets, vector, chunk_size=chunk_size, frequencies=frequencies)
+
+        return evaluate
+
+    def fit_model(self, model_name, control_name, frequencies, z_real, z_imag, fit_parameters=None, initial=None, bounds=None, model_params=None, control_params=None, vector="z", weighting="modulus", max_evaluations=100):
+        """
+        Fits model parameters to measured impedance data with bounded least squares.
+
+        Bounds come from the `range` of each parameter in the model metadata
+        (`input_parameters`), unless overridden via `bounds`. Parameters not being
+        fitted keep their `model_params` value or metadata default. The model is
+        evaluated at the measured frequencies with the native batched AC solver,
+        so a whole finite-difference Jacobian costs one batched solve.
+        """
+        specs = _get_parameter_specs(self._model_inventory[model_name]["metadata"]) if model_name in self._model_inventory else {}
+        fit_parameters = list(fit_parameters or [name for name, spec in specs.items() if isinstance(spec, dict) and spec.get("range")])
+        if not fit_parameters:
+            raise ValueError(f"No parameters to fit: {model_name} declares no parameter ranges and none were given.")
+        initial = dict(initial or {})
+        bounds = dict(bounds or {})
+        lower, upper, start = [], [], []
+        for name in fit_parameters:
+            spec = specs.get(name) or {}
+            limits = parameter_bounds(spec, bounds.get(name))
+            if limits is None:
+                raise ValueError(f"Parameter '{name}' has no bounds: declare a metadata range or pass bounds.")
+            lower.append(limits[0])
+            upper.append(limits[1])
+            start.append(float(initial[name]) if name in initial else default_initial_guess(spec, *limits))
+
+        frequencies = np.asarray(frequencies, dtype=float)
+        z_measured = np.asarray(z_real, dtype=float) + 1j * np.asarray(z_imag, dtype=float)
+        if frequencies.shape != z_measured.shape or frequencies.ndim != 1:
+            raise ValueError("frequencies, z_real and z_imag must be 1-D sequences of equal length.")
+
+        fixed_params = {name: spec["default"] for name, spec in specs.items() if isinstance(spec, dict) and "default" in spec}
+        fixed_params.update(model_params or {})
+        evaluator = self._make_ac_batch_evaluator(
+            model_name, control_name, fit_parameters, fixed_params, control_params, vector, frequencies=frequencies
+        )
+
+        def evaluate(values):
+            columns = {name: values[:, i] for i, name in enumerate(fit_parameters)}
+            return evaluator(columns)["values"]
+
+        result = fit_impedance(evaluate, z_measured, fit_parameters, np.array(start), np.array(lower), np.array(upper), weighting=weighting, max_evaluations=max_evaluations)
+        result["bounds"] = {name: [lo, hi] for name, lo, hi in zip(fit_parameters, lower, upper)}
+        return result
+
+    def sensitivity(self, model_name, control_name, model_params=None, control_params=None, parameters=None, rel_step=1e-3, vector="z", sim_id=None):
+        """
+        Computes normalised sensitivities of the AC response to each model parameter.
+
+        For every parameter (default: every numeric parameter declared in the model
+        metadata) returns d ln|Z| / d ln p and d phase / d ln p (degrees) across the
+        control's frequency sweep, from multiplicative central differences. All
+        perturbed points are solved together in one batched native AC evaluation;
+        the base response is cached by merged netlist hash and reused.
+
+        The full matrices are written to `sensitivity.npz` in `runs/<sim_id>/`
+        alongside a manifest; the return value is the manifest, which ranks the
+        parameters by influence.
+        """
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        specs = _get_parameter_specs(self._model_inventory[model_name]["metadata"])
+        base_params = {name: spec["default"] for name, spec in specs.items() if isinstance(spec, dict) and "default" in spec}
+        base_params.update(model_params or {})
+        if parameters is None:
+            parameters = [name for name in specs if _as_number(base_params.get(name)) is not None]
+        parameters = list(parameters)
+        for name in parameters:
+            value = _as_number(base_params.get(name))
+            if value is None:
+                raise ValueError(f"Parameter '{name}' has no numeric value: declare a metadata default or pass it in model_params.")
+            base_params[name] = value
+        skipped = [name for name in parameters if base_params[name] == 0]
+        parameters = [name for name in parameters if base_params[name] != 0]
+        if not parameters:
+            raise ValueError(f"No parameters to analyse for {model_name}: none declared with a non-zero numeric value.")
+
+        control_params = dict(control_params or {})
+        control_params.setdefault("output_data_file", "eis_data.txt")
+        # The steps stay within rel_step of the base point: only the base is checked against the declared ranges.
+        self._check_parameters(model_name, control_name, base_params, control_params)
+        model_content = _render_template(self.env, model_name, base_params, raw_content=self._model_inventory[model_name]["raw_string"])
+        canonical_sha = canonical_netlist_hash(_merge_netlist(model_content, _render_template(self.env, control_name, control_params)))
+
+        base_values = np.array([float(base_params[name]) for name in parameters])
+        fixed_params = {name: value for name, value in base_params.items() if name not in parameters}
+        evaluate = self._make_ac_batch_evaluator(model_name, control_name, parameters, fixed_params, control_params, vector)
+        points = central_difference_points(base_values, rel_step)
+        cache_key = (canonical_sha, vector)
+        cached = self._base_response_cache.get(cache_key)
+        if cached is None:
+            points = np.vstack([base_values, points])
+        started = time.perf_counter()
+        result = evaluate({name: points[:, i] for i, name in enumerate(parameters)})
+        elapsed = time.perf_counter() - started
+        frequencies = result["frequencies"]
+        if cached is None:
+            z_base, z_perturbed = result["values"][0], result["values"][1:]
+            self._base_response_cache[cache_key] = (frequencies, z_base)
+            while len(self._base_response_cache) > self.BASE_RESPONSE_CACHE_SIZE:
+                self._base_response_cache.popitem(last=False)
+        else:
+            self._base_response_cache.move_to_end(cache_key)
+            z_base, z_perturbed = cached[1], result["values"]
+        matrices = normalized_sensitivities(z_perturbed, z_base, rel_step)
+
+        if sim_id is None:
+            sim_id = "sens_" + datetime.datetime.now().strftime("%Y%m%d%H%M%S") + "_" + _compute_sha256(canonical_sha + str(parameters) + str(rel_step))[:8]
+        run_dir = self.get_run_dir(sim_id)
+        os.makedirs(run_dir, exist_ok=True)
+        matrix_filepath = os.path.join(run_dir, "sensitivity.npz")
+        np.savez_compressed(
+            matrix_filepath,
+            parameters=np.array(parameters),
+            parameter_values=base_values,
+            frequencies=frequencies,
+            z_base=z_base,
+            magnitude=matrices["magnitude"].astype(np.float32),
+            phase_deg=matrices["phase_deg"].astype(np.float32),
+        )
+        ranking = rank_parameters(parameters, matrices["magnitude"], matrices["phase_deg"])
+        for entry in ranking:
+            entry["peak_frequency"] = float(frequencies[entry.pop("peak_index")])
+        manifest = {
+            "sim_id": sim_id,
+            "kind": "sensitivity",
+            "model": {"name": model_name, "params": base_params},
+            "control": {"name": control_name, "params": control_params},
+            "canonical_netlist_sha256": canonical_sha,
+            "engine": "native",
+            "tool_versions": {"native_ac": NATIVE_ENGINE_VERSION},
+            "vector": vector,
+            "rel_step": rel_step,
+            "parameters": parameters,
+            "skipped_parameters": skipped,
+            "frequency_range": [float(frequencies[0]), float(frequencies[-1])],
+            "n_frequencies": len(frequencies),
+            "base_response_cached": cached is not None,
+            "model_evaluations": len(points),
+            "elapsed_s": elapsed,
+            "ranking": ranking,
+            "artifacts": {"sensitivity": matrix_filepath},
+        }
+        with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def monte_carlo(self, model_name, control_name, samples=1000, parameters=None, distributions=None, method="normal", seed=None, model_params=None, control_params=None,
+                    vector="z", percentiles=(5, 50, 95), outlier_threshold=3.0, max_outliers=20, chunk_size=256, workers=None, sim_id=None):
+        """
+        Propagates parameter uncertainty to the AC response.
+
+        Varies `parameters` (default: every parameter with a metadata `range`,
+        plus any named in `distributions`) by drawing `samples` sets from
+        `method` ("normal", "uniform" or "lognormal", centred on the metadata
+        defaults, see `resolve_distribution`) or by evaluating every "corners"
+        combination of the range endpoints. `distributions` overrides the
+        distribution per parameter, e.g. {"r_val": {"distribution": "uniform",
+        "low": 40, "high": 60}}. Draws are reproducible: chunk k always uses
+        `SeedSequence(seed, spawn_key=(k,))`, whatever the thread scheduling;
+        without a seed one is generated and recorded.
+
+        Chunks of `chunk_size` sets are solved with the native batched AC solver
+        on `workers` threads and folded into streaming statistics (mean and
+        spread of Re/Im Z, ln|Z| and phase, sketched percentiles of |Z| and
+        phase), so memory does not grow with `samples`. Only the aggregate
+        (`monte_carlo.npz`) and up to `max_outliers` spectra scoring at least
+        `outlier_threshold` (`outliers.npz`) are written to `runs/<sim_id>/`,
+        with a manifest that is also returned.
+        """
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        if method not in SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method '{method}'. Expected one of {SAMPLING_METHODS}.")
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("percentiles must be between 0 and 100.")
+        specs = _get_parameter_specs(self._model_inventory[model_name]["metadata"])
+        distributions = dict(distributions or {})
+        if parameters is None:
+            parameters = [name for name, spec in specs.items() if isinstance(spec, dict) and spec.get("range")]
+        parameters = list(dict.fromkeys(list(parameters) + list(distributions)))
+        if not parameters:
+            raise ValueError(f"No parameters to vary: {model_name} declares no parameter ranges and none were given.")
+
+        if method == "corners":
+            ranges = []
+            for name in parameters:
+                override = distributions.get(name) or {}
+                limits = parameter_bounds(specs.get(name) or {}, [override["low"], override["high"]] if "low" in override and "high" in override else None)
+                if limits is None:
+                    raise ValueError(f"Parameter '{name}' has no range: declare one in the metadata or pass low and high.")
+                ranges.append(limits)
+            corners = corner_points(ranges)
+            samples = len(corners)
+            resolved = {name: {"distribution": "corners", "low": low, "high": high} for name, (low, high) in zip(parameters, ranges)}
+        else:
+            resolved = {name: resolve_distribution(name, specs.get(name) or {}, distributions.get(name), method) for name in parameters}
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+
+        fixed_params = {name: spec["default"] for name, spec in specs.items() if isinstance(spec, dict) and "default" in spec and name not in parameters}
+        fixed_params.update({name: value for name, value in (model_params or {}).items() if name not in parameters})
+        control_params = dict(control_params or {})
+        evaluate = self._make_ac_batch_evaluator(model_name, control_name, parameters, fixed_params, control_params, vector, chunk_size=chunk_size)
+        n_chunks = -(-samples // chunk_size)
+
+        def run_chunk(k):
+            start, stop = k * chunk_size, min((k + 1) * chunk_size, samples)
+            if method == "corners":
+                values = corners[start:stop]
+            else:
+                rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(k,)))
+                values = np.column_stack([sample_distribution(resolved[name], stop - start, rng) for name in parameters])
+            columns = {name: values[:, i] for i, name in enumerate(parameters)}
+            self._check_parameters(model_name, control_name, fixed_params, control_params, columns)
+            return np.arange(start, stop), values, evaluate(columns)
+
+        started = time.perf_counter()
+        # The first chunk runs alone: it verifies the symbolic rendering the other chunks then share.
+        indices, values, result = run_chunk(0)
+        aggregator = SpectrumAggregator(result["frequencies"])
+        outliers = OutlierTracker(max_outliers, outlier_threshold)
+
+        def fold(indices, values, result):
+            aggregator.add(result["values"])
+            outliers.offer(aggregator.scores(result["values"]), indices, values, result["values"])
+
+        fold(indices, values, result)
+        workers = max(1, min(workers or min(4, os.cpu_count() or 1), n_chunks))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            # At most two chunks per worker are in flight, and they are folded in order, so results do not depend on timing.
+            pending = collections.deque()
+            next_chunk = 1
+            while pending or next_chunk < n_chunks:
+                while next_chunk < n_chunks and len(pending) < 2 * workers:
+                    pending.append(executor.submit(run_chunk, next_chunk))
+                    next_chunk += 1
+                try:
+                    fold(*pending.popleft().result())
+                except BaseException:
+                    for future in pending:
+                        future.cancel()
+                    raise
+        elapsed = time.perf_counter() - started
+
+        aggregate = aggregator.result(percentiles)
+        selected = outliers.select(aggregator)
+        if sim_id is None:
+            sim_id = "mc_" + datetime.datetime.now().strftime("%Y%m%d%H%M%S") + "_" + _compute_sha256(
+                json.dumps([model_name, control_name, self._model_inventory[model_name]["sha256"], resolved, fixed_params, control_params, samples, seed], sort_keys=True, default=str)
+            )[:8]
+        run_dir = self.get_run_dir(sim_id)
+        os.makedirs(run_dir, exist_ok=True)
+        artifacts = {"monte_carlo": os.path.join(run_dir, "monte_carlo.npz")}
+        np.savez_compressed(artifacts["monte_carlo"], parameters=np.array(parameters), **aggregate)
+        if selected:
+            artifacts["outliers"] = os.path.join(run_dir, "outliers.npz")
+            np.savez_compressed(
+                artifacts["outliers"],
+                parameters=np.array(parameters),
+                indices=np.array([entry["index"] for entry in selected]),
+                scores=np.array([entry["score"] for entry in selected]),
+                values=np.array([entry["values"] for entry in selected]),
+                impedance=np.array([entry["impedance"] for entry in selected]),
+            )
+        frequencies = aggregate["frequencies"]
+        widest_magnitude = int(np.argmax(aggregate["log_magnitude_std"]))
+        widest_phase = int(np.argmax(aggregate["phase_std_deg"]))
+        manifest = {
+            "sim_id": sim_id,
+            "kind": "monte_carlo",
+            "model": {"name": model_name, "sha256": self._model_inventory[model_name]["sha256"], "params": fixed_params},
+            "control": {"name": control_name, "params": control_params},
+            "engine": "native",
+            "tool_versions": {"native_ac": NATIVE_ENGINE_VERSION},
+            "vector": vector,
+            "method": method,
+            "seed": seed,
+            "samples": samples,
+            "distributions": resolved,
+            "chunk_size": chunk_size,
+            "workers": workers,
+            "elapsed_s": elapsed,
+            "frequency_range": [float(frequencies[0]), float(frequencies[-1])],
+            "n_frequencies": len(frequencies),
+            "percentiles": [float(p) for p in percentiles],
+            "spread": {
+                "max_log_magnitude_std": float(aggregate["log_magnitude_std"][widest_magnitude]),
+                "max_log_magnitude_std_frequency": float(frequencies[widest_magnitude]),
+                "max_phase_std_deg": float(aggregate["phase_std_deg"][widest_phase]),
+                "max_phase_std_frequency": float(frequencies[widest_phase]),
+            },
+            "outlier_threshold": outlier_threshold,
+            "outliers": [
+                {"index": entry["index"], "score": entry["score"], "params": dict(zip(parameters, entry["values"].tolist()))}
+                for entry in selected
+            ],
+            "artifacts": artifacts,
+        }
+        with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def compare_runs(self, sim_ids, vectors=None, points=None, bands=None):
+        """
+        Compares the data vectors of several runs against the first one.
+
+        Each run's `wrdata` output is loaded, interpolated onto a common axis
+        (the overlap of all runs, log-spaced for frequency sweeps) and reduced to
+        RMS, maximum and per-band deviation, so only a small summary leaves the
+        server. `vectors` defaults to every vector all runs share; `bands` is
+        either a number of bands or explicit band edges (default: decades for
+        frequency sweeps, four equal slices otherwise).
+        """
+        sim_ids = list(sim_ids)
+        if len(sim_ids) < 2:
+            raise ValueError("compare_runs needs at least two sim_ids.")
+        runs = []
+        for sim_id in sim_ids:
+            runs.append(self._load_run_data(sim_id))
+        axis_kinds = {run["axis"] for run in runs}
+        if len(axis_kinds) > 1:
+            raise ValueError(f"Runs use different analyses ({sorted(axis_kinds)}) and cannot be compared.")
+        shared = [name for name in runs[0]["vectors"] if all(name in run["vectors"] for run in runs[1:])]
+        if vectors is None:
+            vectors = shared
+        vectors = [name.lower() for name in vectors]
+        missing = [name for name in vectors if name not in shared]
+        if missing:
+            raise ValueError(f"Vectors {missing} are not present in every run. Shared vectors: {shared}")
+        if not vectors:
+            raise ValueError("The runs share no data vectors.")
+
+        axis_kind = axis_kinds.pop()
+        log = axis_kind == "frequency" and all(np.min(run["scale"]) > 0 for run in runs)
+        axis = common_axis([run["scale"] for run in runs], log=log, points=points)
+        if isinstance(bands, (list, tuple)):
+            edges = np.asarray(sorted(bands), dtype=float)
+            if len(edges) < 2:
+                raise ValueError("Explicit bands need at least two edges.")
+        else:
+            edges = band_edges(axis, log=log, n_bands=bands)
+
+        reference = {name: interpolate_onto(runs[0]["scale"], runs[0]["vectors"][name], axis, log) for name in vectors}
+        comparisons = []
+        for sim_id, run in zip(sim_ids[1:], runs[1:]):
+            metrics = {}
+            for name in vectors:
+                values = interpolate_onto(run["scale"], run["vectors"][name], axis, log)
+                metrics[name] = residual_metrics(axis, reference[name], values, edges)
+            comparisons.append({"sim_id": sim_id, "vectors": metrics})
+        return {
+            "reference": sim_ids[0],
+            "axis": axis_kind,
+            "range": [float(axis[0]), float(axis[-1])],
+            "points": len(axis),
+            "vectors": vectors,
+            "comparisons": comparisons,
+        }
+
+    def get_data(self, sim_id, vectors=None, max_points=500, method="lttb", start=None, stop=None):
+        """
+        Returns named data vectors of a run, decimated on the server to at most
+        `max_points` samples.
+
+        `start`/`stop` restrict the axis (time or frequency) before decimation.
+        `method` is "lttb" (Largest-Triangle-Three-Buckets, shape preserving) or
+        "minmax" (per-bucket envelope, keeps spikes). One index set, chosen on the
+        first requested vector, is applied to every vector so samples stay
+        aligned. Complex vectors are returned as {"real": [...], "imag": [...]}.
+        """
+        run = self._load_run_data(sim_id)
+        available = list(run["vectors"])
+        vectors = [name.lower() for name in (vectors or available)]
+        missing = [name for name in vectors if name not in run["vectors"]]
+        if missing:
+            raise ValueError(f"Unknown vectors {missing} for run '{sim_id}'. Available: {available}")
+
+        scale = run["scale"]
+        window = np.ones(len(scale), dtype=bool)
+        if start is not None:
+            window &= scale >= start
+        if stop is not None:
+            window &= scale <= stop
+        selected = np.flatnonzero(window)
+        if len(selected) == 0:
+            raise ValueError(f"No samples of run '{sim_id}' lie within [{start}, {stop}].")
+        window_scale = scale[selected]
+        log_x = run["axis"] == "frequency" and bool(np.all(window_scale > 0))
+        keep = selected[decimate(window_scale, run["vectors"][vectors[0]][selected], max_points, method, log_x=log_x)]
+
+        data = {}
+        for name in vectors:
+            values = run["vectors"][name][keep]
+            data[name] = {"real": values.real.tolist(), "imag": values.imag.tolist()} if np.iscomplexobj(values) else values.tolist()
+        return {
+            "sim_id": sim_id,
+            "axis": run["axis"],
+            "method": method,
+            "total_points": len(scale),
+            "window_points": len(selected),
+            "returned_points": len(keep),
+            "scale": scale[keep].tolist(),
+            "vectors": data,
+        }
+
+    def validate_experiment_parameters(self, model_name, control_name=None, model_params=None, control_params=None, param_sets=None):
+        """
+        Checks parameters against the compiled metadata of a model (and control)
+        without rendering or simulating. `param_sets` (list of dicts or dict of
+        sequences) validates a whole model sweep grid in one vectorised pass.
+        Returns {"valid": bool, "errors": [...]}; each error names its `template`.
+        """
+        columns = _normalize_param_sets(param_sets)[1] if param_sets is not None else None
+        errors = self._parameter_errors(model_name, control_name, model_params, control_params, columns)
+        return {"valid": not errors, "errors": errors}
+
+    def _check_parameters(self, model_name, control_name, model_params, control_params, columns=None):
+        errors = self._parameter_errors(model_name, control_name, model_params, control_params, columns)
+        if errors:
+            raise ParameterValidationError(errors)
+
+    def _parameter_errors(self, model_name, control_name, model_params, control_params, columns=None):
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        if control_name is not None and control_name not in self._control_inventory:
+            raise KeyError(f"Unknown control template: {control_name}")
+        model_validator = self._model_inventory[model_name]["validator"]
+        if columns is None:
+            errors = [dict(error, template=model_name) for error in validate_parameters(model_validator, model_params)]
+        else:
+            errors = [dict(error, template=model_name) for error in validate_parameter_grid(model_validator, columns, model_params)]
+        if control_name is not None:
+            control_validator = self._control_inventory[control_name]["validator"]
+            errors += [dict(error, template=control_name) for error in validate_parameters(control_validator, control_params)]
+        return errors
+
+    def get_run_dir(self, sim_id):
+        """Returns the directory of a run; content-derived sim_ids live in a sharded layout."""
+        return _run_dir(self.runs_dir, sim_id)
 
     def read_results(self, sim_id):
         """Retrieves the manifest for a given simulation ID."""
-        manifest_path = os.path.join(self.runs_dir, sim_id, "manifest.json")
+        try:
+            manifest_path = os.path.join(self.get_run_dir(sim_id), "manifest.json")
+        except ValueError:
+            return None
         if os.path.exists(manifest_path):
             with open(manifest_path, 'r') as f:
                 return json.load(f)
         else:
             return None
 
-    async def start_sim(self, model_name, model_params, control_name, control_params, sim_id=None):
-        if sim_id is None:
+    async def start_sim(self, model_name, model_params, control_name, control_params, sim_id=None, engine=None, sampling=None, id_scheme=None, persistence=None, timeout=None):
+        """
+        Renders, runs and records one experiment and returns its sim_id.
+
+        With `id_scheme="content"` (or a manager default of "content") the sim_id is
+        the hash of the merged netlist, engine version and sampling options, stored
+        under `runs/ab/cd/<sim_id>`; repeating an experiment returns the existing
+        run without simulating again.
+
+        Concurrent calls that render to the same merged netlist (with the same
+        engine and sampling) are coalesced onto one in-flight run: later callers
+        await it and receive its sim_id or, if they asked for a sim_id of their
+        own, an alias run whose manifest points at the shared artifacts.
+
+        A run is only reused or shared if it keeps at least the files the
+        caller's `persistence` asks for ("all" > "data" > "minimal"). Otherwise
+        the caller waits for the in-flight run and simulates again; a content
+        run is then re-recorded with the richer policy.
+
+        `persistence` ("all", "data" or "minimal"; default: the manager's policy)
+        selects which files of the run are kept; see `_persist_run`.
+
+        `timeout` (seconds) bounds the ngspice run; see `_run_timeout`. A run
+        cancelled through `cancel_run` raises `RunCancelledError`.
+        """
+        engine = engine or self.engine
+        persistence = persistence or self.persistence
+        if persistence not in self.PERSISTENCE_POLICIES:
+            raise ValueError(f"Unknown persistence policy '{persistence}'. Expected one of {self.PERSISTENCE_POLICIES}.")
+        adaptive = bool(sampling) and sampling.get("mode", "fixed") == "adaptive"
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown simulation engine '{engine}'. Expected one of {self.ENGINES}.")
+        id_scheme = id_scheme or self.id_scheme
+        if id_scheme not in self.SIM_ID_SCHEMES:
+            raise ValueError(f"Unknown sim_id scheme '{id_scheme}'. Expected one of {self.SIM_ID_SCHEMES}.")
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        # Reject bad parameters before anything is rendered or launched.
+        self._check_parameters(model_name, control_name, model_params, control_params)
+        timeout = self._run_timeout(control_name, timeout)
+        requested_sim_id = sim_id
+        if sim_id is None and id_scheme == "timestamp":
             sim_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S") + "_" + _compute_sha256(str(model_params) + str(control_params))[:8]
-        
-        run_dir = os.path.join(self.runs_dir, sim_id)
-        os.makedirs(run_dir, exist_ok=True)
 
         # 1. Render Model and Control Templates
         model_raw_content = self._model_inventory[model_name]["raw_string"]
@@ -188,83 +934,592 @@ class SimulationManager:
         control_sha = _compute_sha256(control_content)
 
         # 3. Merge Netlist
-        merged_content = f"{model_content}\n\n* --- control ---\n{control_content}"
+        merged_content = _merge_netlist(model_content, control_content)
         merged_sha = _compute_sha256(merged_content)
+        # Formatting, comments and card order do not change the experiment: reuse is keyed on the canonical form.
+        canonical_sha = canonical_netlist_hash(merged_content)
 
-        model_filepath = os.path.join(run_dir, "model.cir")
-        control_filepath = os.path.join(run_dir, "control.cir")
-        merged_filepath = os.path.join(run_dir, "merged.cir")
-        ngspice_log_filepath = os.path.join(run_dir, "ngspice.log")
-        eis_data_filepath = os.path.join(run_dir, "eis_data.txt")
-        nyquist_plot_filepath = os.path.join(run_dir, "nyquist_plot.png")
+        # Single flight: identical experiments already running are awaited instead of launched again.
+        flight_key = _compute_sha256(json.dumps([canonical_sha, engine, sampling if adaptive else None], sort_keys=True, default=str))
+        if sim_id is None:
+            # Content-derived id: the same experiment on the same engine version always maps to the same run.
+            sim_id = _compute_sha256(json.dumps(
+                [canonical_sha, engine, await self._engine_version(engine), sampling if adaptive else None], sort_keys=True, default=str
+            ))
+            existing = self.read_results(sim_id)
+            if existing is not None and _persistence_covers(existing.get("persistence", "all"), persistence):
+                print(f"Reusing existing run {sim_id}.")
+                self.events.publish(sim_id, "finished", reused=True)
+                return sim_id
+        in_flight = await self._await_in_flight(flight_key, persistence, sim_id)
+        if in_flight is not None:
+            print(f"Simulation {sim_id} is identical to an in-flight run; waiting for it.")
+            shared_sim_id = await asyncio.shield(in_flight)
+            if requested_sim_id is None or requested_sim_id == shared_sim_id:
+                return shared_sim_id
+            await asyncio.to_thread(self._write_alias_run, requested_sim_id, shared_sim_id)
+            self.events.publish(requested_sim_id, "finished", alias_of=shared_sim_id)
+            return requested_sim_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = (future, persistence)
+        # The run is its own task so `cancel_run` can stop it (and kill ngspice) from another request.
+        if self.job_queue is not None:
+            run = asyncio.ensure_future(self._run_remote(sim_id, model_name, model_params, control_name, control_params, engine, sampling, persistence, timeout))
+        else:
+            run = asyncio.ensure_future(self._run_sim(
+                sim_id, model_name, model_params, control_name, control_params, engine, adaptive, sampling,
+                model_content, control_content, model_sha, control_sha, merged_content, merged_sha, canonical_sha, persistence, timeout,
+            ))
+        self._active_runs[sim_id] = run
+        self.events.publish(sim_id, "queued", model=model_name, control=control_name)
+        try:
+            try:
+                await run
+            except asyncio.CancelledError:
+                if sim_id not in self._cancelled_runs:
+                    raise
+                raise RunCancelledError(sim_id) from None
+        except asyncio.CancelledError:
+            self.events.publish(sim_id, "cancelled")
+            future.cancel()
+            raise
+        except Exception as e:
+            if isinstance(e, RunCancelledError):
+                self.events.publish(sim_id, "cancelled")
+            else:
+                self.events.publish(sim_id, "failed", error=f"{type(e).__name__}: {e}")
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved: there may be no waiters.
+            raise
+        else:
+            self.events.publish(sim_id, "finished")
+            future.set_result(sim_id)
+        finally:
+            self._in_flight.pop(flight_key, None)
+            self._active_runs.pop(sim_id, None)
+            self._cancelled_runs.discard(sim_id)
+        return sim_id
 
-        with open(model_filepath, "w") as f:
-            f.write(model_content)
-        with open(control_filepath, "w") as f:
-            f.write(control_content)
-        with open(merged_filepath, "w") as f:
-            f.write(merged_content)
+    async def _await_in_flight(self, flight_key, persistence, sim_id):
+        """
+        The future of an in-flight run of `flight_key` that keeps the files `persistence` asks for, or None once no
+        such run is in flight. Runs keeping fewer files are waited for first: the caller then runs its own.
+        """
+        while flight_key in self._in_flight:
+            in_flight, flight_persistence = self._in_flight[flight_key]
+            if _persistence_covers(flight_persistence, persistence):
+                return in_flight
+            print(f"Simulation {sim_id} is identical to an in-flight run with persistence '{flight_persistence}'; running it again afterwards.")
+            await asyncio.gather(asyncio.shield(in_flight), return_exceptions=True)
+        return None
 
-        print(f"Starting simulation {sim_id} in {run_dir}")
+    async def start_batch(self, model_name, control_name, param_sets, model_params=None, control_params=None, batch_id=None,
+                          id_scheme=None, persistence=None, timeout=None, chunk_size=None):
+        """
+        Runs one ngspice experiment per model parameter set with as few ngspice
+        processes as possible. `param_sets` is a list of dicts (same keys) or a
+        dict of equal-length sequences, as for `evaluate_ac_batch`; swept
+        parameters override `model_params`.
+
+        The model is rendered once with the swept parameters as `.param`
+        symbols, and a single `.control` block walks the points with
+        `alterparam`/`reset`, repeating the control's commands with each
+        point's output files (see `batch_netlist.build_batch_netlist`). The
+        ngspice output is then split per point: every point is a normal run
+        (`<batch_id>_0000`, ..., or content-derived ids) with the netlist, data,
+        log, post-processing and manifest `start_sim` would give it, plus a
+        `batch` entry. `runs/<batch_id>/` keeps the batch netlists and logs and
+        a manifest of kind "batch" listing the points.
+
+        Up to `chunk_size` points (default: all) share an invocation;
+        invocations run in parallel, as many as there are ngspice workers (or
+        CPUs). An invocation's timeout is the per-run timeout (see
+        `_run_timeout`) times its points. `cancel_run(batch_id)` stops them.
+
+        If the model template manipulates a swept parameter in Jinja (so the
+        symbolic rendering does not reproduce every concrete one), or runs are
+        executed by distributed workers, the points are run one by one through
+        `start_sim` instead (`mode` "per_run").
+
+        Returns {"batch_id", "mode", "sim_ids", "reused", "invocations"}.
+        Raises `ParameterValidationError` if any set violates the model's
+        declared ranges or constraints.
+        """
+        persistence = persistence or self.persistence
+        if persistence not in self.PERSISTENCE_POLICIES:
+            raise ValueError(f"Unknown persistence policy '{persistence}'. Expected one of {self.PERSISTENCE_POLICIES}.")
+        id_scheme = id_scheme or self.id_scheme
+        if id_scheme not in self.SIM_ID_SCHEMES:
+            raise ValueError(f"Unknown sim_id scheme '{id_scheme}'. Expected one of {self.SIM_ID_SCHEMES}.")
+        if model_name not in self._model_inventory:
+            raise KeyError(f"Unknown model template: {model_name}")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}.")
+        model_params = dict(model_params or {})
+        control_params = dict(control_params or {})
+        names, columns = _normalize_param_sets(param_sets)
+        if not names:
+            raise ValueError("param_sets does not name any parameter.")
+        self._check_parameters(model_name, control_name, model_params, control_params, columns)
+        timeout = self._run_timeout(control_name, timeout)
+        points = [dict(model_params, **{name: columns[name][i].item() for name in names}) for i in range(len(columns[names[0]]))]
+        if batch_id is None:
+            batch_id = "batch_" + datetime.datetime.now().strftime("%Y%m%d%H%M%S") + "_" + _compute_sha256(json.dumps(
+                [model_name, control_name, model_params, control_params, {name: columns[name].tolist() for name in names}], sort_keys=True, default=str
+            ))[:8]
+
+        # Like a run, the batch is its own task so `cancel_run` can stop it.
+        batch = asyncio.ensure_future(self._run_batch(
+            batch_id, model_name, control_name, names, points, model_params, control_params, id_scheme, persistence, timeout, chunk_size,
+        ))
+        self._active_runs[batch_id] = batch
+        self.events.publish(batch_id, "queued", model=model_name, control=control_name, points=len(points))
+        try:
+            try:
+                result = await batch
+            except asyncio.CancelledError:
+                if batch_id not in self._cancelled_runs:
+                    raise
+                raise RunCancelledError(batch_id) from None
+        except (asyncio.CancelledError, RunCancelledError):
+            self.events.publish(batch_id, "cancelled")
+            raise
+        except Exception as e:
+            self.events.publish(batch_id, "failed", error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._active_runs.pop(batch_id, None)
+            self._cancelled_runs.discard(batch_id)
+            self._batch_progress.pop(batch_id, None)
+        self.events.publish(batch_id, "finished", points=len(points))
+        return result
+
+    async def _run_batch(self, batch_id, model_name, control_name, names, points, model_params, control_params, id_scheme, persistence, timeout, chunk_size):
+        """Renders and verifies the batch, runs its invocations and writes the batch manifest."""
+        started = time.perf_counter()
+        model_raw_content = self._model_inventory[model_name]["raw_string"]
+        control_content = _render_template(self.env, control_name, control_params)
+        control_sha = _compute_sha256(control_content)
+        symbols = {name: _sweep_symbol(name) for name in names}
+        symbolic = None
+        if self.job_queue is None:
+            try:
+                placeholders = {name: _SweepPlaceholder(name) for name in names}
+                symbolic = _render_template(self.env, model_name, dict(points[0], **placeholders), raw_content=model_raw_content)
+                point_control_lines(_merge_netlist(symbolic, control_content))
+            except (jinja2.TemplateError, TypeError, ValueError) as e:
+                logger.info(f"Cannot batch {model_name} with {control_name} in one ngspice run ({e}); running the points one by one.")
+                symbolic = None
+
+        prepared = []
+        for index, params in enumerate(points):
+            model_content = _render_template(self.env, model_name, params, raw_content=model_raw_content)
+            values = {symbols[name]: params[name] for name in names}
+            if symbolic is not None and substitute_symbols(symbolic, values) != model_content:
+                # The template does more with a swept parameter than print it: its netlist differs per point.
+                logger.info(f"Model {model_name} does not render the swept parameters symbolically; running the points one by one.")
+                symbolic = None
+            merged_content = _merge_netlist(model_content, control_content)
+            prepared.append({
+                "index": index,
+                "params": params,
+                "values": values,
+                "model_content": model_content,
+                "model_sha": _compute_sha256(model_content),
+                "merged_sha": _compute_sha256(merged_content),
+                "canonical_sha": canonical_netlist_hash(merged_content),
+            })
+
+        reused, invocations, flights = [], [], {}
+        if symbolic is None:
+            mode = "per_run"
+            for point in prepared:
+                # Sequential: each point is a full ngspice run of its own.
+                point["sim_id"] = await self.start_sim(
+                    model_name, point["params"], control_name, dict(control_params),
+                    sim_id=f"{batch_id}_{point['index']:04d}" if id_scheme == "timestamp" else None,
+                    engine="ngspice", id_scheme=id_scheme, persistence=persistence, timeout=timeout,
+                )
+        else:
+            mode = "alterparam"
+            try:
+                pending, duplicates = await self._claim_batch_points(batch_id, prepared, id_scheme, persistence, reused, flights)
+                size = chunk_size or max(len(pending), 1)
+                chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+                limit = asyncio.Semaphore(max(1, self.ngspice_workers or os.cpu_count() or 1))
+                # One tracker for all invocations, so the batch's progress events only go up.
+                progress = BatchProgress(_merge_netlist(symbolic, control_content), len(pending))
+                for point in pending:
+                    self.events.publish(point["sim_id"], "queued", model=model_name, control=control_name, batch_id=batch_id)
+                self.events.publish(batch_id, "started", engine="ngspice", invocations=len(chunks))
+                invocations = await asyncio.gather(*(
+                    self._run_batch_invocation(batch_id, number, chunk, symbolic, model_name, control_name, control_params, control_content, control_sha,
+                                               persistence, timeout, limit, progress)
+                    for number, chunk in enumerate(chunks)
+                ))
+                for point, first in duplicates:
+                    if point["sim_id"] != first["sim_id"]:
+                        await asyncio.to_thread(self._write_alias_run, point["sim_id"], first["sim_id"])
+                        self.events.publish(point["sim_id"], "finished", batch_id=batch_id, alias_of=first["sim_id"])
+            except BaseException as e:
+                # Callers coalesced onto points that never finished fail (or are cancelled) with the batch.
+                for future in flights.values():
+                    if not future.done():
+                        if isinstance(e, asyncio.CancelledError):
+                            future.cancel()
+                        else:
+                            future.set_exception(e)
+                            future.exception()  # Mark as retrieved: there may be no waiters.
+                raise
+            finally:
+                for flight_key, future in flights.items():
+                    if self._in_flight.get(flight_key, (None,))[0] is future:
+                        self._in_flight.pop(flight_key)
+
+        batch_dir = self.get_run_dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        artifacts = {}
+        for number, invocation in enumerate(invocations):
+            artifacts[f"batch_netlist_{number}"] = invocation["netlist"]
+            artifacts[f"ngspice_log_{number}"] = invocation["log"]
+        manifest = {
+            "sim_id": batch_id,
+            "kind": "batch",
+            "mode": mode,
+            "model": {"name": model_name, "sha256": self._model_inventory[model_name]["sha256"], "params": model_params},
+            "control": {"name": control_name, "params": control_params, "sha256": control_sha},
+            "engine": "ngspice",
+            "persistence": persistence,
+            "parameters": names,
+            "points": [{"sim_id": point["sim_id"], "params": {name: point["params"][name] for name in names}} for point in prepared],
+            "reused": reused,
+            "invocations": invocations,
+            "elapsed_s": time.perf_counter() - started,
+            "artifacts": artifacts,
+        }
+        with open(os.path.join(batch_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Batch {batch_id} of {len(prepared)} points completed ({mode}).")
+        return {
+            "batch_id": batch_id,
+            "mode": mode,
+            "sim_ids": [point["sim_id"] for point in prepared],
+            "reused": reused,
+            "invocations": len(invocations),
+        }
+
+    async def _claim_batch_points(self, batch_id, prepared, id_scheme, persistence, reused, flights):
+        """
+        Assigns the points' sim_ids and applies `start_sim`'s reuse and single flight to each: content runs that
+        already keep the requested files are reused, points identical to an in-flight run share it, and the rest
+        are registered as in flight in `flights` ({flight_key: future}). Returns the points to simulate and the
+        (point, first point) pairs of points repeating an earlier one of the batch.
+        """
+        pending, duplicates, claimed = [], [], {}
+        for point in prepared:
+            if id_scheme == "timestamp":
+                point["sim_id"] = f"{batch_id}_{point['index']:04d}"
+            else:
+                point["sim_id"] = _compute_sha256(json.dumps(
+                    [point["canonical_sha"], "ngspice", await self._engine_version("ngspice"), None], sort_keys=True, default=str
+                ))
+            flight_key = _compute_sha256(json.dumps([point["canonical_sha"], "ngspice", None], sort_keys=True, default=str))
+            if flight_key in claimed:
+                # Simulated once, by the first point: awaiting the batch's own future here would never return.
+                duplicates.append((point, claimed[flight_key]))
+                continue
+            if id_scheme == "content":
+                existing = self.read_results(point["sim_id"])
+                if existing is not None and _persistence_covers(existing.get("persistence", "all"), persistence):
+                    reused.append(point["sim_id"])
+                    continue
+            in_flight = await self._await_in_flight(flight_key, persistence, point["sim_id"])
+            while in_flight is not None:
+                try:
+                    shared_sim_id = await asyncio.shield(in_flight)
+                except Exception as e:
+                    logger.info(f"The run batch point {point['sim_id']} waited for failed ({e}); simulating it in the batch.")
+                    in_flight = await self._await_in_flight(flight_key, persistence, point["sim_id"])
+                    continue
+                if shared_sim_id != point["sim_id"]:
+                    await asyncio.to_thread(self._write_alias_run, point["sim_id"], shared_sim_id)
+                reused.append(point["sim_id"])
+                break
+            else:
+                point["future"] = flights[flight_key] = asyncio.get_running_loop().create_future()
+                self._in_flight[flight_key] = (point["future"], persistence)
+                claimed[flight_key] = point
+                pending.append(point)
+        return pending, duplicates
+
+    async def _run_batch_invocation(self, batch_id, number, chunk, symbolic, model_name, control_name, control_params, control_content, control_sha,
+                                    persistence, timeout, limit, progress):
+        """
+        Simulates the points of `chunk` in one ngspice process, then splits its output into their runs. Points get
+        `started` events as ngspice reaches them; the batch gets `progress` events from the shared `progress` tracker.
+        """
+        plan = self._get_extraction_plan(control_name)
+        batch_dir = self.get_run_dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        netlist_path = os.path.join(batch_dir, f"batch_{number:03d}.cir")
+        log_path = os.path.join(batch_dir, f"ngspice_{number:03d}.log")
+        async with limit:
+            runs = []
+            try:
+                for point in chunk:
+                    run_dir = self.get_run_dir(point["sim_id"])
+                    os.makedirs(run_dir, exist_ok=True)
+                    work_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(run_dir)}_", dir=self.scratch_dir) if self.scratch_dir else run_dir
+                    eis_data_filepath, raw_data_filepath = _output_files(plan, work_dir)
+                    point_control_params = dict(control_params, output_data_file=eis_data_filepath, output_raw_file=raw_data_filepath)
+                    merged_content = _merge_netlist(point["model_content"], _render_template(self.env, control_name, point_control_params))
+                    # Each point keeps the netlist a single run would have executed, so its data loads like any run's.
+                    with open(os.path.join(work_dir, "merged.cir"), "w") as f:
+                        f.write(merged_content)
+                    if persistence == "all":
+                        self._write_fragments(work_dir, point["model_content"], control_content)
+                    runs.append({"run_dir": run_dir, "work_dir": work_dir, "control_params": point_control_params,
+                                 "merged_content": merged_content, "control": point_control_lines(merged_content)})
+
+                with open(netlist_path, "w") as f:
+                    f.write(build_batch_netlist(
+                        _merge_netlist(symbolic, control_content), [point["values"] for point in chunk], [run["control"] for run in runs],
+                    ))
+                print(f"Running {len(chunk)} points of batch {batch_id} in one ngspice invocation ({netlist_path}).")
+
+                def on_output(text):
+                    percent, started = progress.feed(number, text)
+                    for index in started:
+                        if index < len(chunk):
+                            self.events.publish(chunk[index]["sim_id"], "started", engine="ngspice", batch_id=batch_id)
+                    self._publish_batch_progress(batch_id, percent)
+
+                await self._run_ngspice(netlist_path, log_path, batch_id, timeout * len(chunk), on_output=on_output)
+                self._publish_batch_progress(batch_id, progress.finish(number))
+            except BaseException as e:
+                for run in runs:
+                    if run["work_dir"] != run["run_dir"]:
+                        shutil.rmtree(run["work_dir"], ignore_errors=True)
+                for point in chunk:
+                    if isinstance(e, (asyncio.CancelledError, RunCancelledError)):
+                        self.events.publish(point["sim_id"], "cancelled", batch_id=batch_id)
+                    else:
+                        self.events.publish(point["sim_id"], "failed", error=f"{type(e).__name__}: {e}", batch_id=batch_id)
+                raise
+
+        with open(log_path) as f:
+            logs = split_batch_log(f.read(), len(chunk))
+        for point, run, log in zip(chunk, runs, logs):
+            with open(os.path.join(run["work_dir"], "ngspice.log"), "w") as f:
+                f.write(log)
+            artifacts, manifest = await self._finish_run(
+                point["sim_id"], run["work_dir"], plan, model_name, point["params"], control_name, run["control_params"],
+                point["model_content"], control_content, point["model_sha"], control_sha, run["merged_content"],
+                point["merged_sha"], point["canonical_sha"], "ngspice", {"mode": "fixed"}, persistence,
+            )
+            manifest["batch"] = {"batch_id": batch_id, "index": point["index"], "netlist": netlist_path}
+            manifest["artifacts"] = await asyncio.to_thread(self._persist_run, run["work_dir"], run["run_dir"], artifacts, persistence)
+            with open(os.path.join(run["run_dir"], "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            self.events.publish(point["sim_id"], "finished", batch_id=batch_id)
+            if not point["future"].done():  # A failed sibling invocation may have failed the batch's futures already.
+                point["future"].set_result(point["sim_id"])
+        return {"netlist": netlist_path, "log": log_path, "sim_ids": [point["sim_id"] for point in chunk]}
+
+    def _publish_batch_progress(self, batch_id, percent):
+        # Whole-percent steps, as for single runs.
+        if percent is not None and int(percent) > self._batch_progress.get(batch_id, 0):
+            self._batch_progress[batch_id] = int(percent)
+            self.events.publish(batch_id, "progress", percent=int(percent))
+
+    def cancel_run(self, sim_id):
+        """
+        Cancels an executing run: its ngspice process group is killed and its
+        `start_sim` call (and any coalesced callers) fail with `RunCancelledError`.
+        Raises KeyError if no run with this sim_id is executing.
+        """
+        run = self._active_runs.get(sim_id)
+        if run is None or run.done():
+            raise KeyError(f"No executing run with sim_id '{sim_id}'.")
+        self._cancelled_runs.add(sim_id)
+        run.cancel()
+        return {"sim_id": sim_id, "cancelled": True}
+
+    def _run_timeout(self, control_name, timeout=None):
+        """The run's timeout in seconds: the request's, else the control's `timeout` metadata, else the default; capped at `max_run_timeout`."""
+        if timeout is None:
+            timeout = _as_number((self.get_control_metadata(control_name) or {}).get("timeout"))
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"Run timeout must be positive, got {timeout}.")
+        return min(float(timeout or self.run_timeout), self.max_run_timeout)
+
+    def _write_alias_run(self, sim_id, target_sim_id):
+        """Records `sim_id` as an alias of a completed run: a manifest pointing at the target's artifacts."""
+        manifest = self.read_results(target_sim_id)
+        if manifest is None:
+            raise FileNotFoundError(f"Run {target_sim_id} has no manifest to alias.")
+        manifest = dict(manifest, sim_id=sim_id, alias_of=target_sim_id)
+        run_dir = self.get_run_dir(sim_id)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Run {sim_id} recorded as an alias of {target_sim_id}.")
+        return sim_id
+
+    async def _run_sim(self, sim_id, model_name, model_params, control_name, control_params, engine, adaptive, sampling,
+                       model_content, control_content, model_sha, control_sha, merged_content, merged_sha, canonical_sha, persistence="all", timeout=None):
+        """Executes the simulation in a work directory, then persists the selected outputs and the manifest."""
+        run_dir = self.get_run_dir(sim_id)
+        os.makedirs(run_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(run_dir)}_", dir=self.scratch_dir) if self.scratch_dir else run_dir
+        try:
+            artifacts, manifest = await self._execute_run(
+                sim_id, work_dir, model_name, model_params, control_name, control_params, engine, adaptive, sampling,
+                model_content, control_content, model_sha, control_sha, merged_sha, canonical_sha, persistence, timeout,
+            )
+        except BaseException:
+            if work_dir != run_dir:
+                # Keep what is needed to diagnose the failure.
+                for filename in ("merged.cir", "ngspice.log"):
+                    if os.path.exists(os.path.join(work_dir, filename)):
+                        shutil.move(os.path.join(work_dir, filename), os.path.join(run_dir, filename))
+                shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        manifest["artifacts"] = await asyncio.to_thread(self._persist_run, work_dir, run_dir, artifacts, persistence)
+        with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Manifest created for {sim_id}.")
+
+    async def _run_remote(self, sim_id, model_name, model_params, control_name, control_params, engine, sampling, persistence, timeout):
+        """
+        Queues the run for a worker and waits until it is finished. The template
+        sources are published as blobs so the worker renders the same versions;
+        cancelling the wait cancels the job, which stops the worker's run.
+        """
+        queue = self.job_queue
+
+        def submit():
+            references = {}
+            for template_type, name, inventory in (("model", model_name, self._model_inventory), ("control", control_name, self._control_inventory)):
+                if name not in inventory:
+                    raise KeyError(f"Unknown {template_type} template: {name}")
+                references[template_type] = {"name": name, "sha256": queue.put_blob(inventory[name]["raw_string"])}
+            payload = dict(references, model_params=model_params, control_params=control_params, sim_id=sim_id,
+                           engine=engine, sampling=sampling, persistence=persistence, timeout=timeout)
+            return queue.submit("run", payload, job_id=sim_id)
+
+        job_id = await asyncio.to_thread(submit)
+        try:
+            delay, started = 0.02, False
+            while True:
+                job = await asyncio.to_thread(queue.get, job_id)
+                if job["status"] == "running" and not started:
+                    started = True
+                    self.events.publish(sim_id, "started", worker=job["worker"])
+                if job["status"] in FINAL_STATUSES:
+                    break
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        except asyncio.CancelledError:
+            await asyncio.shield(asyncio.to_thread(queue.cancel, job_id))
+            raise
+        if job["status"] == "cancelled":
+            raise RunCancelledError(sim_id)
+        if job["status"] == "failed":
+            raise RuntimeError(f"Run {sim_id} failed on worker {job['worker']}: {job['error']}")
+        print(f"Run {sim_id} completed on worker {job['worker']}.")
+
+    async def _execute_run(self, sim_id, work_dir, model_name, model_params, control_name, control_params, engine, adaptive, sampling,
+                           model_content, control_content, model_sha, control_sha, merged_sha, canonical_sha, persistence, timeout=None):
+        """Renders the run's netlist into `work_dir`, simulates it and extracts its outputs. Returns (artifacts, manifest)."""
+        merged_filepath = os.path.join(work_dir, "merged.cir")
+        ngspice_log_filepath = os.path.join(work_dir, "ngspice.log")
+        # The control's extraction plan (compiled at template load) decides which outputs are expected and processed.
+        plan = self._get_extraction_plan(control_name)
+        eis_data_filepath, raw_data_filepath = _output_files(plan, work_dir)
+
+        if persistence == "all":
+            self._write_fragments(work_dir, model_content, control_content)
+
+        print(f"Starting simulation {sim_id} in {work_dir}")
+        self.events.publish(sim_id, "started", engine=engine)
 
         # 4. Execute ngspice
         try:
             # Update control_params with the full path for the output data file
             control_params['output_data_file'] = eis_data_filepath
-            # Re-render control content with the updated path, and re-merge
-            control_content_with_path = _render_template(self.env, control_name, control_params, raw_content=control_content)
-            merged_content = f"{model_content}\n\n* --- control ---\n{control_content_with_path}"
+            # Controls that `write` a rawfile (preferably `set filetype=binary`) target it here.
+            control_params['output_raw_file'] = raw_data_filepath
+            # Render from the template source: the already-rendered control no longer contains the placeholder.
+            control_content_with_path = _render_template(self.env, control_name, control_params)
+            merged_content = _merge_netlist(model_content, control_content_with_path)
             with open(merged_filepath, "w") as f:
                 f.write(merged_content)
 
-            command = ["ngspice", "-b", merged_filepath]
-            print(f"Executing ngspice command: {' '.join(command)}")
-            try:
-                ngspice_result = await asyncio.to_thread(
-                    subprocess.run,
-                    command,
-                    capture_output=True,
-                    text=True,
-                    env=os.environ.copy(), # Pass current environment to subprocess
-                    timeout=60 # Add a 60-second timeout
-                )
-                print(f"ngspice stdout:\n{ngspice_result.stdout}")
-                print(f"ngspice stderr:\n{ngspice_result.stderr}")
-
-                with open(ngspice_log_filepath, "w") as f:
-                    f.write(ngspice_result.stdout)
-                    f.write(ngspice_result.stderr)
-                
-                if ngspice_result.returncode != 0:
-                    print(f"ngspice finished with non-zero exit code ({ngspice_result.returncode}). Check {ngspice_log_filepath} for details.")
-                else:
-                    print(f"ngspice simulation for {sim_id} completed.")
-            except subprocess.TimeoutExpired as e:
-                print(f"ngspice command timed out after {e.timeout} seconds.")
-                print(f"Stdout during timeout:\n{e.stdout}")
-                print(f"Stderr during timeout:\n{e.stderr}")
-                with open(ngspice_log_filepath, "w") as f:
-                    f.write("TimeoutExpired:\n")
-                    f.write(f"Stdout:\n{e.stdout}\n")
-                    f.write(f"Stderr:\n{e.stderr}\n")
-                raise # Re-raise the exception to propagate the timeout error
-            except subprocess.CalledProcessError as e:
-                print(f"ngspice simulation failed for {sim_id}.")
-                print(f"Stdout:\n{e.stdout}")
-                print(f"Stderr:\n{e.stderr}")
-                with open(ngspice_log_filepath, "w") as f:
-                    f.write(e.stdout)
-                    f.write(e.stderr)
-                raise
+            engine_used = "ngspice"
+            sampling_used = {"mode": "fixed"}
+            # Adaptive frequency sampling needs arbitrary frequency grids, which only the native engine provides.
+            if engine == "native" or adaptive:
+                try:
+                    native_result = await asyncio.to_thread(execute_native_ac, merged_content, ngspice_log_filepath, None, sampling if adaptive else None)
+                    engine_used = "native"
+                    sampling_used = native_result.get("sampling", sampling_used)
+                    print(f"Native AC simulation for {sim_id} completed.")
+                except UnsupportedNetlistError as e:
+                    if adaptive:
+                        logger.warning(f"Adaptive sampling unavailable for {sim_id} ({e}); running ngspice on the fixed grid.")
+                    else:
+                        logger.info(f"Native AC engine cannot run {sim_id} ({e}); falling back to ngspice.")
+
+            if engine_used == "ngspice":
+                await self._run_ngspice(merged_filepath, ngspice_log_filepath, sim_id, timeout)
         except Exception as e:
             print(f"An unexpected error occurred while running ngspice: {e}")
             raise
 
+        return await self._finish_run(
+            sim_id, work_dir, plan, model_name, model_params, control_name, control_params, model_content, control_content,
+            model_sha, control_sha, merged_content, merged_sha, canonical_sha, engine_used, sampling_used, persistence,
+        )
+
+    def _write_fragments(self, work_dir, model_content, control_content):
+        with open(os.path.join(work_dir, "model.cir"), "w") as f:
+            f.write(model_content)
+        with open(os.path.join(work_dir, "control.cir"), "w") as f:
+            f.write(control_content)
+
+    async def _finish_run(self, sim_id, work_dir, plan, model_name, model_params, control_name, control_params, model_content, control_content,
+                          model_sha, control_sha, merged_content, merged_sha, canonical_sha, engine_used, sampling_used, persistence):
+        """Extracts the outputs of a simulated run in `work_dir` and builds its manifest. Returns (artifacts, manifest)."""
+        ngspice_log_filepath = os.path.join(work_dir, "ngspice.log")
+        eis_data_filepath, raw_data_filepath = _output_files(plan, work_dir)
+        nyquist_plot_filepath = os.path.join(work_dir, "nyquist_plot.png")
+
         # Read ngspice log content for manifest
         with open(ngspice_log_filepath, "r") as f:
             ngspice_log_content = f.read()
 
-        # 5. Generate Manifest
+        # 5. Extract declared outputs
+        if plan["legacy"]:
+            artifacts = {
+                "eis_data": eis_data_filepath,
+                "ngspice_log": ngspice_log_filepath,
+                "nyquist_plot": nyquist_plot_filepath,
+                **({"raw_data": raw_data_filepath} if os.path.exists(raw_data_filepath) else {}),
+            }
+            outputs = None
+            # Legacy controls (no `outputs` metadata) are treated as EIS experiments: parse and plot Nyquist
+            if persistence != "minimal":
+                self._generate_nyquist_plot(eis_data_filepath, nyquist_plot_filepath, sim_id)
+        else:
+            data_filepath = raw_data_filepath if plan["format"] == "raw" else eis_data_filepath
+            artifacts = {"data": data_filepath, "ngspice_log": ngspice_log_filepath}
+            outputs = await asyncio.to_thread(self._extract_outputs, plan, work_dir, sim_id)
+            artifacts.update(outputs.pop("artifacts"))
+
+        # 6. Generate Manifest
         manifest = {
             "sim_id": sim_id,
             "model": {
@@ -278,24 +1533,287 @@ class SimulationManager:
                 "sha256": control_sha
             },
             "merged_netlist_sha256": merged_sha,
-            "tool_versions": {"ngspice": self._get_ngspice_version()},
-            "artifacts": {
-                "eis_data": eis_data_filepath,
-                "ngspice_log": ngspice_log_filepath,
-                "nyquist_plot": nyquist_plot_filepath
-            },
+            "canonical_netlist_sha256": canonical_sha,
+            "engine": engine_used,
+            "sampling": sampling_used,
+            "tool_versions": {"native_ac": NATIVE_ENGINE_VERSION} if engine_used == "native" else {"ngspice": self._get_ngspice_version()},
+            "persistence": persistence,
+            "artifacts": artifacts,
+            **({"outputs": outputs} if outputs is not None else {}),
             "ngspice_log_content": ngspice_log_content
         }
+        if persistence != "all":
+            # Netlists are stored once by hash; the executed one with run-directory paths made relative.
+            executed = merged_content.replace(os.path.join(work_dir, ""), "")
+            manifest["netlists"] = {
+                "model": {"sha256": model_sha, "path": self._store_fragment(model_content, model_sha)},
+                "control": {"sha256": control_sha, "path": self._store_fragment(control_content, control_sha)},
+                "merged": {"sha256": _compute_sha256(executed), "path": self._store_fragment(executed)},
+            }
+        return artifacts, manifest
+
+    def _persist_run(self, work_dir, run_dir, artifacts, persistence):
+        """
+        Moves a finished run's files from `work_dir` to `run_dir` according to the
+        persistence policy and returns the artifact paths as persisted:
+
+        - "all": every file (netlists, log, data, plots).
+        - "data": every artifact (log, data, plots); netlists only in the fragment store.
+        - "minimal": the data files only; the log survives in the manifest.
+        """
+        if persistence == "minimal":
+            artifacts = {name: path for name, path in artifacts.items() if name in self.MINIMAL_ARTIFACTS}
+        if work_dir == run_dir:
+            if persistence != "all":
+                kept = {os.path.abspath(path) for path in artifacts.values()}
+                for filename in os.listdir(run_dir):
+                    path = os.path.join(run_dir, filename)
+                    if os.path.isfile(path) and os.path.abspath(path) not in kept and filename != "manifest.json":
+                        os.remove(path)
+            return artifacts
+        filenames = os.listdir(work_dir) if persistence == "all" else [os.path.basename(path) for path in artifacts.values()]
+        for filename in filenames:
+            if os.path.exists(os.path.join(work_dir, filename)):
+                shutil.move(os.path.join(work_dir, filename), os.path.join(run_dir, filename))
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return {name: os.path.join(run_dir, os.path.basename(path)) for name, path in artifacts.items()}
+
+    def _store_fragment(self, content, sha=None):
+        """Stores a netlist fragment once under `runs/netlists/ab/<sha256>.cir` and returns its path."""
+        sha = sha or _compute_sha256(content)
+        path = os.path.join(self.runs_dir, "netlists", sha[:2], f"{sha}.cir")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                f.write(content)
+            os.replace(temporary, path)
+        return path
+
+    def _run_data_location(self, sim_id):
+        """Returns the directory holding a run's data and its merged netlist path, following alias runs and the fragment store."""
+        manifest = self.read_results(sim_id) or {}
+        if manifest.get("alias_of"):
+            sim_id = manifest["alias_of"]
+            manifest = self.read_results(sim_id) or {}
+        netlist = (manifest.get("netlists") or {}).get("merged")
+        return self.get_run_dir(sim_id), netlist["path"] if netlist else None
+
+    def _load_run_data(self, sim_id):
+        """Loads a run's data, following alias runs and netlists kept in the fragment store."""
+        run_dir, netlist_path = self._run_data_location(sim_id)
+        try:
+            return load_run_data(run_dir, netlist_path=netlist_path)
+        except FileNotFoundError as e:
+            raise KeyError(f"No data for run '{sim_id}': {e}")
+
+    async def post_process(self, sim_id, stages=None, options=None):
+        """
+        Runs post-processing stages (see `post_processing.POST_PROCESSORS`) on a
+        finished run, with the stages they depend on. `stages` defaults to the
+        ones the run's control declared `lazy`; `options` maps a stage name to
+        options that override the declared ones.
+
+        Results are cached per run under `runs/<sim_id>/post/`, keyed by the
+        stage, its options and version and, through its inputs, the run's data
+        files, so a stage is computed once however often it is requested.
+        Stages run in the post-processing pool. Returns {"sim_id", "artifacts",
+        "summary", "errors", "cached", "stages"}.
+        """
+        manifest = self.read_results(sim_id)
+        if manifest is None:
+            raise KeyError(f"Run '{sim_id}' not found.")
+        options = dict(options or {})
+        declared = {step["name"]: step for step in (manifest.get("outputs") or {}).get("lazy") or []}
+        if stages is None:
+            stages = list(declared)
+        if not stages:
+            raise ValueError(f"No stages requested and run '{sim_id}' declares no lazy post-processors. Available: {sorted(POST_PROCESSORS)}")
+        # Resolved first, so `options` also reaches the stages pulled in as inputs.
+        steps = [
+            {"name": step["name"], "options": {**(declared[step["name"]]["options"] if step["name"] in declared else {}), **(options.get(step["name"]) or {})}}
+            for step in resolve_stages([{"name": name} for name in stages])
+        ]
+        run_dir, netlist_path = self._run_data_location(sim_id)
+        try:
+            fingerprint = await asyncio.to_thread(data_fingerprint, run_dir, netlist_path=netlist_path)
+        except FileNotFoundError as e:
+            raise KeyError(f"No data for run '{sim_id}': {e}")
+        result = await asyncio.to_thread(
+            run_pipeline, steps, lambda: self._load_run_data(sim_id), run_dir, sim_id,
+            executor=self._get_post_process_pool(), cache_dir=os.path.join(run_dir, "post"), fingerprint=fingerprint,
+        )
+        return {"sim_id": sim_id, **result}
+
+    async def analyze_run(self, sim_id, analyses=None, vector="z", options=None):
+        """
+        Runs impedance analyses (`eis_analysis.ANALYSES`: "drt", distribution of
+        relaxation times, and "kramers_kronig", the Lin-KK validity test) on the
+        complex `vector` of a finished AC run. `options` maps an analysis name to
+        its keyword arguments (e.g. {"drt": {"regularization": 1e-4}}).
+
+        The analyses are post-processing stages run through `post_process`, so
+        they are cached per run (keyed by the run's data files, the vector,
+        the options and the analysis version) and run in parallel in the
+        post-processing pool.
+
+        Returns {"sim_id", "analyses": {name: {..., "summary", "artifacts", "cached"}}}.
+        """
+        analyses = list(analyses or ANALYSES)
+        unknown = [name for name in analyses if name not in ANALYSES]
+        if unknown:
+            raise ValueError(f"Unknown analyses {unknown}. Expected any of {sorted(ANALYSES)}.")
+        options = {name: {"vector": vector, **((options or {}).get(name) or {})} for name in analyses}
+        result = await self.post_process(sim_id, analyses, options)
+        if result["errors"]:
+            raise ValueError("; ".join(f"{name}: {error}" for name, error in result["errors"].items()))
+        return {
+            "sim_id": sim_id,
+            "analyses": {
+                name: {
+                    "analysis": name,
+                    "vector": vector,
+                    "options": options[name],
+                    "summary": result["stages"][name]["summary"][name],
+                    "artifacts": {"arrays": result["stages"][name]["artifacts"][name]},
+                    "cached": result["stages"][name]["cached"],
+                }
+                for name in analyses
+            },
+        }
 
-        with open(os.path.join(run_dir, "manifest.json"), "w") as f:
-            json.dump(manifest, f, indent=2)
-        
-        print(f"Manifest created for {sim_id}.")
+    def _get_post_process_pool(self):
+        """The process pool for post-processing stages, or None (stages run in the calling thread)."""
+        if self.post_process_workers and self._post_process_pool is None:
+            # Spawned, not forked: the server process has threads (and possibly an ngspice pool) running.
+            self._post_process_pool = concurrent.futures.ProcessPoolExecutor(self.post_process_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._post_process_pool
 
-        # 6. Parse ngspice output and generate Nyquist plot
-        self._generate_nyquist_plot(eis_data_filepath, nyquist_plot_filepath, sim_id)
+    def _get_extraction_plan(self, control_name):
+        control_info = self._control_inventory.get(control_name) or {}
+        return control_info.get("extraction_plan") or build_extraction_plan(control_info.get("metadata") or {})
 
-        return sim_id
+    def _extract_outputs(self, plan, run_dir, sim_id):
+        """Loads a run's data once and runs the post-processors its control declared eager (the default)."""
+        outputs = {"format": plan["format"], "vectors": plan["vectors"], "missing_vectors": [], "artifacts": {}, "summary": {}, "errors": {}}
+        try:
+            run = load_run_data(run_dir)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"No output data for {sim_id}: {e}")
+            outputs["errors"]["data"] = str(e)
+            return outputs
+        outputs["missing_vectors"] = [name for name in plan["vectors"] if name not in run["vectors"]]
+        outputs["points"] = len(run["scale"])
+        eager = [step for step in plan["post_processors"] if not step.get("lazy")]
+        if eager:
+            result = run_pipeline(eager, lambda: run, run_dir, sim_id, executor=self._get_post_process_pool())
+            outputs.update({key: result[key] for key in ("artifacts", "summary", "errors")})
+        lazy = [{"name": step["name"], "options": step["options"]} for step in plan["post_processors"] if step.get("lazy")]
+        if lazy:
+            # Computed on request by `post_process`.
+            outputs["lazy"] = lazy
+        return outputs
+
+    async def close(self):
+        """Stops the warm ngspice workers and the analysis pool, if any."""
+        if self._ngspice_pool is not None:
+            await self._ngspice_pool.close()
+        if self._post_process_pool is not None:
+            self._post_process_pool.shutdown(cancel_futures=True)
+            self._post_process_pool = None
+
+    def _get_ngspice_pool(self):
+        if self._ngspice_pool is None:
+            self._ngspice_pool = NgspiceWorkerPool(self.ngspice_workers, run_timeout=self.run_timeout, resource_limits=self.resource_limits)
+        return self._ngspice_pool
+
+    async def _run_ngspice(self, merged_filepath, ngspice_log_filepath, sim_id, timeout=None, on_output=None):
+        """
+        Runs ngspice on a merged netlist (on a warm worker or in batch mode), writing its console output to the log file.
+        Batch runs get their own process group under the manager's resource limits; on timeout or cancellation the group is killed.
+        Console output goes to `on_output`, by default a tracker publishing `progress` events for `sim_id`.
+        """
+        timeout = timeout or self.run_timeout
+        if on_output is None:
+            with open(merged_filepath) as f:
+                progress = NgspiceProgress(f.read())
+            reported = [0]
+
+            def on_output(text):
+                # Progress events in whole-percent steps.
+                percent = progress.feed(text)
+                if percent is not None and int(percent) > reported[0]:
+                    reported[0] = int(percent)
+                    self.events.publish(sim_id, "progress", percent=reported[0])
+
+        if self.ngspice_workers:
+            streamed = []
+
+            def collect(text):
+                # Kept for the log: a worker that times out is killed without returning its output.
+                streamed.append(text)
+                on_output(text)
+
+            try:
+                output = await self._get_ngspice_pool().run(merged_filepath, timeout, collect)
+            except subprocess.TimeoutExpired as e:
+                print(f"ngspice worker timed out after {e.timeout} seconds.")
+                with open(ngspice_log_filepath, "w") as f:
+                    f.write("TimeoutExpired:\n")
+                    f.write(f"Stdout:\n{''.join(streamed)}\n")
+                raise
+            with open(ngspice_log_filepath, "w") as f:
+                f.write(output)
+            print(f"ngspice simulation for {sim_id} completed on a warm worker.")
+            return
+        command = ["ngspice", "-b", merged_filepath]
+        print(f"Executing ngspice command: {' '.join(command)}")
+        try:
+            ngspice_result = await run_limited(
+                command,
+                timeout,
+                limits=self.resource_limits,
+                env=os.environ.copy(), # Pass current environment to subprocess
+                on_output=on_output,
+            )
+            print(f"ngspice stdout:\n{ngspice_result.stdout}")
+            print(f"ngspice stderr:\n{ngspice_result.stderr}")
+
+            with open(ngspice_log_filepath, "w") as f:
+                f.write(ngspice_result.stdout)
+                f.write(ngspice_result.stderr)
+
+            if ngspice_result.returncode < 0:
+                print(f"ngspice was killed by signal {-ngspice_result.returncode} (resource limit exceeded?). Check {ngspice_log_filepath} for details.")
+            elif ngspice_result.returncode != 0:
+                print(f"ngspice finished with non-zero exit code ({ngspice_result.returncode}). Check {ngspice_log_filepath} for details.")
+            else:
+                print(f"ngspice simulation for {sim_id} completed.")
+        except subprocess.TimeoutExpired as e:
+            print(f"ngspice command timed out after {e.timeout} seconds.")
+            print(f"Stdout during timeout:\n{e.stdout}")
+            print(f"Stderr during timeout:\n{e.stderr}")
+            with open(ngspice_log_filepath, "w") as f:
+                f.write("TimeoutExpired:\n")
+                f.write(f"Stdout:\n{e.stdout}\n")
+                f.write(f"Stderr:\n{e.stderr}\n")
+            raise # Re-raise the exception to propagate the timeout error
+        except subprocess.CalledProcessError as e:
+            print(f"ngspice simulation failed for {sim_id}.")
+            print(f"Stdout:\n{e.stdout}")
+            print(f"Stderr:\n{e.stderr}")
+            with open(ngspice_log_filepath, "w") as f:
+                f.write(e.stdout)
+                f.write(e.stderr)
+            raise
+
+    async def _engine_version(self, engine):
+        """Version string of an engine, used in content-derived sim_ids (ngspice is queried once)."""
+        if engine == "native":
+            return NATIVE_ENGINE_VERSION
+        if self._ngspice_version is None:
+            self._ngspice_version = await asyncio.to_thread(self._get_ngspice_version)
+        return self._ngspice_version
 
     def _get_ngspice_version(self):
         try:
@@ -352,44 +1870,92 @@ class SimulationManager:
         except Exception as e:
             print(f"Error generating Nyquist plot from {eis_data_filepath}: {e}")
 
-def _load_templates_from_dir(directory: str, template_type: str):
-        """Helper to load templates from a given directory."""
+def _load_templates_from_dir(directory: str, template_type: str, cache: Optional[dict] = None):
+        """
+        Helper to load templates from a given directory.
+
+        With an inventory `cache` ({"previous": {...}, "entries": {...}}, see
+        `_read_inventory_cache`), files whose path, mtime and size match a previous
+        entry are not read or parsed again; every loaded file's parsed form is
+        recorded in `cache["entries"]`.
+        """
         inventory = {}
         if not os.path.exists(directory):
             return inventory
         for filename in os.listdir(directory):
             if filename.endswith(".j2"):
                 file_path = os.path.join(directory, filename)
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                
-                if template_type == "model":
-                    metadata, template_content = _parse_metadata_from_content(content)
-                    
-                    # Extract parameters and their defaults from metadata using the new helper
-                    parameters = _get_default_params_for_rendering(metadata)
-
-                    # Extract subcircuits
-                    subcircuits = _extract_subcircuits(template_content)
-
-                    # Extract includes
-                    includes = _extract_includes(template_content)
-
-                    inventory[filename] = {
-                        "raw_string": content,
-                        "models": subcircuits,
-                        "includes": includes, # Add includes to the inventory
-                        "metadata": metadata, # Store full metadata for other uses
-                        "parameters_with_defaults": parameters # Store parameters with defaults
-                    }
-                elif template_type == "control":
-                    metadata, clean_content = _parse_metadata_from_content(content)
-                    inventory[filename] = {
-                        "raw_string": content,
-                        "metadata": metadata
-                    }
+                stat = os.stat(file_path)
+                key = os.path.abspath(file_path)
+                signature = [template_type, stat.st_mtime_ns, stat.st_size]
+                cached = cache["previous"].get(key) if cache is not None else None
+                if cached is not None and cached["signature"] == signature:
+                    parsed = cached["parsed"]
+                else:
+                    with open(file_path, 'r') as f:
+                        content = f.read()
+                    parsed = _parse_template(content, template_type)
+                if cache is not None:
+                    cache["entries"][key] = {"signature": signature, "parsed": parsed}
+                inventory[filename] = _compile_inventory_entry(parsed, template_type)
         return inventory
 
+def _parse_template(content: str, template_type: str) -> dict:
+    """Parses a template's metadata and scans its SPICE body; the result is JSON-serializable (cacheable)."""
+    metadata, template_content = _parse_metadata_from_content(content)
+    parsed = {"raw_string": content, "sha256": _compute_sha256(content), "metadata": metadata}
+    if template_type == "model":
+        # Extract parameters and their defaults from metadata using the new helper
+        parsed["parameters_with_defaults"] = _get_default_params_for_rendering(metadata)
+        parsed["models"] = _extract_subcircuits(template_content)
+        parsed["includes"] = _extract_includes(template_content)
+    return parsed
+
+def _compile_inventory_entry(parsed: dict, template_type: str) -> dict:
+    """Builds an inventory entry from a parsed template, compiling what is needed per run."""
+    if template_type == "model":
+        return {
+            "raw_string": parsed["raw_string"],
+            "sha256": parsed["sha256"],
+            "models": parsed["models"],
+            "includes": parsed["includes"], # Add includes to the inventory
+            "metadata": parsed["metadata"], # Store full metadata for other uses
+            "parameters_with_defaults": parsed["parameters_with_defaults"], # Store parameters with defaults
+            "validator": compile_parameter_validator(parsed["metadata"]) # Checked before every run
+        }
+    return {
+        "raw_string": parsed["raw_string"],
+        "sha256": parsed["sha256"],
+        "metadata": parsed["metadata"],
+        "validator": compile_parameter_validator(parsed["metadata"]),
+        "extraction_plan": build_extraction_plan(parsed["metadata"]) # Compiled once, executed per run
+    }
+
+def _read_inventory_cache(path: str) -> dict:
+    """Reads the on-disk inventory cache; a missing, corrupt or outdated cache is treated as empty."""
+    previous = {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") == INVENTORY_CACHE_VERSION:
+            previous = data.get("entries", {})
+    except (OSError, ValueError, AttributeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning(f"Ignoring unreadable inventory cache {path}: {e}")
+    return {"previous": previous, "entries": {}}
+
+def _write_inventory_cache(path: str, cache: dict):
+    """Writes the entries of this load (entries of deleted templates are dropped) if anything changed."""
+    if cache["entries"] == cache["previous"]:
+        return
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as f:
+            json.dump({"version": INVENTORY_CACHE_VERSION, "entries": cache["entries"]}, f, separators=(",", ":"), default=str)
+        os.replace(temporary, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write inventory cache {path}: {e}")
+
 def _get_default_params_for_rendering(metadata: dict) -> dict:
     """
     Extracts parameters and their default/dummy values from metadata for rendering purposes.
@@ -413,6 +1979,20 @@ def _get_default_params_for_rendering(metadata: dict) -> dict:
                     rendering_params[param_name] = False
     return rendering_params
 
+def _get_parameter_specs(metadata: dict) -> dict:
+    """Returns the parameter declarations of a template (`input_parameters`, or legacy `parameters`)."""
+    specs = metadata.get("input_parameters") or metadata.get("parameters") or {}
+    return specs if isinstance(specs, dict) else {}
+
+def _as_number(value) -> Optional[float]:
+    """Returns `value` as a float if it is numeric (YAML reads exponents like `1e-5` as strings), else None."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
 def _extract_subcircuits(spice_code: str) -> list[str]:
     """
     Extracts subcircuit names from SPICE code.
@@ -476,9 +2056,9 @@ def _parse_metadata_from_content(content: str):
     content_without_metadata = content[end_index + len(metadata_end_tag):].strip()
     return metadata, content_without_metadata
 
-async def _validate_spice_code(spice_code: str) -> Optional[str]:
+async def _validate_spice_code(spice_code: str, timeout: float = 60, limits: Optional[dict] = None) -> Optional[str]:
     """
-    Validates SPICE code using ngspice in batch mode.
+    Validates SPICE code using ngspice in batch mode (bounded by `timeout` and resource `limits`).
     Returns an error message string if ngspice reports errors, otherwise returns None.
     """
     print(f"--- SPICE Code being validated by ngspice ---\n{spice_code}\n---------------------------------------------")
@@ -490,15 +2070,13 @@ async def _validate_spice_code(spice_code: str) -> Optional[str]:
         temp_file_path = temp_file.name
     try:
         command = ["ngspice", "-b", temp_file_path]
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        try:
+            process = await run_limited(command, timeout, limits=limits)
+        except subprocess.TimeoutExpired:
+            return f"SPICE code validation failed: ngspice did not finish within {timeout} seconds."
 
-        stdout_str = stdout.decode('utf-8')
-        stderr_str = stderr.decode('utf-8')
+        stdout_str = process.stdout
+        stderr_str = process.stderr
         full_output = f"ngspice stdout:\n{stdout_str}\nngspice stderr:\n{stderr_str}"
 
         if process.returncode != 0:
@@ -513,7 +2091,7 @@ async def _validate_spice_code(spice_code: str) -> Optional[str]:
     finally:
         os.remove(temp_file_path)
 
-def _render_template(env: jinja2.Environment, template_path, params, raw_content: Optional[str] = None):
+def _render_template(env: "jinja2.Environment", template_path, params, raw_content: Optional[str] = None):
     if raw_content:
         template = jinja2.Environment(loader=jinja2.BaseLoader).from_string(raw_content)
     else:
@@ -522,6 +2100,80 @@ def _render_template(env: jinja2.Environment, template_path, params, raw_content
     sorted_params = {k: params[k] for k in sorted(params)}
     return template.render(sorted_params)
 
+def _persistence_covers(kept: str, requested: str) -> bool:
+    """Whether a run recorded with persistence `kept` has every file `requested` would keep."""
+    ranks = {"minimal": 0, "data": 1, "all": 2}
+    return ranks.get(kept, 2) >= ranks[requested]
+
+def _output_files(plan: dict, work_dir: str) -> tuple[str, str]:
+    """The wrdata and rawfile paths a control writes to in `work_dir` (its `output_data_file` and `output_raw_file`)."""
+    return (
+        os.path.join(work_dir, plan["file"] if plan["format"] == "wrdata" else DEFAULT_OUTPUT_FILES["wrdata"]),
+        os.path.join(work_dir, plan["file"] if plan["format"] == "raw" else DEFAULT_OUTPUT_FILES["raw"]),
+    )
+
+def _merge_netlist(model_content: str, control_content: str) -> str:
+    """Merges rendered model and control fragments into a single netlist."""
+    return f"{model_content}\n\n* --- control ---\n{control_content}"
+
+class _SweepPlaceholder:
+    """Renders a swept model parameter as a netlist expression referencing a batch symbol."""
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return "{" + _sweep_symbol(self.name) + "}"
+
+def _sweep_symbol(name: str) -> str:
+    return f"vhl_sweep_{name.lower()}"
+
+def _normalize_param_sets(param_sets) -> tuple[list, dict]:
+    """Normalizes a list of dicts or a dict of sequences into (names, {name: float array})."""
+    if isinstance(param_sets, dict):
+        columns = {name: np.asarray(values, dtype=float).ravel() for name, values in param_sets.items()}
+    else:
+        param_sets = list(param_sets)
+        if not param_sets:
+            raise ValueError("param_sets is empty.")
+        names = list(param_sets[0])
+        for index, entry in enumerate(param_sets):
+            if set(entry) != set(names):
+                raise ValueError(f"Parameter set {index} has keys {sorted(entry)}, expected {sorted(names)}.")
+        columns = {name: np.array([entry[name] for entry in param_sets], dtype=float) for name in names}
+    names = list(columns)
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Parameter columns have different lengths: {sorted(lengths)}")
+    if lengths == {0}:
+        raise ValueError("param_sets is empty.")
+    return names, columns
+
+def _elements_match(batched: list, reference: list, index: int) -> bool:
+    """Checks that set `index` of a batched element list equals a concretely flattened one."""
+    if [(e["type"], e["name"], e["nodes"]) for e in batched] != [(e["type"], e["name"], e["nodes"]) for e in reference]:
+        return False
+    for element, expected in zip(batched, reference):
+        for key in ("value", "ac"):
+            if key in element:
+                value = element[key][index] if np.ndim(element[key]) > 0 else element[key]
+                if not np.allclose(value, expected[key], rtol=1e-12, atol=0):
+                    return False
+    return True
+
+_CONTENT_SIM_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def _run_dir(runs_dir: str, sim_id: str) -> str:
+    """
+    Resolves a run directory, rejecting sim_ids that would escape `runs_dir`.
+    Content-derived sim_ids (sha256 hex digests) are sharded as `ab/cd/<sim_id>`.
+    """
+    if _CONTENT_SIM_ID_RE.match(sim_id):
+        return os.path.join(runs_dir, sim_id[:2], sim_id[2:4], sim_id)
+    run_dir = os.path.join(runs_dir, sim_id)
+    if os.path.dirname(os.path.abspath(run_dir)) != os.path.abspath(runs_dir):
+        raise ValueError(f"Invalid sim_id: {sim_id}")
+    return run_dir
+
 def _compute_sha256(content):
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import tempfile
+import uuid
+from typing import Optional
+
+from virtual_hardware_lab.simulation_core.job_queue import JobQueue, SQLiteJobQueue
+from virtual_hardware_lab.simulation_core.simulation_manager import SimulationManager
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+
+class SimulationWorker:
+    """
+    Executes `run` jobs claimed from a shared `JobQueue`.
+
+    A worker keeps its own copy of the templates under `cache_dir`, synced by
+    content hash: before a run, the model and control versions the front end
+    rendered against are fetched from the queue's blobs if the local copy
+    differs. Runs are written to `runs_dir`, which is shared with the front end
+    (a common filesystem on one host, a network mount across hosts). The lease
+    is renewed every `heartbeat_interval` seconds; a renewal refused because
+    the job was cancelled cancels the run and kills its ngspice process.
+    """
+
+    def __init__(self, queue: JobQueue, runs_dir: str, cache_dir: str, worker_id: Optional[str] = None,
+                 lease_seconds: float = 30, heartbeat_interval: float = 1.0, poll_interval: float = 0.5, **manager_options):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        for directory in ("models", "controls"):
+            os.makedirs(os.path.join(cache_dir, directory), exist_ok=True)
+        self.manager = SimulationManager(
+            models_dir=os.path.join(cache_dir, "models"),
+            controls_dir=os.path.join(cache_dir, "controls"),
+            runs_dir=runs_dir,
+            inventory_cache=os.path.join(cache_dir, ".inventory_cache.json"),
+            **manager_options,
+        )
+
+    async def serve(self, stop: Optional[asyncio.Event] = None, max_jobs: Optional[int] = None):
+        """Claims and runs jobs until `stop` is set or `max_jobs` have run; a job in progress at shutdown is returned to the queue."""
+        stop = stop or asyncio.Event()
+        processed = 0
+        try:
+            while not stop.is_set() and (max_jobs is None or processed < max_jobs):
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id, self.lease_seconds)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self.run_job(job)
+                processed += 1
+        finally:
+            await self.manager.close()
+        return processed
+
+    async def run_job(self, job: dict):
+        payload = job["payload"]
+        logger.info(f"Worker {self.worker_id} running job {job['id']} (attempt {job['attempts']}).")
+        try:
+            if job["kind"] != "run":
+                raise ValueError(f"Unknown job kind '{job['kind']}'.")
+            await asyncio.to_thread(self._sync_templates, payload)
+        except Exception as e:
+            await asyncio.to_thread(self.queue.fail, job["id"], self.worker_id, str(e))
+            return
+        run = asyncio.ensure_future(self.manager.start_sim(
+            payload["model"]["name"], payload["model_params"], payload["control"]["name"], payload["control_params"],
+            sim_id=payload["sim_id"], engine=payload.get("engine"), sampling=payload.get("sampling"),
+            persistence=payload.get("persistence"), timeout=payload.get("timeout"),
+        ))
+        heartbeat = asyncio.ensure_future(self._keep_lease(job["id"], run))
+        try:
+            sim_id = await run
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled():
+                logger.info(f"Job {job['id']} was cancelled.")
+                return
+            # The worker itself is stopping: let another worker take the job.
+            await asyncio.shield(asyncio.to_thread(self.queue.release, job["id"], self.worker_id))
+            raise
+        except Exception as e:
+            logger.warning(f"Job {job['id']} failed: {e}")
+            await asyncio.to_thread(self.queue.fail, job["id"], self.worker_id, f"{type(e).__name__}: {e}")
+        else:
+            await asyncio.to_thread(self.queue.complete, job["id"], self.worker_id, {"sim_id": sim_id})
+        finally:
+            heartbeat.cancel()
+
+    async def _keep_lease(self, job_id: str, run: asyncio.Future):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not await asyncio.to_thread(self.queue.renew, job_id, self.worker_id, self.lease_seconds):
+                run.cancel()
+                return
+
+    def _sync_templates(self, payload: dict):
+        """Makes the local model and control templates match the hashes in the job, fetching changed ones from the queue."""
+        changed = False
+        for template_type, directory in (("model", self.manager.models_dir), ("control", self.manager.controls_dir)):
+            reference = payload[template_type]
+            inventory = self.manager._model_inventory if template_type == "model" else self.manager._control_inventory
+            if (inventory.get(reference["name"]) or {}).get("sha256") == reference["sha256"]:
+                continue
+            content = self.queue.get_blob(reference["sha256"])
+            if content is None:
+                raise KeyError(f"Template {reference['name']} ({reference['sha256'][:12]}) is not in the queue's blob store.")
+            path = os.path.join(directory, reference["name"])
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                f.write(content)
+            os.replace(temporary, path)
+            changed = True
+        if changed:
+            self.manager._load_all_templates()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run simulations claimed from a shared job queue.")
+    parser.add_argument("--queue", default=os.getenv("VHL_JOB_QUEUE", "runs/queue.sqlite3"), help="Path of the SQLite job queue.")
+    parser.add_argument("--runs-dir", default=os.getenv("VHL_RUNS_DIR", "runs"), help="Runs directory shared with the front end.")
+    parser.add_argument("--cache-dir", default=None, help="Local template cache (default: a per-worker directory under the system temp dir).")
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--engine", default=os.getenv("VHL_SIM_ENGINE", "ngspice"))
+    parser.add_argument("--ngspice-workers", type=int, default=int(os.getenv("VHL_NGSPICE_WORKERS", 0)))
+    parser.add_argument("--scratch-dir", default=os.getenv("VHL_SCRATCH_DIR"))
+    parser.add_argument("--lease", type=float, default=30, help="Job lease in seconds.")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--max-jobs", type=int, default=None, help="Exit after this many jobs.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache_dir = args.cache_dir or os.path.join(tempfile.gettempdir(), f"vhl_worker_{os.getpid()}")
+    worker = SimulationWorker(
+        SQLiteJobQueue(args.queue), args.runs_dir, cache_dir, worker_id=args.worker_id, lease_seconds=args.lease,
+        poll_interval=args.poll_interval, engine=args.engine, ngspice_workers=args.ngspice_workers, scratch_dir=args.scratch_dir,
+    )
+
+    async def serve():
+        # SIGTERM/SIGINT finish the current job, then exit.
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+        await worker.serve(stop, max_jobs=args.max_jobs)
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
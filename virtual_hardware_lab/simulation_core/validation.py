@@ -0,0 +1,240 @@
+import ast
+import logging
+from typing import Optional
+
+import numpy as np
+
+from virtual_hardware_lab.simulation_core.netlist import (
+    EXPRESSION_CONSTANTS,
+    ExpressionError,
+    compile_expression,
+    evaluate_expression,
+    parse_spice_number,
+)
+
+logger = logging.getLogger("virtual_hardware_lab")
+
+PARAMETER_TYPES = ("float", "int", "bool", "str")
+NUMERIC_TYPES = ("float", "int")
+# Grid errors list at most this many offending set indices (`count` has the total).
+MAX_REPORTED_INDICES = 20
+
+
+class ParameterValidationError(ValueError):
+    """Raised when parameters violate a template's declared types, ranges or constraints."""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__("; ".join(error["message"] for error in errors))
+
+
+def compile_parameter_validator(metadata: dict) -> dict:
+    """
+    Compiles a template's parameter declarations into a validator:
+
+        input_parameters:
+          fmin: {type: float, range: [1e-3, 1e6], required: true}
+          ppd:  {type: int, default: 10, range: [1, 100]}
+        constraints:
+          - "fmax > fmin"
+
+    Types and ranges are coerced once (YAML reads `1e-5` as a string) and
+    constraints are parsed into expression trees. Constraints that are not
+    expressions over declared parameters (free-text rules such as "Must
+    reference nodes exported by model.") are kept as documentation only.
+    """
+    metadata = metadata if isinstance(metadata, dict) else {}
+    declared = metadata.get("input_parameters") or metadata.get("parameters") or {}
+    parameters = {}
+    for name, spec in (declared.items() if isinstance(declared, dict) else []):
+        spec = spec if isinstance(spec, dict) else {}
+        param_type = str(spec.get("type", "")).lower() or None
+        if param_type not in PARAMETER_TYPES:
+            param_type = None
+        entry = {"type": param_type, "required": bool(spec.get("required")) and "default" not in spec, "range": None, "default": None}
+        value_range = spec.get("range")
+        if param_type in NUMERIC_TYPES and isinstance(value_range, (list, tuple)) and len(value_range) == 2:
+            try:
+                entry["range"] = (_to_float(value_range[0]), _to_float(value_range[1]))
+            except (ExpressionError, TypeError):
+                logger.warning(f"Ignoring invalid range {value_range!r} of parameter '{name}'.")
+        if "default" in spec:
+            entry["default"] = spec["default"]
+        parameters[str(name)] = entry
+
+    by_lower_name = {name.lower(): name for name in parameters}
+    constraints, notes = [], []
+    for text in metadata.get("constraints") or []:
+        text = str(text)
+        try:
+            tree = compile_expression(text)
+        except ExpressionError:
+            notes.append(text)
+            continue
+        names = sorted({node.id for node in _walk_names(tree)} - set(EXPRESSION_CONSTANTS))
+        if not names or any(name not in by_lower_name for name in names):
+            notes.append(text)
+            continue
+        constraints.append({"expression": text, "tree": tree, "parameters": [by_lower_name[name] for name in names]})
+    return {"parameters": parameters, "constraints": constraints, "notes": notes}
+
+
+def validate_parameters(validator: dict, params: Optional[dict]) -> list:
+    """
+    Checks one parameter set against a compiled validator. Returns a list of
+    structured errors ({"parameter", "code", "message", ...}); empty if valid.
+    Undeclared parameters are passed through unchecked.
+    """
+    params = params or {}
+    errors, scope = [], {}
+    for name, spec in validator["parameters"].items():
+        if name in params:
+            value = params[name]
+        elif spec["default"] is not None:
+            value = spec["default"]
+        else:
+            if spec["required"]:
+                errors.append({"parameter": name, "code": "missing", "message": f"Parameter '{name}' is required."})
+            continue
+        try:
+            value = _coerce(value, spec["type"])
+        except (ExpressionError, TypeError, ValueError):
+            errors.append({"parameter": name, "code": "type", "value": _jsonable(value), "message": f"Parameter '{name}' must be of type {spec['type']}, got {value!r}."})
+            continue
+        if spec["range"] is not None and not spec["range"][0] <= value <= spec["range"][1]:
+            errors.append({"parameter": name, "code": "range", "value": value, "range": list(spec["range"]),
+                           "message": f"Parameter '{name}' = {value} is outside the range [{spec['range'][0]}, {spec['range'][1]}]."})
+            continue
+        if spec["type"] is None:
+            # Untyped parameters take part in constraints only if they are numeric.
+            try:
+                value = _to_float(value)
+            except (ExpressionError, TypeError):
+                continue
+        scope[name.lower()] = value
+    for constraint in validator["constraints"]:
+        if not all(name.lower() in scope for name in constraint["parameters"]):
+            continue
+        try:
+            satisfied = bool(evaluate_expression(constraint["tree"], scope))
+        except ExpressionError as e:
+            satisfied, reason = False, f": {e}"
+        else:
+            reason = ""
+        if not satisfied:
+            errors.append(_constraint_error(constraint, reason))
+    return errors
+
+
+def validate_parameter_grid(validator: dict, columns: dict, base_params: Optional[dict] = None) -> list:
+    """
+    Checks a whole sweep at once: `columns` maps swept parameter names to
+    equal-length value arrays, `base_params` holds the fixed ones. Types, ranges
+    and constraints are evaluated as array operations over every set; errors
+    carry the offending set `indices` (at most MAX_REPORTED_INDICES) and `count`.
+    """
+    base_params = dict(base_params or {})
+    n_sets = len(next(iter(columns.values()))) if columns else 1
+    # Fixed parameters are checked once, as a single set.
+    fixed = {"parameters": {name: spec for name, spec in validator["parameters"].items() if name not in columns}, "constraints": []}
+    errors = validate_parameters(fixed, base_params)
+    scope = {}
+    for name, spec in validator["parameters"].items():
+        if name in columns:
+            if spec["type"] not in NUMERIC_TYPES + (None,):
+                errors.append({"parameter": name, "code": "type", "message": f"Parameter '{name}' of type {spec['type']} cannot be swept."})
+                continue
+            values = np.asarray(columns[name], dtype=float)
+            bad = ~np.isfinite(values)
+            if spec["type"] == "int":
+                bad |= np.mod(values, 1) != 0
+            if bad.any():
+                errors.append(_grid_error(name, "type", bad, f"Parameter '{name}' must be a finite {spec['type']}"))
+                continue
+            if spec["range"] is not None:
+                outside = (values < spec["range"][0]) | (values > spec["range"][1])
+                if outside.any():
+                    errors.append(_grid_error(name, "range", outside, f"Parameter '{name}' is outside the range [{spec['range'][0]}, {spec['range'][1]}]", range=list(spec["range"])))
+                    continue
+            scope[name.lower()] = values
+            continue
+        value = base_params.get(name, spec["default"])
+        if value is None or any(error["parameter"] == name for error in errors):
+            continue
+        try:
+            scope[name.lower()] = _coerce(value, spec["type"] or "float")
+        except (ExpressionError, TypeError, ValueError):
+            continue
+    for constraint in validator["constraints"]:
+        if not all(name.lower() in scope for name in constraint["parameters"]):
+            continue
+        try:
+            satisfied = np.broadcast_to(np.asarray(evaluate_expression(constraint["tree"], scope), dtype=bool), (n_sets,))
+        except ExpressionError as e:
+            errors.append(_constraint_error(constraint, f": {e}"))
+            continue
+        if not satisfied.all():
+            error = _grid_error(None, "constraint", ~satisfied, f"Constraint '{constraint['expression']}' is violated")
+            error.update({"constraint": constraint["expression"], "parameters": constraint["parameters"]})
+            errors.append(error)
+    return errors
+
+
+def _coerce(value, param_type):
+    """Coerces a value to its declared type; numeric strings may use SPICE suffixes (`1u`, `10k`)."""
+    if param_type in NUMERIC_TYPES:
+        number = _to_float(value)
+        if not np.isfinite(number):
+            raise ValueError(f"{value!r} is not finite")
+        if param_type == "int":
+            if number != int(number):
+                raise ValueError(f"{value!r} is not an integer")
+            return int(number)
+        return number
+    if param_type == "bool":
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        raise TypeError(f"{value!r} is not a bool")
+    if param_type == "str" and not isinstance(value, str):
+        raise TypeError(f"{value!r} is not a str")
+    return value
+
+
+def _to_float(value) -> float:
+    if isinstance(value, bool):
+        raise TypeError(f"{value!r} is not a number")
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, str):
+        return parse_spice_number(value)
+    raise TypeError(f"{value!r} is not a number")
+
+
+def _walk_names(tree):
+    """Yields the variable names of an expression tree (function names excluded)."""
+    functions = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    return [node for node in ast.walk(tree) if isinstance(node, ast.Name) and id(node) not in functions]
+
+
+def _constraint_error(constraint: dict, reason: str = "") -> dict:
+    return {
+        "parameter": None,
+        "code": "constraint",
+        "constraint": constraint["expression"],
+        "parameters": constraint["parameters"],
+        "message": f"Constraint '{constraint['expression']}' is violated{reason}.",
+    }
+
+
+def _grid_error(name, code: str, mask: np.ndarray, message: str, **extra) -> dict:
+    indices = np.flatnonzero(mask)
+    error = {"parameter": name, "code": code, "indices": indices[:MAX_REPORTED_INDICES].tolist(), "count": int(len(indices)),
+             "message": f"{message} in {len(indices)} of {len(mask)} parameter sets (first: {indices[0]})."}
+    error.update(extra)
+    return error
+
+
+def _jsonable(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)